@@ -138,6 +138,19 @@ class CPURunContext(SerialRunContext):
 
 
 
+class NumpyRunContext(SerialRunContext):
+    @property
+    def discr_class(self):
+        from hedge.backends.pure_numpy import Discretization
+        return Discretization
+
+    def make_timer(self, name, description=None):
+        from pytools.log import IntervalTimer
+        return IntervalTimer(name, description)
+
+
+
+
 class CUDARunContext(SerialRunContext):
     @property
     def discr_class(self):
@@ -157,6 +170,7 @@ class CUDARunContext(SerialRunContext):
 
 FEAT_MPI = "mpi"
 FEAT_CUDA = "cuda"
+FEAT_NUMPY = "numpy"
 
 
 
@@ -188,6 +202,9 @@ def generate_features(allowed_features):
                 # pycuda not initialized--we'll give it the benefit of the doubt.
                 yield FEAT_CUDA
 
+    if FEAT_NUMPY in allowed_features:
+        yield FEAT_NUMPY
+
 
 
 
@@ -214,8 +231,18 @@ def guess_run_context(allow=None):
 
     if FEAT_CUDA in feat:
         serial_context = CUDARunContext()
+    elif FEAT_NUMPY in feat:
+        serial_context = NumpyRunContext()
     else:
-        serial_context = CPURunContext()
+        try:
+            import codepy  # noqa
+        except ImportError:
+            from warnings import warn
+            warn("codepy not found, falling back to the (slower) "
+                    "numpy backend")
+            serial_context = NumpyRunContext()
+        else:
+            serial_context = CPURunContext()
 
     if FEAT_MPI in feat:
         from hedge.backends.mpi import MPIRunContext
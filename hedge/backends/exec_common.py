@@ -29,6 +29,78 @@ import numpy as np
 import hedge.optemplate
 
 
+# {{{ element-local helpers for ensemble fields
+
+def element_view(vec, ers):
+    """Return a view of the part of *vec* covered by the uniform element
+    ranges *ers* as an array of shape *(element_count, el_size)*.
+
+    Leading (ensemble) axes of *vec* are carried along, so that an
+    array of shape *(m, n)* results in a view of shape
+    *(m, element_count, el_size)*.
+    """
+    return vec[..., ers.start:ers.start+ers.total_size].reshape(
+            vec.shape[:-1] + (len(ers), ers.el_size))
+
+
+def perform_elwise_operator(src_ers, dest_ers, matrix, operand, result,
+        scale_factors=None):
+    """Add *matrix* applied to each element of *operand* (optionally
+    scaled by the corresponding entry of *scale_factors*) to *result*.
+
+    This is the :mod:`numpy` counterpart of
+    :func:`hedge._internal.perform_elwise_operator`.
+    """
+    if len(src_ers) != len(dest_ers):
+        raise ValueError("element ranges have different sizes")
+
+    from pytools import to_uncomplex_dtype
+    uncomplex_dtype = to_uncomplex_dtype(operand.dtype)
+
+    # keep single-precision operands in single precision
+    el_result = np.dot(element_view(operand, src_ers),
+            np.asarray(matrix, dtype=uncomplex_dtype).T)
+    if scale_factors is not None:
+        el_result *= np.asarray(scale_factors, dtype=uncomplex_dtype)[
+                :, np.newaxis]
+
+    result_view = element_view(result, dest_ers)
+    result_view += el_result
+
+
+def perform_elwise_max(ers, field, out):
+    """Set each element of *out* covered by *ers* to the maximum of *field*
+    on that element.
+    """
+    element_view(out, ers)[:] = np.max(
+            element_view(field, ers), axis=-1)[..., np.newaxis]
+
+
+def lift_flux(fg, matrix, scaling, field, out):
+    """Add the lifted fluxes-on-faces vector *field* of face group *fg*
+    to *out*. As with :func:`perform_elwise_operator`, leading ensemble
+    axes of *field* and *out* are handled by the same matrix product.
+    """
+    el_count = fg.element_count()
+    if not el_count:
+        return
+
+    from pytools import to_uncomplex_dtype
+    uncomplex_dtype = to_uncomplex_dtype(field.dtype)
+
+    el_result = np.dot(field.reshape(field.shape[:-1] + (el_count, -1)),
+            np.asarray(matrix, dtype=uncomplex_dtype).T)
+    if scaling is not None:
+        el_result *= np.asarray(scaling, dtype=uncomplex_dtype)[
+                :, np.newaxis]
+
+    write_idx = (np.asarray(fg.local_el_write_base, dtype=np.intp)
+            [:, np.newaxis] + np.arange(matrix.shape[0]))
+    out[..., write_idx] += el_result
+
+# }}}
+
+
 class ExecutionMapperBase(hedge.optemplate.Evaluator,
         hedge.optemplate.BoundOpMapperMixin,
         hedge.optemplate.LocalOpReducerMixin):
@@ -37,6 +109,13 @@ class ExecutionMapperBase(hedge.optemplate.Evaluator,
         self.discr = executor.discr
         self.executor = executor
 
+    def release_values(self, values):
+        """Return the storage of *values*, which the compiled code no
+        longer needs, to :attr:`hedge.discretization.Discretization.buffer_pool`.
+        Arrays still referenced from the context are kept.
+        """
+        self.discr.buffer_pool.release(values, self.context.values())
+
     def map_ones(self, expr):
         # FIXME
         if expr.quadrature_tag is not None:
@@ -50,12 +129,8 @@ class ExecutionMapperBase(hedge.optemplate.Evaluator,
         # FIXME
         if expr.quadrature_tag is not None:
             raise NotImplementedError("node coordinate components on quad. grids")
-        # FIXME: Data transfer and strided CPU index every time, ugh.
-        return self.discr.convert_volume(
-                # Yes, that .copy() is necessary because much of hedge
-                # doesn't check for striding. Ugh^2.
-                self.discr.nodes[:, expr.axis].copy(),
-                kind=self.discr.compute_kind)
+        return self.discr.node_coordinate_component(
+                expr.axis, kind=self.discr.compute_kind)
 
     def map_normal_component(self, expr):
         if expr.quadrature_tag is not None:
@@ -81,6 +156,30 @@ class ExecutionMapperBase(hedge.optemplate.Evaluator,
         return (self.discr.inverse_metric_derivatives(expr.quadrature_tag)
                     [expr.xyz_axis][expr.rst_axis])
 
+    def elementwise_geometric_factor(self, expr):
+        """If *expr* is a geometric factor, return a tuple *(values,
+        el_size)* of its per-element values and the number of nodes per
+        element, see
+        :meth:`hedge.discretization.Discretization.elementwise_geometry`.
+        Otherwise, return *None*.
+        """
+        from hedge.optemplate.primitives import (
+                Jacobian, ForwardMetricDerivative, InverseMetricDerivative)
+
+        if isinstance(expr, Jacobian):
+            geo = self.discr.elementwise_geometry(expr.quadrature_tag)
+            return geo.jacobians, geo.el_size
+        elif isinstance(expr, ForwardMetricDerivative):
+            geo = self.discr.elementwise_geometry(expr.quadrature_tag)
+            return (geo.forward_metric_derivatives
+                    [expr.xyz_axis][expr.rst_axis], geo.el_size)
+        elif isinstance(expr, InverseMetricDerivative):
+            geo = self.discr.elementwise_geometry(expr.quadrature_tag)
+            return (geo.inverse_metric_derivatives
+                    [expr.xyz_axis][expr.rst_axis], geo.el_size)
+        else:
+            return None
+
     def map_call(self, expr):
         from pymbolic.primitives import Variable
         assert isinstance(expr.function, Variable)
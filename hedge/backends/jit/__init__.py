@@ -56,7 +56,10 @@ class ExecutionMapper(ExecutionMapperBase):
         else:
             compiled = insn.compiled(self.executor)
             return zip(compiled.result_names(),
-                    compiled(self, stats_callback)), []
+                    compiled(self, stats_callback,
+                        allocator=self.discr.buffer_pool.empty,
+                        evaluate_elementwise=self.elementwise_geometric_factor)
+                    ), []
 
     def exec_flux_batch_assign(self, insn):
         from pymbolic.primitives import is_zero
@@ -91,17 +94,30 @@ class ExecutionMapper(ExecutionMapperBase):
 
         def cast_arg(arg):
             if isinstance(arg, BoundaryZeros):
-                return self.discr.boundary_zeros(
-                        insn.repr_op.boundary_tag, dtype=max_dtype)
+                return self.discr.buffer_pool.zeros(
+                        self.discr.len_boundary(insn.repr_op.boundary_tag),
+                        max_dtype)
             elif isinstance(arg, VolumeZeros):
-                return self.discr.volume_zeros(
-                        dtype=max_dtype)
+                return self.discr.pooled_volume_zeros(max_dtype)
             elif isinstance(arg, np.ndarray):
                 return np.asarray(arg, dtype=max_dtype)
             else:
                 return arg
 
-        args = [cast_arg(arg) for arg in args]
+        cast_args = [cast_arg(arg) for arg in args]
+        zero_args = [cast_arg
+                for arg, cast_arg in zip(args, cast_args)
+                if isinstance(arg, ZeroSpec)]
+        args = cast_args
+
+        # Ensemble fields carry a leading axis, which the flux kernel
+        # loops over. Arguments without it (such as zeros) are shared by
+        # all ensemble members.
+        ensemble_shape = max([()] + [np.shape(arg)[:-1] for arg in args],
+                key=len)
+        if len(ensemble_shape) > 1:
+            raise ValueError("flux arguments may have at most one "
+                    "ensemble axis")
 
         if insn.quadrature_tag is None:
             if insn.is_boundary:
@@ -127,19 +143,28 @@ class ExecutionMapper(ExecutionMapperBase):
             # set up argument structure
             arg_struct = module.ArgStruct()
             for arg_name, arg in zip(insn.flux_var_info.arg_names, args):
-                setattr(arg_struct, arg_name, arg)
+                if np.ndim(arg) > 1:
+                    setattr(arg_struct, arg_name, arg.reshape(-1))
+                    setattr(arg_struct, arg_name+"_stride", arg.shape[-1])
+                else:
+                    setattr(arg_struct, arg_name, arg)
+                    setattr(arg_struct, arg_name+"_stride", 0)
             for arg_num, scalar_arg_expr in enumerate(
                     insn.flux_var_info.scalar_parameters):
                 setattr(arg_struct,
                         "_scalar_arg_%d" % arg_num,
                         self.rec(scalar_arg_expr))
 
-            fof_shape = (fg.face_count*fg.face_length()*fg.element_count(),)
+            fof_length = fg.face_count*fg.face_length()*fg.element_count()
             all_fluxes_on_faces = [
-                    np.zeros(fof_shape, dtype=max_dtype)
+                    self.discr.buffer_pool.zeros(
+                        ensemble_shape + (fof_length,), max_dtype)
                     for f in insn.expressions]
             for i, fof in enumerate(all_fluxes_on_faces):
-                setattr(arg_struct, "flux%d_on_faces" % i, fof)
+                setattr(arg_struct, "flux%d_on_faces" % i, fof.reshape(-1))
+
+            arg_struct._ensemble_size = int(np.prod(ensemble_shape))
+            arg_struct._fof_stride = fof_length
 
             # make sure everything ended up in Boost.Python attributes
             # (i.e. empty __dict__)
@@ -164,8 +189,15 @@ class ExecutionMapper(ExecutionMapperBase):
                     mat = fg.ldis_loc_quad_info.multi_face_mass_matrix()
                     scaling = None
 
-                out = self.discr.volume_zeros(dtype=fluxes_on_faces.dtype)
-                self.executor.lift_flux(fg, mat, scaling, fluxes_on_faces, out)
+                out = self.discr.pooled_volume_zeros(fluxes_on_faces.dtype,
+                        shape=ensemble_shape)
+                if ensemble_shape:
+                    # one matrix product for all ensemble members
+                    from hedge.backends.exec_common import lift_flux
+                    lift_flux(fg, mat, scaling, fluxes_on_faces, out)
+                else:
+                    self.executor.lift_flux(fg, mat, scaling,
+                            fluxes_on_faces, out)
 
                 if self.discr.instrumented:
                     from hedge.tools import lift_flops
@@ -175,20 +207,37 @@ class ExecutionMapper(ExecutionMapperBase):
 
                 result.append((name, out))
 
+            self.discr.buffer_pool.release(all_fluxes_on_faces)
+
+        self.discr.buffer_pool.release(zero_args)
+
         if not face_groups:
             # No face groups? Still assign context variables.
             for name, flux_bdg in zip(insn.names, insn.expressions):
-                result.append((name, self.discr.volume_zeros()))
+                result.append((name, self.discr.volume_zeros(
+                    shape=ensemble_shape, dtype=max_dtype)))
 
         return result, []
 
     def exec_diff_batch_assign(self, insn):
-        rst_diff = self.executor.diff(insn.operators, self.rec(insn.field))
+        field = self.rec(insn.field)
+        if field.ndim > 1:
+            rst_diff, = self.executor.diff_fields([insn.operators], [field])
+        else:
+            rst_diff = self.executor.diff(insn.operators, field)
 
         return [(name, diff) for name, diff in zip(insn.names, rst_diff)], []
 
     exec_quad_diff_batch_assign = exec_diff_batch_assign
 
+    def exec_multi_field_diff_batch_assign(self, insn):
+        field_diffs = self.executor.diff_fields(insn.operators,
+                [self.rec(field) for field in insn.fields])
+
+        return [(name, diff)
+                for field_names, diffs in zip(insn.names, field_diffs)
+                for name, diff in zip(field_names, diffs)], []
+
     # }}}
 
     # {{{ expression mappings -------------------------------------------------
@@ -211,7 +260,7 @@ class ExecutionMapper(ExecutionMapperBase):
         true_indices = np.nonzero(bool_crit)
         false_indices = np.nonzero(~bool_crit)
 
-        result = np.empty_like(crit)
+        result = self.discr.buffer_pool.empty(crit.shape, crit.dtype)
 
         if isinstance(then, np.ndarray):
             then = then[true_indices]
@@ -230,8 +279,8 @@ class ExecutionMapper(ExecutionMapperBase):
         true_indices = np.nonzero(bool_crit)
         false_indices = np.nonzero(~bool_crit)
 
-        result = self.discr.volume_empty(
-                kind=self.discr.compute_kind)
+        result = self.discr.pooled_volume_empty(
+                shape=np.shape(bool_crit)[:-1])
 
         if isinstance(then, np.ndarray):
             then = then[true_indices]
@@ -253,7 +302,7 @@ class ExecutionMapper(ExecutionMapperBase):
         if is_zero(field):
             return 0
 
-        out = self.discr.volume_zeros()
+        out = self.discr.pooled_volume_zeros(shape=field.shape[:-1])
         self.executor.do_elementwise_linear(op, field, out)
         return out
 
@@ -266,13 +315,12 @@ class ExecutionMapper(ExecutionMapperBase):
 
         qtag = op.quadrature_tag
 
-        from hedge._internal import perform_elwise_operator
-
-        out = self.discr.volume_zeros()
+        out = self.discr.pooled_volume_zeros(field.dtype,
+                shape=field.shape[:-1])
         for eg in self.discr.element_groups:
             eg_quad_info = eg.quadrature_info[qtag]
 
-            perform_elwise_operator(eg_quad_info.ranges, eg.ranges,
+            self.perform_elwise_operator(eg_quad_info.ranges, eg.ranges,
                     eg_quad_info.ldis_quad_info.mass_matrix(),
                     field, out)
 
@@ -287,14 +335,14 @@ class ExecutionMapper(ExecutionMapperBase):
 
         qtag = op.quadrature_tag
 
-        from hedge._internal import perform_elwise_operator
         quad_info = self.discr.get_quadrature_info(qtag)
 
-        out = np.zeros(quad_info.node_count, field.dtype)
+        out = self.discr.buffer_pool.zeros(
+                field.shape[:-1] + (quad_info.node_count,), field.dtype)
         for eg in self.discr.element_groups:
             eg_quad_info = eg.quadrature_info[qtag]
 
-            perform_elwise_operator(eg.ranges, eg_quad_info.ranges,
+            self.perform_elwise_operator(eg.ranges, eg_quad_info.ranges,
                 eg_quad_info.ldis_quad_info.volume_up_interpolation_matrix(),
                 field, out)
 
@@ -309,14 +357,15 @@ class ExecutionMapper(ExecutionMapperBase):
 
         qtag = op.quadrature_tag
 
-        from hedge._internal import perform_elwise_operator
         quad_info = self.discr.get_quadrature_info(qtag)
 
-        out = np.zeros(quad_info.int_faces_node_count, field.dtype)
+        out = self.discr.buffer_pool.zeros(
+                field.shape[:-1] + (quad_info.int_faces_node_count,),
+                field.dtype)
         for eg in self.discr.element_groups:
             eg_quad_info = eg.quadrature_info[qtag]
 
-            perform_elwise_operator(eg.ranges, eg_quad_info.el_faces_ranges,
+            self.perform_elwise_operator(eg.ranges, eg_quad_info.el_faces_ranges,
                 eg_quad_info.ldis_quad_info.volume_to_face_up_interpolation_matrix(),
                 field, out)
 
@@ -332,32 +381,55 @@ class ExecutionMapper(ExecutionMapperBase):
         bdry = self.discr.get_boundary(op.boundary_tag)
         bdry_q_info = bdry.get_quadrature_info(op.quadrature_tag)
 
-        out = np.zeros(bdry_q_info.node_count, field.dtype)
+        out = self.discr.buffer_pool.zeros(
+                field.shape[:-1] + (bdry_q_info.node_count,), field.dtype)
 
-        from hedge._internal import perform_elwise_operator
         for fg, from_ranges, to_ranges, ldis_quad_info in zip(
                 bdry.face_groups,
                 bdry.fg_ranges,
                 bdry_q_info.fg_ranges,
                 bdry_q_info.fg_ldis_quad_infos):
-            perform_elwise_operator(from_ranges, to_ranges,
+            self.perform_elwise_operator(from_ranges, to_ranges,
                 ldis_quad_info.face_up_interpolation_matrix(),
                 field, out)
 
         return out
 
     def map_elementwise_max(self, op, field_expr):
-        from hedge._internal import perform_elwise_max
         field = self.rec(field_expr)
 
-        out = self.discr.volume_zeros(dtype=field.dtype)
+        out = self.discr.pooled_volume_zeros(field.dtype,
+                shape=field.shape[:-1])
         for eg in self.discr.element_groups:
-            perform_elwise_max(eg.ranges, field, out)
+            self.perform_elwise_max(eg.ranges, field, out)
 
         return out
 
     # }}}
 
+    # {{{ element-local operations ------------------------------------------
+
+    # Ensemble fields (with leading axes) are handled by the matrix-matrix
+    # products in hedge.backends.exec_common.
+
+    def perform_elwise_operator(self, src_ers, dest_ers, matrix, field, out):
+        if field.ndim > 1:
+            from hedge.backends.exec_common import perform_elwise_operator
+        else:
+            from hedge._internal import perform_elwise_operator
+
+        perform_elwise_operator(src_ers, dest_ers, matrix, field, out)
+
+    def perform_elwise_max(self, ers, field, out):
+        if field.ndim > 1:
+            from hedge.backends.exec_common import perform_elwise_max
+        else:
+            from hedge._internal import perform_elwise_max
+
+        perform_elwise_max(ers, field, out)
+
+    # }}}
+
 # }}}
 
 
@@ -369,6 +441,7 @@ class Executor(object):
         self.code = self.compile_optemplate(discr, optemplate,
                 post_bind_mapper, type_hints)
         self.elwise_linear_cache = {}
+        self.diff_fields_matrix_cache = {}
 
         if "dump_op_code" in discr.debug:
             from hedge.tools import open_unique_debug_file
@@ -434,8 +507,14 @@ class Executor(object):
                 mesh=discr.mesh,
                 type_hints=type_hints)
 
+        code = self.make_compiler(discr)(optemplate, type_hints)
+        code.use_execution_plan = "no_execution_plan" not in discr.debug
+        code.thread_pool = discr.instruction_thread_pool
+        return code
+
+    def make_compiler(self, discr):
         from hedge.backends.jit.compiler import OperatorCompiler
-        return OperatorCompiler(discr)(optemplate, type_hints)
+        return OperatorCompiler(discr)
 
     def instrument(self):
         discr = self.discr
@@ -472,6 +551,22 @@ class Executor(object):
                         discr.lift_timer,
                         discr.lift_counter)
 
+        diff_fields = self.diff_fields
+        flops_per_diff = diff_rst_flops(discr)
+
+        def instrumented_diff_fields(operators, fields):
+            diff_count = sum(len(field_ops) for field_ops in operators)
+            discr.diff_counter.add(diff_count)
+            discr.diff_flop_counter.add(diff_count*flops_per_diff)
+
+            sub_timer = discr.diff_timer.start_sub_timer()
+            try:
+                return diff_fields(operators, fields)
+            finally:
+                sub_timer.stop().submit()
+
+        self.diff_fields = instrumented_diff_fields
+
     def lift_flux(self, fgroup, matrix, scaling, field, out):
         from hedge._internal import lift_flux
         from pytools import to_uncomplex_dtype
@@ -480,7 +575,7 @@ class Executor(object):
                 scaling, field, out)
 
     def diff_rst(self, op, field):
-        result = self.discr.volume_zeros(dtype=field.dtype)
+        result = self.discr.pooled_volume_zeros(field.dtype)
 
         from hedge._internal import perform_elwise_operator
         for eg in self.discr.element_groups:
@@ -498,6 +593,84 @@ class Executor(object):
 
         return [self.diff_rst(op, field) for op in operators]
 
+    def diff_fields(self, operators, fields):
+        """For each entry of *fields*, return the local derivatives given
+        by the corresponding list of reference differentiation operators
+        in *operators*.
+
+        The derivatives of all fields along all required reference axes
+        are obtained from a single matrix product per element group,
+        with the (stacked) differentiation matrices applied to
+        *element count* times *field count* columns at once.
+
+        Fields may have leading (ensemble) axes, each entry along which
+        adds to the columns of the matrix product.
+        """
+        if len(set(field.dtype for field in fields)) > 1:
+            return [self.diff_fields([field_ops], [field])[0]
+                    if field.ndim > 1 else self.diff(field_ops, field)
+                    for field_ops, field in zip(operators, fields)]
+
+        dtype = fields[0].dtype
+        rep_op = operators[0][0]
+
+        # each field contributes one row of the operand per ensemble member
+        field_row_counts = [
+                field.size // field.shape[-1] for field in fields]
+        field_row_starts = np.cumsum([0] + field_row_counts)
+        row_count = field_row_starts[-1]
+        axes = sorted(set(op.rst_axis
+            for field_ops in operators
+            for op in field_ops))
+
+        results = [
+                dict((axis, self.discr.pooled_volume_zeros(dtype,
+                    shape=field.shape[:-1]))
+                    for axis in axes)
+                for field in fields]
+
+        for eg in self.discr.element_groups:
+            try:
+                stacked_matrix = self.diff_fields_matrix_cache[
+                        eg, rep_op, tuple(axes), dtype]
+            except KeyError:
+                matrices = rep_op.matrices(eg)
+                stacked_matrix = np.asarray(
+                        np.vstack([matrices[axis] for axis in axes]).T,
+                        dtype=dtype, order="C")
+                self.diff_fields_matrix_cache[
+                        eg, rep_op, tuple(axes), dtype] = stacked_matrix
+
+            from_ers = rep_op.preimage_ranges(eg)
+            to_ers = eg.ranges
+            el_count = len(to_ers)
+
+            operand = self.discr.buffer_pool.empty(
+                    (row_count, el_count, from_ers.el_size), dtype)
+            for i, field in enumerate(fields):
+                operand[field_row_starts[i]:field_row_starts[i+1]] = field[
+                        ..., from_ers.start:from_ers.start+from_ers.total_size] \
+                                .reshape(-1, el_count, from_ers.el_size)
+
+            # shape: (row, element, axis, node)
+            eg_result = np.dot(
+                    operand.reshape(-1, from_ers.el_size),
+                    stacked_matrix).reshape(
+                            row_count, el_count, len(axes), to_ers.el_size)
+            self.discr.buffer_pool.release(operand)
+
+            to_slice = slice(to_ers.start, to_ers.start+to_ers.total_size)
+            for i, (field, field_results) in enumerate(zip(fields, results)):
+                field_rows = eg_result[
+                        field_row_starts[i]:field_row_starts[i+1]]
+                for j, axis in enumerate(axes):
+                    field_results[axis][..., to_slice] = \
+                            field_rows[:, :, j, :].reshape(
+                                    field.shape[:-1] + (-1,))
+
+        return [[field_results[op.rst_axis] for op in field_ops]
+                for field_ops, field_results in zip(operators, results)]
+
     def do_elementwise_linear(self, op, field, out):
         for eg in self.discr.element_groups:
             try:
@@ -507,6 +680,12 @@ class Executor(object):
                 coeffs = op.coefficients(eg)
                 self.elwise_linear_cache[eg, op, field.dtype] = matrix, coeffs
 
+            if field.ndim > 1:
+                from hedge.backends.exec_common import perform_elwise_operator
+                perform_elwise_operator(eg.ranges, eg.ranges,
+                        matrix, field, out, scale_factors=coeffs)
+                continue
+
             from hedge._internal import (
                     perform_elwise_scaled_operator,
                     perform_elwise_operator)
@@ -544,9 +723,33 @@ class Discretization(hedge.discretization.Discretization):
                 | set(["jit_dont_optimize_large_exprs"]))
 
     def __init__(self, *args, **kwargs):
+        """
+        :param toolchain: a :class:`codepy.toolchain.Toolchain` used to
+          compile kernels.
+        :param kernel_cache: a :class:`hedge.backends.jit.cache.KernelCache`,
+          a directory name in which to keep one, or *True* to keep one in
+          :func:`hedge.backends.jit.cache.get_default_cache_dir`. If
+          *None* (the default), a cache is only used if the environment
+          variable :envvar:`HEDGE_KERNEL_CACHE_DIR` names its directory.
+          *False* disables the persistent cache.
+        :param thread_count: the number of threads among which element
+          loops in differentiation, lifting and element-local operators
+          are split. Requires OpenMP support in the compiler (and, for
+          element-local operators, in the build of :mod:`hedge._internal`).
+          Since :mod:`hedge._internal` keeps a single, process-wide
+          thread count, the most recently created discretization
+          determines the thread count of its element-local operators.
+        :param instruction_thread_count: if larger than one, independent
+          instructions of compiled operators are executed concurrently
+          on a pool of this many threads. See
+          :meth:`hedge.compiler.Code.execute_concurrent`.
+        """
         logger.info("init jit discretization: start")
 
         toolchain = kwargs.pop("toolchain", None)
+        kernel_cache = kwargs.pop("kernel_cache", None)
+        thread_count = kwargs.pop("thread_count", 1)
+        instruction_thread_count = kwargs.pop("instruction_thread_count", 1)
 
         # tolerate (and ignore) the CUDA backend's tune_for argument
         kwargs.pop("tune_for", None)
@@ -561,10 +764,54 @@ class Discretization(hedge.discretization.Discretization):
         from codepy.libraries import add_hedge
         add_hedge(toolchain)
 
+        if thread_count < 1:
+            raise ValueError("thread_count must be positive")
+
+        self.thread_count = thread_count
+        if thread_count > 1:
+            from hedge.backends.jit.threads import add_openmp
+            toolchain = add_openmp(toolchain)
+
+        from hedge._internal import set_thread_count
+        set_thread_count(thread_count)
+
         self.toolchain = toolchain
 
+        from hedge.backends.jit.cache import KernelCache
+        if kernel_cache is None:
+            import os
+            if "HEDGE_KERNEL_CACHE_DIR" in os.environ:
+                kernel_cache = KernelCache()
+        elif kernel_cache is True:
+            kernel_cache = KernelCache()
+        elif kernel_cache is False:
+            kernel_cache = None
+        elif isinstance(kernel_cache, basestring):
+            kernel_cache = KernelCache(kernel_cache)
+
+        self.kernel_cache = kernel_cache
+
+        from hedge.backends.jit.threads import make_instruction_thread_pool
+        self.instruction_thread_pool = make_instruction_thread_pool(
+                instruction_thread_count)
+
         logger.info("init jit discretization: done")
 
+    def close(self):
+        if self.kernel_cache is not None:
+            logger.info("kernel cache: %(hits)d hits, %(misses)d misses, "
+                    "%(evictions)d evictions" % self.kernel_cache.stats())
+
+        logger.info("buffer pool: %(allocations)d allocations, "
+                "%(reuses)d reuses, %(held_bytes)d bytes held"
+                % self.buffer_pool.stats())
+
+        from hedge.backends.jit.threads import close_instruction_thread_pool
+        close_instruction_thread_pool(self.instruction_thread_pool)
+        self.instruction_thread_pool = None
+
+        hedge.discretization.Discretization.close(self)
+
 # }}}
 
 
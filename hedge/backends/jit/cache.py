@@ -0,0 +1,383 @@
+"""Persistent on-disk cache for just-in-time compiled kernels."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+import os
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+CACHE_FORMAT_VERSION = 1
+
+DEFAULT_MAX_SIZE = 512 * 1024**2
+
+
+def get_default_cache_dir():
+    try:
+        return os.environ["HEDGE_KERNEL_CACHE_DIR"]
+    except KeyError:
+        return os.path.join(os.path.expanduser("~"),
+                ".cache", "hedge", "kernels")
+
+
+_HEADER_CHECKSUM = []
+
+
+def _get_header_checksum():
+    """Return a checksum of hedge's C++ headers, which the generated
+    kernels include. Kernels compiled against stale headers must not be
+    reused.
+    """
+    if not _HEADER_CHECKSUM:
+        from hashlib import sha1
+        checksum = sha1()
+
+        from os.path import dirname, join
+        from glob import glob
+        import hedge
+        hdr_dir = join(dirname(hedge.__file__), "include", "hedge")
+        for hdr_name in sorted(glob(join(hdr_dir, "*.hpp"))):
+            checksum.update(open(hdr_name, "rb").read())
+
+        _HEADER_CHECKSUM.append(checksum.hexdigest())
+
+    return _HEADER_CHECKSUM[0]
+
+
+def get_toolchain_id(toolchain):
+    """Return a string that identifies everything about *toolchain*
+    that can influence the generated machine code.
+    """
+    try:
+        abi_id = toolchain.abi_id()
+    except AttributeError:
+        abi_id = None
+
+    return repr([abi_id] + [
+        getattr(toolchain, attr, None)
+        for attr in [
+            "cc", "ld", "cflags", "ldflags", "libraries",
+            "include_dirs", "library_dirs", "defines", "undefines",
+            "so_ext"]])
+
+
+_DEPENDENCY_CHECKSUMS = {}
+
+
+def _get_dependency_checksum(toolchain):
+    """Return a checksum identifying the installed versions of the
+    libraries the kernels are compiled and linked against: the Boost
+    and PyUblas headers, the libraries in *toolchain*, and the extension
+    modules whose types the kernels exchange. Upgrading any of them in
+    place must invalidate the cached kernels.
+    """
+    toolchain_id = get_toolchain_id(toolchain)
+    try:
+        return _DEPENDENCY_CHECKSUMS[toolchain_id]
+    except KeyError:
+        pass
+
+    from hashlib import sha1
+    from glob import glob
+    checksum = sha1()
+
+    def add_file_stamp(filename):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return
+        checksum.update(repr((filename, st.st_size, st.st_mtime)))
+
+    for include_dir in getattr(toolchain, "include_dirs", []):
+        for hdr_name in ["boost/version.hpp", "pyublas/numpy.hpp"]:
+            hdr_name = os.path.join(include_dir, hdr_name)
+            if os.path.exists(hdr_name):
+                checksum.update(open(hdr_name, "rb").read())
+
+    for library in getattr(toolchain, "libraries", []):
+        for library_dir in getattr(toolchain, "library_dirs", []):
+            for filename in sorted(glob(
+                    os.path.join(library_dir, "lib%s.*" % library))):
+                add_file_stamp(filename)
+
+    import sys
+    for module_name in ["hedge._internal", "pyublas._internal"]:
+        try:
+            __import__(module_name)
+        except ImportError:
+            continue
+        add_file_stamp(getattr(sys.modules[module_name], "__file__", ""))
+
+    result = _DEPENDENCY_CHECKSUMS[toolchain_id] = checksum.hexdigest()
+    return result
+
+
+class KernelCache(object):
+    """A content-addressed store of compiled kernel extension modules.
+
+    Entries are keyed on the generated source, the data types involved
+    and the compiler toolchain, so that kernels survive across runs and
+    are shared between processes (such as MPI ranks) using the same
+    *cache_dir*. Entries are published by atomic rename, so concurrent
+    writers at worst compile the same kernel twice.
+
+    Once the cache grows beyond *max_size* bytes, least recently used
+    entries are evicted. If *cache_dir* cannot be written to, existing
+    entries are still used, but new kernels are not stored.
+
+    .. attribute:: hits
+    .. attribute:: misses
+    .. attribute:: evictions
+    """
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        if cache_dir is None:
+            cache_dir = get_default_cache_dir()
+
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # Modules loaded by this process, by key. Also ensures that
+        # each extension module is only loaded once.
+        self.loaded_modules = {}
+
+        self.writable = self._check_writable()
+        if not self.writable:
+            logger.warn("kernel cache directory '%s' is not writable, "
+                    "not storing kernels" % cache_dir)
+
+    def _check_writable(self):
+        try:
+            os.makedirs(self.cache_dir)
+        except OSError:
+            if not os.path.isdir(self.cache_dir):
+                return False
+
+        return os.access(self.cache_dir, os.W_OK | os.X_OK)
+
+    # {{{ key computation
+
+    def get_key(self, mod, toolchain, extra=()):
+        from hashlib import sha1
+        import sys
+        checksum = sha1()
+        for part in [
+                str(CACHE_FORMAT_VERSION),
+                sys.version,
+                _get_header_checksum(),
+                get_toolchain_id(toolchain),
+                _get_dependency_checksum(toolchain),
+                repr(extra),
+                mod.generate()]:
+            checksum.update(str(part))
+
+        return checksum.hexdigest()
+
+    def _get_entry_filename(self, key, mod, toolchain):
+        return os.path.join(self.cache_dir, key[:2],
+                "%s-%s%s" % (key, mod.name,
+                    getattr(toolchain, "so_ext", ".so")))
+
+    # }}}
+
+    # {{{ compilation
+
+    def compile(self, mod, toolchain, extra=()):
+        """Return the compiled module *mod*, which must be a
+        :class:`codepy.bpl.BoostPythonModule`, either from the cache
+        or by compiling it with *toolchain*.
+
+        :param extra: any further (hashable, repr-able) data that
+          distinguishes this kernel, such as the data type it
+          operates on.
+        """
+        key = self.get_key(mod, toolchain, extra)
+
+        try:
+            return self.loaded_modules[key]
+        except KeyError:
+            pass
+
+        filename = self._get_entry_filename(key, mod, toolchain)
+
+        result = None
+        if os.path.exists(filename):
+            try:
+                result = self._load(mod.name, filename)
+            except ImportError:
+                # Entry may have been evicted by a concurrent process
+                # or may be truncated--treat as a miss.
+                logger.warn("kernel cache entry '%s' unusable, recompiling"
+                        % filename)
+            else:
+                self.hits += 1
+                try:
+                    # bump LRU time stamp
+                    os.utime(filename, None)
+                except OSError:
+                    pass
+
+        if result is None:
+            self.misses += 1
+            result = mod.compile(toolchain)
+            if self.writable:
+                self._store(result, filename)
+
+        self.loaded_modules[key] = result
+        return result
+
+    def _load(self, mod_name, filename):
+        import imp
+        return imp.load_dynamic(mod_name, filename)
+
+    def _store(self, compiled_mod, filename):
+        src_filename = getattr(compiled_mod, "__file__", None)
+        if src_filename is None:
+            return
+
+        entry_dir = os.path.dirname(filename)
+        try:
+            os.makedirs(entry_dir)
+        except OSError:
+            if not os.path.isdir(entry_dir):
+                logger.warn("unable to create kernel cache directory '%s'"
+                        % entry_dir)
+                return
+
+        from tempfile import mkstemp
+        from shutil import copyfileobj
+        try:
+            fd, tmp_filename = mkstemp(dir=entry_dir, suffix=".tmp")
+            try:
+                tmp_file = os.fdopen(fd, "wb")
+                try:
+                    copyfileobj(open(src_filename, "rb"), tmp_file)
+                finally:
+                    tmp_file.close()
+
+                # atomic on POSIX, so readers never see partial entries
+                os.rename(tmp_filename, filename)
+            except:
+                os.unlink(tmp_filename)
+                raise
+        except (IOError, OSError), e:
+            logger.warn("unable to store kernel in cache: %s" % e)
+            return
+
+        self.enforce_size_limit()
+
+    # }}}
+
+    # {{{ housekeeping
+
+    def get_entries(self):
+        """Return a list of tuples *(access_time, size, filename)*
+        for all entries in the cache.
+        """
+        result = []
+        if not os.path.isdir(self.cache_dir):
+            return result
+
+        for subdir in os.listdir(self.cache_dir):
+            subdir = os.path.join(self.cache_dir, subdir)
+            if not os.path.isdir(subdir):
+                continue
+
+            for name in os.listdir(subdir):
+                if name.endswith(".tmp"):
+                    continue
+
+                filename = os.path.join(subdir, name)
+                try:
+                    st = os.stat(filename)
+                except OSError:
+                    # removed by a concurrent process
+                    continue
+
+                result.append((st.st_mtime, st.st_size, filename))
+
+        return result
+
+    def total_size(self):
+        return sum(size for atime, size, filename in self.get_entries())
+
+    def enforce_size_limit(self):
+        if self.max_size is None:
+            return
+
+        entries = self.get_entries()
+        total_size = sum(size for atime, size, filename in entries)
+        if total_size <= self.max_size:
+            return
+
+        entries.sort()
+        for atime, size, filename in entries:
+            if total_size <= self.max_size:
+                break
+
+            try:
+                os.unlink(filename)
+            except OSError:
+                # already evicted by a concurrent process
+                pass
+            else:
+                self.evictions += 1
+
+            total_size -= size
+
+    def clear(self):
+        for atime, size, filename in self.get_entries():
+            try:
+                os.unlink(filename)
+            except OSError:
+                pass
+
+    def stats(self):
+        return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                }
+
+    # }}}
+
+
+def compile_module(discr, mod, toolchain, extra=()):
+    """Compile the :class:`codepy.bpl.BoostPythonModule` *mod* using
+    *discr*'s kernel cache, if it has one.
+    """
+    cache = getattr(discr, "kernel_cache", None)
+    if cache is None:
+        return mod.compile(toolchain)
+    else:
+        return cache.compile(mod, toolchain, extra)
+
+# vim: foldmethod=marker
@@ -64,7 +64,8 @@ class VectorExprAssign(Assign):
                     for name, expr, dnr in zip(
                         self.names, self.exprs, self.do_not_return)],
                 result_dtype_getter=simple_result_dtype_getter,
-                toolchain=toolchain)
+                toolchain=toolchain,
+                kernel_cache=discr.kernel_cache)
 
 
 class CompiledFluxBatchAssign(FluxBatchAssign):
@@ -130,7 +131,8 @@ class CompiledFluxBatchAssign(FluxBatchAssign):
 class OperatorCompiler(OperatorCompilerBase):
     def __init__(self, discr):
         OperatorCompilerBase.__init__(self,
-                max_vectors_in_batch_expr=100)
+                max_vectors_in_batch_expr=100,
+                batch_diff_fields=True)
         self.discr = discr
 
     def get_contained_fluxes(self, expr):
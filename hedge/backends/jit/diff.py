@@ -57,6 +57,8 @@ class JitDifferentiator:
                 Define)
 
         from pytools import to_uncomplex_dtype
+        from hedge.backends.jit.threads import (
+                get_element_loop_pragmas, get_gil_release)
 
         from codepy.bpl import BoostPythonModule
         mod = BoostPythonModule()
@@ -130,12 +132,14 @@ class JitDifferentiator:
             make_it("result%d" % i, is_const=False)
             for i in range(discr.dimensions)
             ]+[
+            Initializer(Value("const int", "el_count"), "to_ers.size()"),
             Line(),
         # }}}
 
         # {{{ computation
-            For("element_number_t eg_el_nr = 0",
-                "eg_el_nr < to_ers.size()",
+            ]+get_gil_release()+get_element_loop_pragmas(discr)+[
+            For("int eg_el_nr = 0",
+                "eg_el_nr < el_count",
                 "++eg_el_nr",
                 Block([
                     Initializer(
@@ -183,7 +187,8 @@ class JitDifferentiator:
         #print mod.generate()
         #raw_input()
 
-        compiled_func = mod.compile(self.discr.toolchain).diff
+        from hedge.backends.jit.cache import compile_module
+        compiled_func = compile_module(discr, mod, discr.toolchain).diff
 
         if self.discr.instrumented:
             from hedge.tools import time_count_flop
@@ -209,7 +214,7 @@ class JitDifferentiator:
         # pick a "representative operator"
         rep_op = operators[0]
 
-        result = [self.discr.volume_zeros(dtype=field.dtype) 
+        result = [self.discr.pooled_volume_zeros(field.dtype)
                 for i in range(self.discr.dimensions)]
         from hedge.tools import is_zero
         if not is_zero(field):
@@ -220,6 +220,67 @@ def get_flux_var_info(fluxes):
 
 
 
+def get_ensemble_struct_members(fvi):
+    """Return a list of :mod:`cgen` declarations for the argument structure
+    of a flux gather kernel that describe the layout of ensemble fields.
+
+    For fields with a leading ensemble axis, the stride is the length of
+    one member's field. Arguments that are shared among all members
+    (such as boundary data) have a stride of zero.
+    """
+    from cgen import Value
+    return [
+            Value("unsigned", "_ensemble_size"),
+            Value("unsigned", "_fof_stride"),
+            ]+[
+            Value("unsigned", "%s_stride" % arg_name)
+            for arg_name in fvi.arg_names]
+
+
+def make_ensemble_member_loop(fluxes, fvi, body):
+    """Return a list of :mod:`cgen` statements that execute the statements
+    in *body* once for each ensemble member, with the iterators
+    *fluxN_it* and *argN_it* pointing to that member's data.
+    """
+    from cgen import Block, For, Initializer, Value, Const, Line
+    from hedge.backends.jit.threads import get_gil_release
+
+    return [
+        Initializer(
+            Value("numpy_array<value_type>::iterator", "fof%d_base" % i),
+            "args.flux%d_on_faces.begin()" % i)
+        for i in range(len(fluxes))
+        ]+[
+        Initializer(
+            Value("numpy_array<value_type>::const_iterator",
+                "%s_base" % arg_name),
+            "args.%s.begin()" % arg_name)
+        for arg_name in fvi.arg_names
+        ]+[
+        Line(),
+        ]+get_gil_release()+[
+        For("unsigned member = 0",
+            "member < args._ensemble_size",
+            "++member",
+            Block([
+                Initializer(
+                    Const(Value("numpy_array<value_type>::iterator",
+                        "fof%d_it" % i)),
+                    "fof%d_base + member*args._fof_stride" % i)
+                for i in range(len(fluxes))
+                ]+[
+                Initializer(
+                    Const(Value("numpy_array<value_type>::const_iterator",
+                        "%s_it" % arg_name)),
+                    "%(name)s_base + member*args.%(name)s_stride"
+                    % {"name": arg_name})
+                for arg_name in fvi.arg_names
+                ]+[
+                Line(),
+                ]+body))
+        ]
+
+
 def get_flux_toolchain(discr, fluxes):
     from hedge.flux import FluxFlopCounter
     flop_count = sum(FluxFlopCounter()(flux.op.flux) for flux in fluxes)
@@ -241,7 +302,9 @@ def get_interior_flux_mod(fluxes, fvi, discr, dtype):
             FunctionDeclaration, FunctionBody, \
             Const, Reference, Value, MaybeUnused, Typedef, POD, \
             Statement, Include, Line, Block, Initializer, Assign, \
-            CustomLoop, For, Struct
+            For, Struct
+
+    from hedge.backends.jit.threads import make_face_pair_loop
 
     from codepy.bpl import BoostPythonModule
     mod = BoostPythonModule()
@@ -277,7 +340,7 @@ def get_interior_flux_mod(fluxes, fvi, discr, dtype):
         Value("value_type" if scalar_par.is_complex else "uncomplex_type",
             "_scalar_arg_%d" % i)
         for i, scalar_par in enumerate(fvi.scalar_parameters)
-        ])
+        ]+get_ensemble_struct_members(fvi))
 
     mod.add_struct(arg_struct, "ArgStruct")
     mod.add_to_module([Line()])
@@ -308,19 +371,8 @@ def get_interior_flux_mod(fluxes, fvi, discr, dtype):
             Initializer(Value("value_type", cse_name), cse_str)
             for cse_name, cse_str in f2cm.cse_name_list] + result
 
-    fbody = Block([
-        Initializer(
-            Const(Value("numpy_array<value_type>::iterator", "fof%d_it" % i)),
-            "args.flux%d_on_faces.begin()" % i)
-        for i in range(len(fluxes))
-        ]+[
-        Initializer(
-            Const(Value("numpy_array<value_type>::const_iterator", "%s_it" % arg_name)),
-            "args.%s.begin()" % arg_name)
-        for arg_name in fvi.arg_names
-        ]+[
-        Line(),
-        CustomLoop("BOOST_FOREACH(const face_pair<straight_face> &fp, fg.face_pairs)", Block(
+    fbody = Block(make_ensemble_member_loop(fluxes, fvi,
+        make_face_pair_loop(discr,
             list(flatten([
             Initializer(Value("node_number_t", "%s_ebi" % where),
                 "fp.%s.el_base_index" % where),
@@ -350,14 +402,15 @@ def get_interior_flux_mod(fluxes, fvi, discr, dtype):
                     )
                 )
             ]))
-        ])
+        )
     mod.add_function(FunctionBody(fdecl, fbody))
 
     #print "----------------------------------------------------------------"
     #print mod.generate()
     #raw_input("[Enter]")
 
-    return mod.compile(get_flux_toolchain(discr, fluxes))
+    from hedge.backends.jit.cache import compile_module
+    return compile_module(discr, mod, get_flux_toolchain(discr, fluxes))
 
 
 
@@ -367,9 +420,10 @@ def get_boundary_flux_mod(fluxes, fvi, discr, dtype):
             FunctionDeclaration, FunctionBody, Typedef, Struct, \
             Const, Reference, Value, POD, MaybeUnused, \
             Statement, Include, Line, Block, Initializer, Assign, \
-            CustomLoop, For
+            For
 
     from pytools import to_uncomplex_dtype, flatten
+    from hedge.backends.jit.threads import make_face_pair_loop
 
     from codepy.bpl import BoostPythonModule
     mod = BoostPythonModule()
@@ -398,7 +452,7 @@ def get_boundary_flux_mod(fluxes, fvi, discr, dtype):
         ]+[
         Value("numpy_array<value_type>", arg_name)
         for arg_name in fvi.arg_names
-        ])
+        ]+get_ensemble_struct_members(fvi))
 
     mod.add_struct(arg_struct, "ArgStruct")
     mod.add_to_module([Line()])
@@ -426,20 +480,8 @@ def get_boundary_flux_mod(fluxes, fvi, discr, dtype):
             Initializer(Value("value_type", cse_name), cse_str)
             for cse_name, cse_str in f2cm.cse_name_list] + result
 
-    fbody = Block([
-        Initializer(
-            Const(Value("numpy_array<value_type>::iterator", "fof%d_it" % i)),
-            "args.flux%d_on_faces.begin()" % i)
-        for i in range(len(fluxes))
-        ]+[
-        Initializer(
-            Const(Value("numpy_array<value_type>::const_iterator",
-                "%s_it" % arg_name)),
-            "args.%s.begin()" % arg_name)
-        for arg_name in fvi.arg_names
-        ]+[
-        Line(),
-        CustomLoop("BOOST_FOREACH(const face_pair<straight_face> &fp, fg.face_pairs)", Block(
+    fbody = Block(make_ensemble_member_loop(fluxes, fvi,
+        make_face_pair_loop(discr,
             list(flatten([
             Initializer(Value("node_number_t", "%s_ebi" % where),
                 "fp.%s.el_base_index" % where),
@@ -469,7 +511,7 @@ def get_boundary_flux_mod(fluxes, fvi, discr, dtype):
                     )
                 )
             ]))
-        ])
+        )
 
     mod.add_function(FunctionBody(fdecl, fbody))
 
@@ -477,4 +519,5 @@ def get_boundary_flux_mod(fluxes, fvi, discr, dtype):
     #print mod.generate()
     #raw_input("[Enter]")
 
-    return mod.compile(get_flux_toolchain(discr, fluxes))
+    from hedge.backends.jit.cache import compile_module
+    return compile_module(discr, mod, get_flux_toolchain(discr, fluxes))
@@ -47,6 +47,8 @@ class JitLifter:
                 Define)
 
         from pytools import to_uncomplex_dtype
+        from hedge.backends.jit.threads import (
+                get_element_loop_pragmas, get_gil_release)
 
         from codepy.bpl import BoostPythonModule
         mod = BoostPythonModule()
@@ -88,7 +90,7 @@ class JitLifter:
                     Value("numpy_array<value_type>", "field"),
                     Value("numpy_array<value_type>", "result")
                     ]+if_(with_scale,
-                        Const(Reference(Value("numpy_array<double>",
+                        Const(Reference(Value("numpy_array<uncomplex_type>",
                             "elwise_post_scaling"))))
                     )
 
@@ -105,10 +107,13 @@ class JitLifter:
         fbody = Block([
             make_it("field"),
             make_it("result", is_const=False),
-            ]+if_(with_scale, make_it("elwise_post_scaling", tpname="double"))+[
+            ]+if_(with_scale,
+                make_it("elwise_post_scaling", tpname="uncomplex_type"))+[
+            Initializer(Value("const int", "el_count"), "fg.element_count()"),
             Line(),
-            For("unsigned fg_el_nr = 0",
-                "fg_el_nr < fg.element_count()",
+            ]+get_gil_release()+get_element_loop_pragmas(discr)+[
+            For("int fg_el_nr = 0",
+                "fg_el_nr < el_count",
                 "++fg_el_nr",
                 Block([
                     Initializer(
@@ -132,12 +137,12 @@ class JitLifter:
                             Line(),
                             ]+if_(with_scale,
                                 Assign("result_it[dest_el_base+i]",
-                                    "tmp * value_type(*elwise_post_scaling_it)"),
+                                    "tmp * value_type("
+                                    "elwise_post_scaling_it[fg_el_nr])"),
                                 Assign("result_it[dest_el_base+i]", "tmp"))
                             )
                         ),
-                    ]+if_(with_scale, S("elwise_post_scaling_it++"))
-                    )
+                    ])
                 )
             ])
 
@@ -147,7 +152,8 @@ class JitLifter:
         #print FunctionBody(fdecl, fbody)
         #raw_input()
 
-        return mod.compile(self.discr.toolchain).lift
+        from hedge.backends.jit.cache import compile_module
+        return compile_module(discr, mod, discr.toolchain).lift
 
     def __call__(self, fgroup, matrix, scaling, field, out):
         from pytools import to_uncomplex_dtype
@@ -155,7 +161,8 @@ class JitLifter:
         args = [fgroup, matrix.astype(uncomplex_dtype), field, out]
 
         if scaling is not None:
-            args.append(scaling)
+            import numpy
+            args.append(numpy.asarray(scaling, dtype=uncomplex_dtype))
 
         self.make_lift(fgroup,
                 scaling is not None,
@@ -0,0 +1,135 @@
+"""Thread parallelism in generated kernels and in instruction execution."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+OPENMP_FLAGS = ["-fopenmp"]
+
+
+def add_openmp(toolchain):
+    """Return a copy of *toolchain* that compiles and links with OpenMP."""
+
+    return toolchain.copy(
+            cflags=toolchain.cflags + [
+                flag for flag in OPENMP_FLAGS
+                if flag not in toolchain.cflags],
+            ldflags=toolchain.ldflags + [
+                flag for flag in OPENMP_FLAGS
+                if flag not in toolchain.ldflags])
+
+
+def get_element_loop_pragmas(discr):
+    """Return a list of :mod:`cgen` statements to be placed immediately
+    before a loop over elements so that the loop is split into
+    contiguous chunks of elements, one per thread.
+
+    The loop variable must be a signed integer, and the loop
+    iterations must write to disjoint parts of the result.
+    """
+    if discr.thread_count > 1:
+        from cgen import Pragma
+        return [Pragma("omp parallel for num_threads(%d) schedule(static)"
+            % discr.thread_count)]
+    else:
+        return []
+
+
+def make_instruction_thread_pool(instruction_thread_count):
+    """Return a :class:`multiprocessing.pool.ThreadPool` on which to execute
+    independent instructions concurrently, or *None* if
+    *instruction_thread_count* is one.
+    """
+    if instruction_thread_count < 1:
+        raise ValueError("instruction_thread_count must be positive")
+
+    if instruction_thread_count > 1:
+        from multiprocessing.pool import ThreadPool
+        return ThreadPool(instruction_thread_count)
+    else:
+        return None
+
+
+def close_instruction_thread_pool(pool):
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+
+def get_gil_release():
+    """Return a list of :mod:`cgen` statements that release the Python
+    global interpreter lock until the end of the enclosing block, so that
+    kernels of independent instructions may run concurrently (see
+    :meth:`hedge.compiler.Code.execute_concurrent`).
+
+    No Python objects may be accessed after these statements.
+    """
+    from cgen import Statement, Line
+    return [Statement("release_gil gil_release"), Line()]
+
+
+def make_face_pair_loop(discr, body):
+    """Return a list of :mod:`cgen` statements that execute the statements
+    in *body* once for each face pair *fp* of the face group *fg*.
+
+    If *discr* uses more than one thread, the face pairs of each color
+    of *fg* (see
+    :meth:`hedge.discretization.data.StraightFaceGroup.color_face_pairs`)
+    are processed in parallel.
+    """
+    from cgen import (Block, CustomLoop, For, Initializer, Value,
+            Const, Reference, Line)
+
+    if discr.thread_count > 1:
+        return [
+            For("unsigned color = 0",
+                "color < fg.color_count()",
+                "++color",
+                Block([
+                    Initializer(Value("const int", "color_start"),
+                        "fg.color_starts[color]"),
+                    Initializer(Value("const int", "color_end"),
+                        "fg.color_starts[color+1]"),
+                    Line(),
+                    ]+get_element_loop_pragmas(discr)+[
+                    For("int colored_fp_nr = color_start",
+                        "colored_fp_nr < color_end",
+                        "++colored_fp_nr",
+                        Block([
+                            Initializer(
+                                Const(Reference(Value(
+                                    "face_pair<straight_face>", "fp"))),
+                                "fg.face_pairs["
+                                "fg.colored_face_pairs[colored_fp_nr]]"),
+                            Line(),
+                            ]+body))
+                    ]))
+            ]
+    else:
+        return [
+            CustomLoop(
+                "BOOST_FOREACH(const face_pair<straight_face> &fp, "
+                "fg.face_pairs)",
+                Block(body))
+            ]
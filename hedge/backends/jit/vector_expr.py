@@ -34,34 +34,123 @@ from hedge.backends.vector_expr import CompiledVectorExpressionBase
 
 
 
+class CachedElementwiseKernel(codepy.elementwise.ElementwiseKernel):
+    """An :class:`codepy.elementwise.ElementwiseKernel` whose module
+    is obtained through a :class:`hedge.backends.jit.cache.KernelCache`.
+    """
+
+    def __init__(self, kernel_cache, arguments, operation, name="kernel",
+            toolchain=None):
+        if toolchain is None:
+            from codepy.toolchain import guess_toolchain
+            toolchain = guess_toolchain()
+        toolchain = toolchain.copy()
+        from codepy.libraries import add_pyublas
+        add_pyublas(toolchain)
+
+        self.arguments = arguments
+        self.module = kernel_cache.compile(
+                codepy.elementwise.get_elwise_module_descriptor(
+                    arguments, operation, name),
+                toolchain)
+        self.func = getattr(self.module, name)
+
+        self.vec_arg_indices = [i for i, arg in enumerate(arguments)
+                if isinstance(arg, codepy.elementwise.VectorArg)]
+
+        assert self.vec_arg_indices, \
+                "ElementwiseKernel can only be used with functions that " \
+                "have at least one vector argument"
+
+
 class CompiledVectorExpression(CompiledVectorExpressionBase):
     elementwise_mod = codepy.elementwise
 
-    def __init__(self, vec_expr_info_list, result_dtype_getter, toolchain=None):
+    def __init__(self, vec_expr_info_list, result_dtype_getter, toolchain=None,
+            kernel_cache=None):
         CompiledVectorExpressionBase.__init__(self,
                 vec_expr_info_list, result_dtype_getter)
 
         self.toolchain = toolchain
+        self.kernel_cache = kernel_cache
 
     def make_kernel_internal(self, args, instructions):
-        return self.elementwise_mod.ElementwiseKernel(
-                args, instructions, name="vector_expression",
-                toolchain=self.toolchain)
+        if self.kernel_cache is not None:
+            return CachedElementwiseKernel(self.kernel_cache,
+                    args, instructions, name="vector_expression",
+                    toolchain=self.toolchain)
+        else:
+            return self.elementwise_mod.ElementwiseKernel(
+                    args, instructions, name="vector_expression",
+                    toolchain=self.toolchain)
+
+    def __call__(self, evaluate_subexpr, stats_callback=None, allocator=None,
+            evaluate_elementwise=None):
+        """
+        :arg evaluate_elementwise: *None* or a callable that, given a
+          vector dependency, returns a tuple *(values, el_size)* if that
+          dependency is constant on each element, and *None* otherwise.
+          Such dependencies are passed to the kernel with one value per
+          element.
+        """
+        if evaluate_elementwise is not None:
+            elementwise = [evaluate_elementwise(vec_expr)
+                    for vec_expr in self.vector_deps]
+        else:
+            elementwise = [None] * len(self.vector_deps)
+
+        el_sizes = set(ew[1] for ew in elementwise if ew is not None)
+        if len(el_sizes) > 1:
+            # factors from different grids: expand them all
+            elementwise = [None] * len(self.vector_deps)
+            el_sizes = set()
 
-    def __call__(self, evaluate_subexpr, stats_callback=None):
-        vectors = [evaluate_subexpr(vec_expr) 
-                for vec_expr in self.vector_deps]
+        vectors = [evaluate_subexpr(vec_expr) if ew is None else ew[0]
+                for vec_expr, ew in zip(self.vector_deps, elementwise)]
         scalars = [evaluate_subexpr(scal_expr) 
                 for scal_expr in self.scalar_deps]
 
-        from pytools import single_valued
-        shape = single_valued(vec.shape for vec in vectors)
+        nodal_vectors = [vec for vec, ew in zip(vectors, elementwise)
+                if ew is None]
+        if nodal_vectors:
+            shape = max((vec.shape for vec in nodal_vectors), key=len)
+        else:
+            el_size, = el_sizes
+            shape = (el_size*len(vectors[0]),)
+
+        # Vectors lacking the leading (ensemble) axes of the others are
+        # shared by all ensemble members. Per-element vectors are shared
+        # as well, so they also need the node number within a member.
+        broadcast = tuple(ew is None and vec.shape != shape
+                for vec, ew in zip(vectors, elementwise))
+        if any(broadcast) or (el_sizes and len(shape) > 1):
+            for vec in nodal_vectors:
+                if vec.shape not in [shape, shape[-1:]]:
+                    raise ValueError("vector shapes %s and %s are "
+                            "incompatible" % (vec.shape, shape))
+        else:
+            broadcast = None
+
+        if el_sizes:
+            elementwise = tuple(ew is not None for ew in elementwise)
+        else:
+            elementwise = None
 
         kernel_rec = self.get_kernel(
                 tuple(v.dtype for v in vectors),
-                tuple(s.dtype for s in scalars))
+                tuple(s.dtype for s in scalars),
+                broadcast, elementwise)
+
+        if broadcast is not None:
+            scalars.append(numpy.uint32(shape[-1]))
+        if elementwise is not None:
+            el_size, = el_sizes
+            scalars.append(numpy.uint32(el_size))
+
+        if allocator is None:
+            allocator = numpy.empty
 
-        results = [numpy.empty(shape, kernel_rec.result_dtype)
+        results = [allocator(shape, kernel_rec.result_dtype)
                 for vei in self.result_vec_expr_info_list]
 
         size = results[0].size
@@ -53,6 +53,18 @@ class RankData(pytools.Record):
             ):
         pytools.Record.__init__(self, locals())
 
+    @classmethod
+    def from_partition_data(cls, part_data):
+        return cls(
+                mesh=part_data.mesh,
+                global2local_elements=part_data.global2local_elements,
+                global2local_vertex_indices=part_data
+                        .global2local_vertex_indices,
+                neighbor_ranks=part_data.neighbor_parts,
+                global_periodic_opposite_faces=part_data
+                        .global_periodic_opposite_faces,
+                tag_to_elements=part_data.tag_to_elements)
+
     def reordered_by(self, *args, **kwargs):
         old_el_numbers = self.mesh.get_reorder_oldnumbers(*args, **kwargs)
         mesh = self.mesh.reordered(old_el_numbers)
@@ -87,24 +99,15 @@ class MPIRunContext(RunContext):
 
         # compute partition using Metis, if necessary
         if isinstance(partition, int):
-            from pymetis import part_graph
-            dummy, partition = part_graph(partition,
-                    mesh.element_adjacency_graph())
+            from hedge.partition import get_metis_partition
+            partition = get_metis_partition(mesh, partition)
 
         from hedge.partition import partition_mesh
         from hedge.mesh import TAG_RANK_BOUNDARY
         for part_data in partition_mesh(
                 mesh, partition, part_bdry_tag_factory=TAG_RANK_BOUNDARY):
 
-            rank_data = RankData(
-                    mesh=part_data.mesh,
-                    global2local_elements=part_data.global2local_elements,
-                    global2local_vertex_indices=part_data
-                            .global2local_vertex_indices,
-                    neighbor_ranks=part_data.neighbor_parts,
-                    global_periodic_opposite_faces=part_data
-                            .global_periodic_opposite_faces,
-                    tag_to_elements=part_data.tag_to_elements)
+            rank_data = RankData.from_partition_data(part_data)
 
             rank = part_data.part_nr
 
@@ -121,6 +124,21 @@ class MPIRunContext(RunContext):
         return self.communicator.recv(source=self.head_rank, tag=0)
         print "receive end rank", self.rank
 
+    def load_mesh(self, basename):
+        """Read this rank's part of a mesh written by
+        :func:`hedge.partition.write_partitioned_mesh` (or the
+        ``hedge-partition-mesh`` script) into as many parts as there are
+        ranks, numbered by rank.
+
+        Unlike :meth:`distribute_mesh` and :meth:`receive_mesh`, this is
+        called on every rank, and no mesh data passes through the head
+        rank.
+        """
+        from hedge.partition import read_mesh_part, get_part_filename
+        return RankData.from_partition_data(read_mesh_part(
+            get_part_filename(basename, self.rank),
+            part_count=len(self.ranks)))
+
     def make_discretization(self, mesh_data, *args, **kwargs):
         return ParallelDiscretization(self,
                 self.serial_context.discr_class, mesh_data,
@@ -0,0 +1,319 @@
+"""Backend performing all operations through :mod:`numpy`, without
+compiling any code at run time."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+import hedge.discretization
+import hedge.backends.jit
+from hedge.backends.exec_common import (  # noqa
+        element_view, perform_elwise_operator, perform_elwise_max,
+        lift_flux)
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# {{{ exec mapper
+
+class ExecutionMapper(hedge.backends.jit.ExecutionMapper):
+    # {{{ code execution functions --------------------------------------------
+
+    def exec_assign(self, insn):
+        # Later expressions of an aggregated assignment may refer to
+        # earlier ones, so each result is made available immediately.
+        if self.discr.instrumented and insn.flop_count():
+            self.discr.vector_math_flop_counter.add(
+                    len(self.discr)*insn.flop_count())
+            sub_timer = self.discr.vector_math_timer.start_sub_timer()
+        else:
+            sub_timer = None
+
+        result = []
+        temporaries = []
+        for name, expr, dnr in zip(insn.names, insn.exprs, insn.do_not_return):
+            value = self.rec(expr)
+            self.context[name] = value
+
+            if dnr:
+                temporaries.append(name)
+            else:
+                result.append((name, value))
+
+        for name in temporaries:
+            del self.context[name]
+
+        if sub_timer is not None:
+            sub_timer.stop().submit()
+
+        return result, []
+
+    def exec_flux_batch_assign(self, insn):
+        from pymbolic.primitives import is_zero
+
+        fvi = insn.flux_var_info
+
+        args = [self.rec(arg_expr) for arg_expr, is_int in fvi.arg_specs]
+
+        from pytools import common_dtype
+        max_dtype = common_dtype(
+                [a.dtype for a in args if not is_zero(a)],
+                self.discr.default_scalar_type)
+
+        def cast_arg(arg, is_int):
+            if is_zero(arg):
+                if insn.is_boundary and not is_int:
+                    return self.discr.buffer_pool.zeros(
+                            self.discr.len_boundary(insn.repr_op.boundary_tag),
+                            max_dtype)
+                else:
+                    return self.discr.pooled_volume_zeros(max_dtype)
+            else:
+                return np.asarray(arg, dtype=max_dtype)
+
+        zero_args = []
+        cast_args = {}
+        for arg_name, arg, (arg_expr, is_int) in zip(
+                fvi.arg_names, args, fvi.arg_specs):
+            cast_args[arg_name] = cast_arg(arg, is_int)
+            if is_zero(arg):
+                zero_args.append(cast_args[arg_name])
+        args = cast_args
+
+        scalar_args = dict((scalar_arg, self.rec(scalar_arg))
+                for scalar_arg in fvi.scalar_parameters)
+
+        # zero arguments stay one-dimensional and broadcast across
+        # the ensemble
+        ensemble_shape = max(
+                [()] + [arg.shape[:-1] for arg in args.itervalues()], key=len)
+
+        if insn.quadrature_tag is None:
+            if insn.is_boundary:
+                face_groups = self.discr.get_boundary(insn.repr_op.boundary_tag)\
+                        .face_groups
+            else:
+                face_groups = self.discr.face_groups
+        else:
+            if insn.is_boundary:
+                face_groups = self.discr.get_boundary(insn.repr_op.boundary_tag)\
+                        .get_quadrature_info(insn.quadrature_tag).face_groups
+            else:
+                face_groups = self.discr.get_quadrature_info(insn.quadrature_tag) \
+                        .face_groups
+
+        result = []
+
+        for fg in face_groups:
+            all_fluxes_on_faces = self.executor.gather_flux(
+                    fg, insn, args, scalar_args, max_dtype, ensemble_shape)
+
+            for name, flux_bdg, fluxes_on_faces in zip(insn.names,
+                    insn.expressions, all_fluxes_on_faces):
+
+                if insn.quadrature_tag is None:
+                    if flux_bdg.op.is_lift:
+                        mat = fg.ldis_loc.lifting_matrix()
+                        scaling = fg.local_el_inverse_jacobians
+                    else:
+                        mat = fg.ldis_loc.multi_face_mass_matrix()
+                        scaling = None
+                else:
+                    assert not flux_bdg.op.is_lift
+                    mat = fg.ldis_loc_quad_info.multi_face_mass_matrix()
+                    scaling = None
+
+                out = self.discr.pooled_volume_zeros(fluxes_on_faces.dtype,
+                        shape=ensemble_shape)
+                self.executor.lift_flux(fg, mat, scaling, fluxes_on_faces, out)
+
+                if self.discr.instrumented:
+                    from hedge.tools import lift_flops
+                    self.discr.lift_flop_counter.add(lift_flops(fg))
+
+                result.append((name, out))
+
+            self.discr.buffer_pool.release(all_fluxes_on_faces)
+
+        self.discr.buffer_pool.release(zero_args)
+
+        if not face_groups:
+            # No face groups? Still assign context variables.
+            for name, flux_bdg in zip(insn.names, insn.expressions):
+                result.append((name, self.discr.volume_zeros(
+                    shape=ensemble_shape, dtype=max_dtype)))
+
+        return result, []
+
+    # }}}
+
+    # {{{ element-local operations ------------------------------------------
+
+    def perform_elwise_operator(self, src_ers, dest_ers, matrix, field, out):
+        perform_elwise_operator(src_ers, dest_ers, matrix, field, out)
+
+    def perform_elwise_max(self, ers, field, out):
+        perform_elwise_max(ers, field, out)
+
+    # }}}
+
+# }}}
+
+
+# {{{ executor ----------------------------------------------------------------
+
+class Executor(hedge.backends.jit.Executor):
+    def __init__(self, discr, optemplate, post_bind_mapper, type_hints):
+        self.discr = discr
+        self.code = self.compile_optemplate(discr, optemplate,
+                post_bind_mapper, type_hints)
+        self.elwise_linear_cache = {}
+        self.diff_fields_matrix_cache = {}
+        self.gather_info_cache = {}
+
+        if "dump_op_code" in discr.debug:
+            from hedge.tools import open_unique_debug_file
+            open_unique_debug_file("op-code", ".txt").write(
+                    str(self.code))
+
+        self.diff = self.diff_builtin
+
+    def make_compiler(self, discr):
+        from hedge.backends.pure_numpy.compiler import OperatorCompiler
+        return OperatorCompiler(discr)
+
+    def instrument(self):
+        hedge.backends.jit.Executor.instrument(self)
+
+        from pytools.log import time_and_count_function
+        self.gather_flux = \
+                time_and_count_function(
+                        self.gather_flux,
+                        self.discr.gather_timer,
+                        self.discr.gather_counter)
+
+    def get_gather_info(self, fg, is_boundary):
+        try:
+            return self.gather_info_cache[fg]
+        except KeyError:
+            if len(fg.face_pairs):
+                from hedge.backends.pure_numpy.flux import make_gather_info
+                result = make_gather_info(fg, is_boundary,
+                        self.discr.geometry_dtype)
+            else:
+                result = None
+
+            self.gather_info_cache[fg] = result
+            return result
+
+    def gather_flux(self, fg, insn, args, scalar_args, dtype,
+            ensemble_shape=()):
+        from hedge.backends.pure_numpy.flux import gather_flux
+        return gather_flux(fg, self.get_gather_info(fg, insn.is_boundary),
+                insn.expressions, insn.flux_var_info, insn.is_boundary,
+                args, scalar_args, dtype, zeros=self.discr.buffer_pool.zeros,
+                ensemble_shape=ensemble_shape)
+
+    def lift_flux(self, fg, matrix, scaling, field, out):
+        lift_flux(fg, matrix, scaling, field, out)
+
+    def diff_rst(self, op, field):
+        result = self.discr.pooled_volume_zeros(field.dtype,
+                shape=field.shape[:-1])
+
+        for eg in self.discr.element_groups:
+            perform_elwise_operator(op.preimage_ranges(eg), eg.ranges,
+                    op.matrices(eg)[op.rst_axis], field, result)
+
+        return result
+
+    def do_elementwise_linear(self, op, field, out):
+        for eg in self.discr.element_groups:
+            try:
+                matrix, coeffs = self.elwise_linear_cache[eg, op, field.dtype]
+            except KeyError:
+                matrix = np.asarray(op.matrix(eg), dtype=field.dtype)
+                coeffs = op.coefficients(eg)
+                self.elwise_linear_cache[eg, op, field.dtype] = matrix, coeffs
+
+            perform_elwise_operator(eg.ranges, eg.ranges,
+                    matrix, field, out, scale_factors=coeffs)
+
+# }}}
+
+
+# {{{ discretization
+
+class Discretization(hedge.discretization.Discretization):
+    """A :class:`hedge.discretization.Discretization` that executes
+    operators using only :mod:`numpy`. Unlike
+    :class:`hedge.backends.jit.Discretization`, it needs neither
+    :mod:`codepy` nor a C++ compiler at run time, so operators are
+    ready for use immediately after :meth:`compile`.
+    """
+
+    exec_mapper_class = ExecutionMapper
+    executor_class = Executor
+
+    def __init__(self, *args, **kwargs):
+        """
+        :param instruction_thread_count: see
+          :class:`hedge.backends.jit.Discretization`. Only
+          :func:`numpy.dot` and other operations that release the global
+          interpreter lock actually run concurrently.
+        """
+        logger.info("init numpy discretization: start")
+
+        instruction_thread_count = kwargs.pop("instruction_thread_count", 1)
+
+        # tolerate (and ignore) other backends' arguments
+        for arg_name in ["toolchain", "kernel_cache", "thread_count",
+                "tune_for"]:
+            kwargs.pop(arg_name, None)
+
+        hedge.discretization.Discretization.__init__(self, *args, **kwargs)
+
+        from hedge.backends.jit.threads import make_instruction_thread_pool
+        self.instruction_thread_pool = make_instruction_thread_pool(
+                instruction_thread_count)
+
+        logger.info("init numpy discretization: done")
+
+    def close(self):
+        from hedge.backends.jit.threads import close_instruction_thread_pool
+        close_instruction_thread_pool(self.instruction_thread_pool)
+        self.instruction_thread_pool = None
+
+        hedge.discretization.Discretization.close(self)
+
+    def get_vector_primitive_factory(self):
+        from hedge.vector_primitives import PureNumpyVectorPrimitiveFactory
+        return PureNumpyVectorPrimitiveFactory()
+
+# }}}
+
+
+# vim: foldmethod=marker
@@ -0,0 +1,102 @@
+"""Pure-numpy backend: operator compilation."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+from pytools import memoize_method
+from hedge.compiler import FluxBatchAssign, Assign
+import hedge.backends.jit.compiler
+
+
+# {{{ instructions
+
+class GatherFluxBatchAssign(FluxBatchAssign):
+    """A :class:`hedge.compiler.FluxBatchAssign` evaluated by
+    :meth:`hedge.backends.pure_numpy.Executor.gather_flux`.
+
+    .. attribute:: is_boundary
+    .. attribute:: quadrature_tag
+    .. attribute:: flux_var_info
+
+        see :func:`hedge.backends.jit.flux.get_flux_var_info`.
+    """
+
+    @memoize_method
+    def get_dependencies(self):
+        deps = set()
+
+        from hedge.tools import setify_field as setify
+        from hedge.optemplate import OperatorBinding, BoundaryPair
+        for f in self.expressions:
+            assert isinstance(f, OperatorBinding)
+            if isinstance(f.field, BoundaryPair):
+                deps |= setify(f.field.field) | setify(f.field.bfield)
+            else:
+                deps |= setify(f.field)
+
+        dep_mapper = self.dep_mapper_factory()
+
+        from pytools import flatten
+        return set(flatten(dep_mapper(dep) for dep in deps))
+
+# }}}
+
+
+# {{{ subclassed compiler
+
+class OperatorCompiler(hedge.backends.jit.compiler.OperatorCompiler):
+    """Builds the same instruction stream as the JIT backend, except
+    that flux batches and vector math are left to be evaluated by
+    :mod:`numpy` instead of being compiled.
+    """
+
+    def make_flux_batch_assign(self, names, expressions, repr_op):
+        from hedge.optemplate.operators import (
+                QuadratureFluxOperatorBase,
+                BoundaryFluxOperatorBase)
+
+        if isinstance(repr_op, QuadratureFluxOperatorBase):
+            quad_tag = repr_op.quadrature_tag
+        else:
+            quad_tag = None
+
+        from hedge.backends.jit.flux import get_flux_var_info
+        return GatherFluxBatchAssign(
+                is_boundary=isinstance(repr_op, BoundaryFluxOperatorBase),
+                quadrature_tag=quad_tag,
+                names=names, expressions=expressions, repr_op=repr_op,
+                flux_var_info=get_flux_var_info(expressions),
+                dep_mapper_factory=self.dep_mapper_factory)
+
+    def finalize_multi_assign(self, names, exprs, do_not_return, priority):
+        return Assign(names=names, exprs=exprs,
+                do_not_return=do_not_return,
+                priority=priority,
+                dep_mapper_factory=self.dep_mapper_factory)
+
+# }}}
+
+
+# vim: foldmethod=marker
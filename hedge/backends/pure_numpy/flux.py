@@ -0,0 +1,256 @@
+"""Pure-numpy backend: flux gather."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+import numpy as np
+import pymbolic.mapper.evaluator
+from pytools import Record
+
+
+# {{{ gather index data
+
+class FaceGroupGatherInfo(Record):
+    """Index and geometry arrays describing the face pairs of one face
+    group, so that a flux gather becomes a handful of vectorized
+    numpy operations.
+
+    All arrays have one row per face pair. Index arrays have one column
+    per face node, geometric data has a single column so that it
+    broadcasts across the face.
+
+    .. attribute:: int_idx
+    .. attribute:: ext_idx
+
+        indices into the interior and exterior field vectors.
+
+    .. attribute:: int_fof_idx
+    .. attribute:: ext_fof_idx
+
+        indices into the fluxes-on-faces vector. *ext_fof_idx* is
+        *None* for boundary face groups.
+
+    .. attribute:: normals
+
+        an array of shape *(dimensions, face_pair_count, 1)*.
+
+    .. attribute:: face_jacobians
+    .. attribute:: int_element_jacobians
+    .. attribute:: ext_element_jacobians
+    .. attribute:: int_orders
+    .. attribute:: ext_orders
+    .. attribute:: h
+    """
+
+
+def make_gather_info(fg, is_boundary, geometry_dtype=np.float64):
+    face_length = fg.face_length()
+    index_lists = np.asarray(fg.index_lists, dtype=np.intp)
+
+    int_sides = [fp.int_side for fp in fg.face_pairs]
+    ext_sides = [fp.ext_side for fp in fg.face_pairs]
+
+    def get_side_attr(sides, attr, dtype):
+        return np.array([getattr(side, attr) for side in sides],
+                dtype=dtype)[:, np.newaxis]
+
+    def get_node_indices(sides):
+        return (get_side_attr(sides, "el_base_index", np.intp)
+                + index_lists[
+                    get_side_attr(sides, "face_index_list_number", np.intp)[:, 0]])
+
+    def get_fof_base(sides):
+        return face_length*(
+                get_side_attr(sides, "local_el_number", np.intp)*fg.face_count
+                + get_side_attr(sides, "face_id", np.intp))
+
+    if is_boundary:
+        ext_fof_idx = None
+    else:
+        ext_fof_idx = get_fof_base(ext_sides) + index_lists[np.array(
+                [fp.ext_native_write_map for fp in fg.face_pairs],
+                dtype=np.intp)]
+
+    return FaceGroupGatherInfo(
+            int_idx=get_node_indices(int_sides),
+            ext_idx=get_node_indices(ext_sides),
+            int_fof_idx=get_fof_base(int_sides)
+            + np.arange(face_length, dtype=np.intp),
+            ext_fof_idx=ext_fof_idx,
+            normals=np.array(
+                [side.normal for side in int_sides],
+                dtype=geometry_dtype).T[:, :, np.newaxis],
+            face_jacobians=get_side_attr(
+                int_sides, "face_jacobian", geometry_dtype),
+            int_element_jacobians=get_side_attr(
+                int_sides, "element_jacobian", geometry_dtype),
+            ext_element_jacobians=get_side_attr(
+                ext_sides, "element_jacobian", geometry_dtype),
+            int_orders=get_side_attr(int_sides, "order", geometry_dtype),
+            ext_orders=get_side_attr(ext_sides, "order", geometry_dtype),
+            h=get_side_attr(int_sides, "h", geometry_dtype))
+
+# }}}
+
+
+# {{{ flux evaluation
+
+class FluxEvaluationMapper(pymbolic.mapper.evaluator.EvaluationMapper):
+    """Evaluates a flux expression on all nodes of a face group at once.
+
+    *gathered_args* is a dictionary mapping *(arg_name, is_interior)*
+    to the gathered field values, shared between the fluxes of one batch.
+    """
+
+    def __init__(self, gather_info, flux_idx, flux_var_info, args,
+            scalar_args, gathered_args):
+        pymbolic.mapper.evaluator.EvaluationMapper.__init__(self)
+        self.gather_info = gather_info
+        self.flux_idx = flux_idx
+        self.flux_var_info = flux_var_info
+        self.args = args
+        self.scalar_args = scalar_args
+        self.gathered_args = gathered_args
+        self.cse_cache = {}
+
+    def map_field_component(self, expr):
+        arg_name = self.flux_var_info.flux_idx_and_dep_to_arg_name[
+                self.flux_idx, expr]
+
+        if not arg_name:
+            return 0
+
+        try:
+            return self.gathered_args[arg_name, expr.is_interior]
+        except KeyError:
+            if expr.is_interior:
+                idx = self.gather_info.int_idx
+            else:
+                idx = self.gather_info.ext_idx
+
+            result = self.args[arg_name][..., idx]
+            self.gathered_args[arg_name, expr.is_interior] = result
+            return result
+
+    def map_normal(self, expr):
+        return self.gather_info.normals[expr.axis]
+
+    def map_element_jacobian(self, expr):
+        if expr.is_interior:
+            return self.gather_info.int_element_jacobians
+        else:
+            return self.gather_info.ext_element_jacobians
+
+    def map_face_jacobian(self, expr):
+        return self.gather_info.face_jacobians
+
+    def map_element_order(self, expr):
+        if expr.is_interior:
+            return self.gather_info.int_orders
+        else:
+            return self.gather_info.ext_orders
+
+    def map_local_mesh_size(self, expr):
+        return self.gather_info.h
+
+    def map_scalar_parameter(self, expr):
+        return self.scalar_args[expr]
+
+    def map_function_symbol(self, expr):
+        from hedge.flux import flux_abs, flux_min, flux_max
+
+        return {
+                flux_abs: np.abs,
+                flux_max: np.maximum,
+                flux_min: np.minimum,
+                }[expr]
+
+    def map_c_function(self, expr):
+        return getattr(np, expr.name)
+
+    def map_if_positive(self, expr):
+        return np.where(self.rec(expr.criterion) > 0,
+                self.rec(expr.then), self.rec(expr.else_))
+
+    def map_common_subexpression(self, expr):
+        try:
+            return self.cse_cache[expr]
+        except KeyError:
+            result = self.rec(expr.child)
+            self.cse_cache[expr] = result
+            return result
+
+
+def gather_flux(fg, gather_info, fluxes, flux_var_info, is_boundary,
+        args, scalar_args, dtype, zeros=np.zeros, ensemble_shape=()):
+    """Return a list of fluxes-on-faces vectors, one for each entry
+    of *fluxes*.
+
+    :arg args: a dictionary mapping argument names from *flux_var_info*
+      to field vectors.
+    :arg scalar_args: a dictionary mapping scalar flux parameters to
+      their values.
+    :arg zeros: a callable *(shape, dtype)* returning a zeroed array,
+      used to allocate the result vectors.
+    :arg ensemble_shape: the leading axes of the ensemble fields among
+      *args*, which are prepended to the shape of the result vectors.
+      One-dimensional arguments are shared by all ensemble members.
+    """
+    from hedge.flux import FluxFlipper
+
+    fof_shape = ensemble_shape + (
+            fg.face_count*fg.face_length()*fg.element_count(),)
+    gathered_args = {}
+
+    result = []
+    for flux_idx, flux_bdg in enumerate(fluxes):
+        fof = zeros(fof_shape, dtype)
+
+        if len(fg.face_pairs):
+            if is_boundary:
+                sides = [(False, gather_info.int_fof_idx)]
+            else:
+                sides = [
+                        (False, gather_info.int_fof_idx),
+                        (True, gather_info.ext_fof_idx)]
+
+            for is_flipped, fof_idx in sides:
+                flux = flux_bdg.op.flux
+                if is_flipped:
+                    flux = FluxFlipper()(flux)
+
+                fof[..., fof_idx] = (gather_info.face_jacobians
+                        * FluxEvaluationMapper(
+                            gather_info, flux_idx, flux_var_info, args,
+                            scalar_args, gathered_args)(flux))
+
+        result.append(fof)
+
+    return result
+
+# }}}
+
+
+# vim: foldmethod=marker
@@ -29,6 +29,7 @@ THE SOFTWARE.
 
 
 import numpy
+import pymbolic.mapper
 import pymbolic.mapper.substitutor
 import hedge.optemplate
 from pytools import memoize_method, Record
@@ -66,6 +67,30 @@ class DefaultingSubstitutionMapper(
 
 
 
+class BroadcastIndexMapper(
+        pymbolic.mapper.IdentityMapper,
+        hedge.optemplate.IdentityMapperMixin):
+    """Index each vector named in the keys of *index_names* by the
+    variable named by the corresponding value (such as *hedge_node* or
+    *hedge_el*) instead of by the running index *i*.
+    """
+
+    def __init__(self, index_names):
+        self.index_names = index_names
+
+    def map_subscript(self, expr):
+        from pymbolic.primitives import Variable
+        if (isinstance(expr.aggregate, Variable)
+                and expr.aggregate.name in self.index_names):
+            return type(expr)(expr.aggregate,
+                    Variable(self.index_names[expr.aggregate.name]))
+        else:
+            return pymbolic.mapper.IdentityMapper.map_subscript(self, expr)
+
+
+
+
+
 class ConstantGatherMapper(
         hedge.optemplate.CombineMapper,
         hedge.optemplate.CollectorMixin,
@@ -190,7 +215,20 @@ class CompiledVectorExpressionBase(object):
         return [rvei.name for rvei in self.result_vec_expr_info_list]
 
     @memoize_method
-    def get_kernel(self, vector_dtypes, scalar_dtypes):
+    def get_kernel(self, vector_dtypes, scalar_dtypes, broadcast=None,
+            elementwise=None):
+        """
+        :param broadcast: *None* or a tuple of flags, one for each entry
+          of :attr:`vector_deps`. Flagged vectors lack the leading ensemble
+          axis of the other vectors and the results and are shared by all
+          ensemble members. In that case, the kernel takes an additional
+          scalar argument *hedge_node_count*, the length of one member.
+        :param elementwise: *None* or a tuple of flags, one for each entry
+          of :attr:`vector_deps`. Flagged vectors hold one value per
+          element rather than one per node. In that case, the kernel
+          takes an additional scalar argument *hedge_el_size*, the
+          number of nodes per element.
+        """
         from pymbolic.mapper.stringifier import PREC_NONE
         from pymbolic.mapper.c_code import CCodeMapper
 
@@ -221,7 +259,35 @@ class CompiledVectorExpressionBase(object):
         code_mapper = CCodeMapper(constant_mapper=real_const_mapper)
 
         code_lines = []
-        for vei in self.vec_expr_info_list:
+        vec_expr_info_list = self.vec_expr_info_list
+        index_names = {}
+
+        if broadcast is not None:
+            code_lines.append(
+                    "const unsigned hedge_node = i % hedge_node_count;")
+            index_names.update(
+                    (name, "hedge_node")
+                    for name, is_broadcast
+                    in zip(self.vector_dep_names, broadcast)
+                    if is_broadcast)
+        elif elementwise is not None:
+            code_lines.append("const unsigned hedge_node = i;")
+
+        if elementwise is not None:
+            code_lines.append(
+                    "const unsigned hedge_el = hedge_node / hedge_el_size;")
+            index_names.update(
+                    (name, "hedge_el")
+                    for name, is_elementwise
+                    in zip(self.vector_dep_names, elementwise)
+                    if is_elementwise)
+
+        if index_names:
+            bim = BroadcastIndexMapper(index_names)
+            vec_expr_info_list = [vei.copy(expr=bim(vei.expr))
+                    for vei in vec_expr_info_list]
+
+        for vei in vec_expr_info_list:
             expr_code = code_mapper(vei.expr, PREC_NONE)
             if vei.do_not_return:
                 from cgen import dtype_to_ctype
@@ -241,6 +307,10 @@ class CompiledVectorExpressionBase(object):
         args.extend(
                 elwise.ScalarArg(dtype, name)
                 for dtype, name in zip(scalar_dtypes, self.scalar_dep_names))
+        if broadcast is not None:
+            args.append(elwise.ScalarArg(numpy.uint32, "hedge_node_count"))
+        if elementwise is not None:
+            args.append(elwise.ScalarArg(numpy.uint32, "hedge_el_size"))
 
         return KernelRecord(
                 kernel=self.make_kernel_internal(args, "\n".join(code_lines)),
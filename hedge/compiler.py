@@ -218,6 +218,53 @@ class QuadratureDiffBatchAssign(DiffBatchAssign):
         return executor.exec_quad_diff_batch_assign
 
 
+class MultiFieldDiffBatchAssign(Instruction):
+    """Reference derivatives of several fields, to be computed together.
+
+    :ivar names: a list of lists of names, one list for each entry
+        of :attr:`fields`.
+    :ivar operators: a list of lists of operators, one list for each entry
+        of :attr:`fields`.
+
+        .. note ::
+
+            All operators here are guaranteed to satisfy
+            :meth:`hedge.optemplate.operators.DiffOperatorBase.
+            equal_except_for_axis`.
+
+    :ivar fields:
+    """
+
+    def get_assignees(self):
+        return set(name
+                for field_names in self.names
+                for name in field_names)
+
+    @memoize_method
+    def get_dependencies(self):
+        dep_mapper = self.dep_mapper_factory()
+
+        result = set()
+        for field in self.fields:
+            result |= dep_mapper(field)
+        return result
+
+    def __str__(self):
+        lines = []
+
+        lines.append("{ /* %d fields */" % len(self.fields))
+        for field_names, field_ops, field in zip(
+                self.names, self.operators, self.fields):
+            for n, d in zip(field_names, field_ops):
+                lines.append("  %s <- %s(%s)" % (n, d, field))
+        lines.append("}")
+
+        return "\n".join(lines)
+
+    def get_executor_method(self, executor):
+        return executor.exec_multi_field_diff_batch_assign
+
+
 class FluxExchangeBatchAssign(Instruction):
     __slots__ = [
             "names", "indices_and_ranks",
@@ -328,6 +375,146 @@ def dot_dataflow_graph(code, max_node_label_length=30,
 
 # {{{ code representation
 
+def _discard_vars(exec_mapper, names, releasable_names):
+    """Remove *names* from the context of *exec_mapper*. The values of
+    those in *releasable_names* are passed to the execution mapper's
+    *release_values* method, if it has one, so that their storage can be
+    reused.
+    """
+    context = exec_mapper.context
+
+    released = []
+    for name in names:
+        value = context.pop(name)
+        if name in releasable_names:
+            released.append(value)
+
+    if released:
+        release_values = getattr(exec_mapper, "release_values", None)
+        if release_values is not None:
+            release_values(released)
+
+
+class ExecutionPlan(object):
+    """A static schedule of a :class:`Code` instance, prepared for
+    repeated execution by one type of execution mapper.
+
+    Executor methods are looked up once, rather than once per instruction
+    and step, and each variable is dropped from the context right after
+    the step that last uses it, so that its storage can be reused
+    (e.g. by :class:`hedge.tools.buffers.BufferPool`) by the very next
+    instruction. The values of variables assigned by instructions are
+    handed back to the execution mapper for reuse as they are dropped.
+
+    .. attribute:: steps
+
+        a list of tuples *(executor_func, insn, new_future_count,
+        dead_vars)*. *executor_func* is *None* for
+        :class:`Code.EvaluateFuture` pseudo-instructions.
+    """
+
+    def __init__(self, schedule, exec_mapper, releasable_names=frozenset()):
+        self.exec_mapper_class = type(exec_mapper)
+        self.releasable_names = releasable_names
+
+        # The dynamic scheduler drops a variable before the first step at
+        # which no remaining instruction depends on it. That is the same
+        # as dropping it right after the step that last used it, which
+        # lets its storage be reused by the immediately following step.
+        discard_lists = [tuple(discardable_vars)
+                for discardable_vars, insn, new_future_count in schedule]
+        self.initial_dead_vars = discard_lists[0] if discard_lists else ()
+        dead_vars_by_step = discard_lists[1:] + [()]
+
+        self.has_futures = False
+        self.steps = []
+        for (discardable_vars, insn, new_future_count), dead_vars in zip(
+                schedule, dead_vars_by_step):
+            if isinstance(insn, Code.EvaluateFuture):
+                self.has_futures = True
+                executor_func = None
+            else:
+                executor_func = self.get_executor_func(insn, exec_mapper)
+
+            if new_future_count:
+                self.has_futures = True
+
+            self.steps.append(
+                    (executor_func, insn, new_future_count, dead_vars))
+
+    @staticmethod
+    def get_executor_func(insn, exec_mapper):
+        """Return a function *f* such that *f(exec_mapper, insn)* executes
+        *insn* for any execution mapper of the same type as *exec_mapper*.
+        """
+        method = insn.get_executor_method(exec_mapper)
+        if getattr(method, "im_self", None) is exec_mapper:
+            return method.im_func
+
+        def executor_func(exec_mapper, insn):
+            return insn.get_executor_method(exec_mapper)(insn)
+
+        return executor_func
+
+    def execute(self, exec_mapper, pre_assign_check=None):
+        """Run the plan. Returns *True* if the schedule was delay-free,
+        i.e. no future had to be waited for.
+        """
+        assert type(exec_mapper) is self.exec_mapper_class
+
+        context = exec_mapper.context
+        releasable_names = self.releasable_names
+        _discard_vars(exec_mapper, self.initial_dead_vars, releasable_names)
+
+        if not self.has_futures and pre_assign_check is None:
+            # fast path
+            for executor_func, insn, new_future_count, dead_vars \
+                    in self.steps:
+                assignments, new_futures = executor_func(exec_mapper, insn)
+                if new_futures:
+                    raise RuntimeError("static schedule got an unexpected "
+                            "number of futures")
+                context.update(assignments)
+
+                if dead_vars:
+                    _discard_vars(exec_mapper, dead_vars, releasable_names)
+
+            return True
+
+        id_to_future = {}
+        next_future_id = 0
+        schedule_is_delay_free = True
+
+        for executor_func, insn, new_future_count, dead_vars in self.steps:
+            if executor_func is None:
+                future = id_to_future.pop(insn.future_id)
+                if not future.is_ready():
+                    schedule_is_delay_free = False
+                assignments, new_futures = future()
+                del future
+            else:
+                assignments, new_futures = executor_func(exec_mapper, insn)
+
+            for target, value in assignments:
+                if pre_assign_check is not None:
+                    pre_assign_check(target, value)
+
+                context[target] = value
+
+            if len(new_futures) != new_future_count:
+                raise RuntimeError("static schedule got an unexpected number "
+                        "of futures")
+
+            for future in new_futures:
+                id_to_future[next_future_id] = future
+                next_future_id += 1
+
+            if dead_vars:
+                _discard_vars(exec_mapper, dead_vars, releasable_names)
+
+        return schedule_is_delay_free
+
+
 class Code(object):
     def __init__(self, instructions, result):
         self.instructions = instructions
@@ -335,6 +522,12 @@ class Code(object):
         self.last_schedule = None
         self.static_schedule_attempts = 5
 
+        self.use_execution_plan = True
+        self.execution_plans = {}
+
+        self.thread_pool = None
+        self.last_concurrent_schedule = None
+
     def dump_dataflow_graph(self):
         from hedge.tools import open_unique_debug_file
 
@@ -349,6 +542,17 @@ class Code(object):
 
         return "\n".join(lines)
 
+    @memoize_method
+    def get_assigned_names(self):
+        """Return the set of names assigned by the instructions, i.e. the
+        names whose values may be released for reuse once discarded.
+        Values passed in by the caller are never released.
+        """
+        return frozenset(
+                assignee
+                for insn in self.instructions
+                for assignee in insn.get_assignees())
+
     # {{{ dynamic scheduler (generates static schedules by self-observation)
     class NoInstructionAvailable(Exception):
         pass
@@ -365,6 +569,14 @@ class Code(object):
         if not available_insns:
             raise self.NoInstructionAvailable
 
+        return (argmax2(available_insns),
+                self.get_discardable_vars(available_names, done_insns))
+
+    @memoize_method
+    def get_discardable_vars(self, available_names, done_insns):
+        """Return the set of names in *available_names* that neither an
+        instruction outside of *done_insns* nor the result depends on.
+        """
         from pytools import flatten
         discardable_vars = set(available_names) - set(flatten(
             [dep.name for dep in insn.get_dependencies()]
@@ -391,7 +603,7 @@ class Code(object):
         with_object_array_or_scalar(remove_result_variable, self.result)
         # }}}
 
-        return argmax2(available_insns), discardable_vars
+        return discardable_vars
 
     def execute_dynamic(self, exec_mapper, pre_assign_check=None):
         """Execute the instruction stream, make all scheduling decisions
@@ -444,8 +656,8 @@ class Code(object):
                         # no futures, no available instructions: we're done
                         break
                 else:
-                    for name in discardable_vars:
-                        del context[name]
+                    _discard_vars(exec_mapper, discardable_vars,
+                            self.get_assigned_names())
 
                     done_insns.add(insn)
                     assignments, new_futures = \
@@ -476,6 +688,7 @@ class Code(object):
 
         if self.static_schedule_attempts:
             self.last_schedule = schedule
+            self.execution_plans = {}
 
         from hedge.tools import with_object_array_or_scalar
         return with_object_array_or_scalar(exec_mapper, self.result)
@@ -493,9 +706,15 @@ class Code(object):
         execute it. Otherwise, punt to the dynamic scheduler below.
         """
 
+        if self.thread_pool is not None:
+            return self.execute_concurrent(exec_mapper, pre_assign_check)
+
         if self.last_schedule is None:
             return self.execute_dynamic(exec_mapper, pre_assign_check)
 
+        if self.use_execution_plan:
+            return self.execute_plan(exec_mapper, pre_assign_check)
+
         context = exec_mapper.context
         id_to_future = {}
         next_future_id = 0
@@ -503,8 +722,8 @@ class Code(object):
         schedule_is_delay_free = True
 
         for discardable_vars, insn, new_future_count in self.last_schedule:
-            for name in discardable_vars:
-                del context[name]
+            _discard_vars(exec_mapper, discardable_vars,
+                    self.get_assigned_names())
 
             if isinstance(insn, self.EvaluateFuture):
                 future = id_to_future.pop(insn.future_id)
@@ -537,6 +756,220 @@ class Code(object):
         from hedge.tools import with_object_array_or_scalar
         return with_object_array_or_scalar(exec_mapper, self.result)
 
+    def get_execution_plan(self, exec_mapper):
+        """Return an :class:`ExecutionPlan` for :attr:`last_schedule`,
+        cached per execution mapper type.
+        """
+        try:
+            return self.execution_plans[type(exec_mapper)]
+        except KeyError:
+            plan = ExecutionPlan(self.last_schedule, exec_mapper,
+                    self.get_assigned_names())
+            self.execution_plans[type(exec_mapper)] = plan
+            return plan
+
+    def execute_plan(self, exec_mapper, pre_assign_check=None):
+        """Execute :attr:`last_schedule` by way of an :class:`ExecutionPlan`.
+        """
+        plan = self.get_execution_plan(exec_mapper)
+
+        if not plan.execute(exec_mapper, pre_assign_check):
+            self.last_schedule = None
+            self.execution_plans = {}
+            self.static_schedule_attempts -= 1
+
+        from hedge.tools import with_object_array_or_scalar
+        return with_object_array_or_scalar(exec_mapper, self.result)
+
+    # }}}
+
+    # {{{ concurrent execution
+
+    @memoize_method
+    def get_ready_instructions(self, available_names, done_insns):
+        """Return a tuple *(ready_insns, discardable_vars)*, where
+        *ready_insns* contains all instructions not in *done_insns* whose
+        dependencies are in *available_names*, by decreasing priority.
+        """
+        from pytools import all
+        ready_insns = [
+                insn for insn in self.instructions
+                if insn not in done_insns
+                and all(dep.name in available_names
+                    for dep in insn.get_dependencies())]
+        ready_insns.sort(key=lambda insn: -insn.priority)
+
+        return (tuple(ready_insns),
+                self.get_discardable_vars(available_names, done_insns))
+
+    def run_concurrently(self, exec_mapper, insns):
+        """Execute *insns*, which must not depend on one another, on
+        :attr:`thread_pool`. Return a list of the executor methods'
+        return values.
+        """
+        async_results = [
+                self.thread_pool.apply_async(
+                    insn.get_executor_method(exec_mapper), (insn,))
+                for insn in insns[1:]]
+
+        # keep the calling thread busy, too
+        results = [insns[0].get_executor_method(exec_mapper)(insns[0])]
+        results.extend(async_result.get() for async_result in async_results)
+        return results
+
+    def execute_concurrent(self, exec_mapper, pre_assign_check=None):
+        """Execute the instruction stream in waves. Each wave consists of
+        all instructions whose dependencies are available, which are run
+        concurrently on :attr:`thread_pool`. Futures are evaluated in the
+        calling thread between waves.
+
+        The sequence of waves is recorded in
+        *self.last_concurrent_schedule* by a first call, which runs each
+        wave sequentially, and replayed concurrently by subsequent calls.
+
+        This is only useful if the executor methods spend most of their
+        time in code that releases the global interpreter lock, such as
+        the kernels of :mod:`hedge.backends.jit` or :func:`numpy.dot`.
+        """
+        if self.last_concurrent_schedule is not None:
+            return self.execute_concurrent_static(
+                    exec_mapper, pre_assign_check)
+
+        context = exec_mapper.context
+
+        def assign(assignments):
+            for target, value in assignments:
+                if pre_assign_check is not None:
+                    pre_assign_check(target, value)
+
+                context[target] = value
+
+        schedule = []
+        next_future_id = 0
+        futures = []
+        done_insns = set()
+
+        while True:
+            # evaluate futures that have completed
+            evaluated_future_ids = []
+            new_futures = []
+
+            for future in futures[:]:
+                if future.is_ready():
+                    futures.remove(future)
+                    evaluated_future_ids.append(future.id)
+
+                    assignments, future_new_futures = future()
+                    assign(assignments)
+                    new_futures.extend(future_new_futures)
+
+            ready_insns, discardable_vars = self.get_ready_instructions(
+                    frozenset(context.keys()), frozenset(done_insns))
+
+            if not ready_insns:
+                if futures and not evaluated_future_ids:
+                    # nothing else to do: wait for a future
+                    future = futures.pop(0)
+                    evaluated_future_ids.append(future.id)
+
+                    assignments, future_new_futures = future()
+                    assign(assignments)
+                    new_futures.extend(future_new_futures)
+                    del future
+                elif not futures and not evaluated_future_ids:
+                    # no futures, no available instructions: we're done
+                    break
+
+                discardable_vars = ()
+            else:
+                _discard_vars(exec_mapper, discardable_vars,
+                        self.get_assigned_names())
+
+            new_future_counts = []
+            if ready_insns:
+                done_insns.update(ready_insns)
+
+                # Executor methods build their kernels on first use, which
+                # is not thread-safe. Run them sequentially while recording
+                # the schedule, so that the replay only finds built kernels.
+                for assignments, insn_new_futures in [
+                        insn.get_executor_method(exec_mapper)(insn)
+                        for insn in ready_insns]:
+                    assign(assignments)
+                    new_futures.extend(insn_new_futures)
+                    new_future_counts.append(len(insn_new_futures))
+
+            for future in new_futures:
+                future.id = next_future_id
+                next_future_id += 1
+            futures.extend(new_futures)
+
+            schedule.append((evaluated_future_ids, tuple(discardable_vars),
+                ready_insns, len(new_futures)))
+
+        if len(done_insns) < len(self.instructions):
+            raise RuntimeError("not all instructions are reachable"
+                    "--did you forget to pass a value for a placeholder? "
+                    "Unreachable instructions:\n%s"
+                    % "\n".join(
+                        str(insn)
+                        for insn in set(self.instructions) - done_insns))
+
+        if self.static_schedule_attempts:
+            self.last_concurrent_schedule = schedule
+
+        from hedge.tools import with_object_array_or_scalar
+        return with_object_array_or_scalar(exec_mapper, self.result)
+
+    def execute_concurrent_static(self, exec_mapper, pre_assign_check=None):
+        """Replay *self.last_concurrent_schedule*."""
+        context = exec_mapper.context
+        id_to_future = {}
+        next_future_id = 0
+
+        schedule_is_delay_free = True
+
+        for (evaluated_future_ids, discardable_vars, insns,
+                new_future_count) in self.last_concurrent_schedule:
+            results = []
+            for future_id in evaluated_future_ids:
+                future = id_to_future.pop(future_id)
+                if not future.is_ready():
+                    schedule_is_delay_free = False
+                results.append(future())
+                del future
+
+            _discard_vars(exec_mapper, discardable_vars,
+                    self.get_assigned_names())
+
+            if insns:
+                results.extend(self.run_concurrently(exec_mapper, insns))
+
+            new_futures = []
+            for assignments, result_new_futures in results:
+                for target, value in assignments:
+                    if pre_assign_check is not None:
+                        pre_assign_check(target, value)
+
+                    context[target] = value
+
+                new_futures.extend(result_new_futures)
+
+            if len(new_futures) != new_future_count:
+                raise RuntimeError("static schedule got an unexpected number "
+                        "of futures")
+
+            for future in new_futures:
+                id_to_future[next_future_id] = future
+                next_future_id += 1
+
+        if not schedule_is_delay_free:
+            self.last_concurrent_schedule = None
+            self.static_schedule_attempts -= 1
+
+        from hedge.tools import with_object_array_or_scalar
+        return with_object_array_or_scalar(exec_mapper, self.result)
+
     # }}}
 
 # }}}
@@ -551,11 +984,21 @@ class OperatorCompilerBase(IdentityMapper):
     class FluxBatch(Record):
         __slots__ = ["flux_exprs", "repr_op"]
 
-    def __init__(self, prefix="_expr", max_vectors_in_batch_expr=None):
+    def __init__(self, prefix="_expr", max_vectors_in_batch_expr=None,
+            batch_diff_fields=False, max_fields_in_diff_batch=None):
+        """
+        :param batch_diff_fields: If *True*, reference derivatives of
+          different fields are combined into
+          :class:`MultiFieldDiffBatchAssign` instructions where possible.
+          The executor must then support
+          :meth:`exec_multi_field_diff_batch_assign`.
+        """
         IdentityMapper.__init__(self)
         self.prefix = prefix
 
         self.max_vectors_in_batch_expr = max_vectors_in_batch_expr
+        self.batch_diff_fields = batch_diff_fields
+        self.max_fields_in_diff_batch = max_fields_in_diff_batch
 
         self.code = []
         self.expr_to_var = {}
@@ -657,7 +1100,11 @@ class OperatorCompilerBase(IdentityMapper):
         # Finally, walk the expression and build the code.
         result = IdentityMapper.__call__(self, expr)
 
-        return Code(self.aggregate_assignments(self.code, result), result)
+        code = self.code
+        if self.batch_diff_fields:
+            code = self.aggregate_diff_batches(code)
+
+        return Code(self.aggregate_assignments(code, result), result)
 
     # }}}
 
@@ -896,6 +1343,98 @@ class OperatorCompilerBase(IdentityMapper):
 
     # }}}
 
+    # {{{ diff batch aggregation pass
+
+    def aggregate_diff_batches(self, instructions):
+        """Combine :class:`DiffBatchAssign` instructions that apply the same
+        kind of operator to different fields into
+        :class:`MultiFieldDiffBatchAssign` instructions.
+
+        :meth:`map_ref_diff_op_binding` already batches all derivatives of
+        one field. Fields are only combined here, once all instructions are
+        known, because the field of one derivative batch may depend on
+        another batch by way of a flux batch or a common subexpression.
+        Two batches are only combined if neither depends on the other.
+        """
+        from pymbolic.primitives import Variable
+
+        origins_map = dict(
+                    (assignee, insn)
+                    for insn in instructions
+                    for assignee in insn.get_assignees())
+
+        def get_complete_origins_set(insn):
+            result = set()
+            queue = [insn]
+            while queue:
+                for dep in queue.pop().get_dependencies():
+                    if isinstance(dep, Variable):
+                        dep_origin = origins_map.get(dep.name, None)
+                        if dep_origin is not None and dep_origin not in result:
+                            result.add(dep_origin)
+                            queue.append(dep_origin)
+
+            return result
+
+        def to_multi_field(insn):
+            if isinstance(insn, MultiFieldDiffBatchAssign):
+                return insn
+            else:
+                return MultiFieldDiffBatchAssign(
+                        names=[insn.names],
+                        operators=[insn.operators],
+                        fields=[insn.field],
+                        dep_mapper_factory=self.dep_mapper_factory)
+
+        from pytools import partition
+        unprocessed_diffs, other_insns = partition(
+                lambda insn: type(insn) is DiffBatchAssign,
+                instructions)
+
+        processed_diffs = []
+        while unprocessed_diffs:
+            my_diff = unprocessed_diffs.pop(0)
+            my_origins = get_complete_origins_set(my_diff)
+            my_field_count = len(to_multi_field(my_diff).fields)
+
+            did_work = False
+            for i, other_diff in enumerate(unprocessed_diffs):
+                other_multi = to_multi_field(other_diff)
+                if not other_multi.operators[0][0].equal_except_for_axis(
+                        to_multi_field(my_diff).operators[0][0]):
+                    continue
+
+                if (self.max_fields_in_diff_batch is not None
+                        and my_field_count + len(other_multi.fields)
+                        > self.max_fields_in_diff_batch):
+                    continue
+
+                if (other_diff in my_origins
+                        or my_diff in get_complete_origins_set(other_diff)):
+                    continue
+
+                my_multi = to_multi_field(my_diff)
+                new_diff = MultiFieldDiffBatchAssign(
+                        names=my_multi.names + other_multi.names,
+                        operators=my_multi.operators + other_multi.operators,
+                        fields=my_multi.fields + other_multi.fields,
+                        dep_mapper_factory=self.dep_mapper_factory)
+
+                del unprocessed_diffs[i]
+                unprocessed_diffs.insert(0, new_diff)
+                for assignee in new_diff.get_assignees():
+                    origins_map[assignee] = new_diff
+
+                did_work = True
+                break
+
+            if not did_work:
+                processed_diffs.append(my_diff)
+
+        return processed_diffs + other_insns
+
+    # }}}
+
     # {{{ assignment aggregration pass
 
     def aggregate_assignments(self, instructions, result):
@@ -36,6 +36,8 @@ warn("hedge.data is deprecated and should no longer be used. Instead, "
 # {{{ helpers
 
 class _ConstantFunctionContainer:
+    is_vectorized = True
+
     def __init__(self, value):
         self.value = value
 
@@ -43,8 +45,8 @@ class _ConstantFunctionContainer:
     def shape(self):
         return self.value.shape
 
-    def __call__(self, x, el):
-        return self.value
+    def __call__(self, points, el_ids):
+        return numpy.asarray(self.value)[..., numpy.newaxis]
 
 # }}}
 
@@ -121,7 +123,8 @@ class GivenFunction(IGivenFunction):
         """Initialize the caches and store the function :math:`f`.
 
         :param f: a valid argument to 
-          :meth:`hedge.discretization.Discretization.interpolate_volume_function`.
+          :meth:`hedge.discretization.Discretization.interpolate_volume_function`,
+          such as a :class:`hedge.discretization.VectorizedFunction`.
         """
         from weakref import WeakKeyDictionary
 
@@ -272,15 +275,27 @@ class TimeIntervalGivenFunction(ITimeDependentGivenFunction):
 class TimeDependentGivenFunction(ITimeDependentGivenFunction):
     """Adapts a function :math:`f(x,t)` into the
     :class:`GivenFunction` framework.
+
+    If *f* has a true attribute *is_vectorized*, it is called as
+    *f(points, el_ids, t)* for all nodes at once, see
+    :class:`hedge.discretization.VectorizedFunction`.
+
+    The boundary interpolant of the most recent time is kept for each
+    discretization and tag, so that several requests during one stage
+    of a time stepper interpolate only once. Since it is shared among
+    these requests, it is returned read-only.
     """
     def __init__(self, f):
+        from weakref import WeakKeyDictionary
+
         self.f = f
+        self.boundary_cache = WeakKeyDictionary()
 
     class ConstantWrapper:
         def __init__(self, f, t):
             """Adapt a function :math:`f(x, el, t)` in such a way that
             it can be fed to `interpolate_*_function()`. In particular,
-            preserve the `shape` attribute.
+            preserve the `shape` and `is_vectorized` attributes.
             """
             self.f = f
             self.t = t
@@ -289,6 +304,10 @@ class TimeDependentGivenFunction(ITimeDependentGivenFunction):
         def shape(self):
             return self.f.shape
 
+        @property
+        def is_vectorized(self):
+            return getattr(self.f, "is_vectorized", False)
+
         def __call__(self, x, el):
             return self.f(x, el, self.t)
 
@@ -297,9 +316,26 @@ class TimeDependentGivenFunction(ITimeDependentGivenFunction):
                 self.ConstantWrapper(self.f, t))
 
     def boundary_interpolant(self, t, discr, tag):
-        return discr.interpolate_boundary_function(
+        tag_cache = self.boundary_cache.setdefault(discr, {})
+        try:
+            cached_t, result = tag_cache[tag]
+        except KeyError:
+            pass
+        else:
+            if cached_t == t:
+                return result
+
+        result = discr.interpolate_boundary_function(
                 self.ConstantWrapper(self.f, t), tag)
 
+        if result.dtype == object:
+            for component in result:
+                component.setflags(write=False)
+        result.setflags(write=False)
+
+        tag_cache[tag] = t, result
+        return result
+
 # }}}
 
 # {{{ compiled initial/boundary data ------------------------------------------
@@ -35,6 +35,9 @@ import hedge.optemplate
 import hedge._internal
 from pytools import memoize_method
 
+import logging
+logger = logging.getLogger(__name__)
+
 
 class OpTemplateFunction:
     def __init__(self, discr, pp_optemplate):
@@ -45,6 +48,32 @@ class OpTemplateFunction:
         return self.discr.run_preprocessed_optemplate(self.pp_optemplate, vars)
 
 
+class VectorizedFunction(object):
+    """Wraps a function *f* for
+    :meth:`Discretization.interpolate_volume_function` and
+    :meth:`Discretization.interpolate_boundary_function` so that it is
+    evaluated at all nodes in one call.
+
+    *f* is called as *f(points, el_ids)*, where *points* is an array of
+    shape *(n, dimensions)* and *el_ids* is an integer array of the *n*
+    corresponding element numbers. It returns an array of shape
+    *shape + (n,)*, or anything that broadcasts to that shape.
+
+    Any callable with a true attribute *is_vectorized* is called in
+    the same way. Other callables are called as *f(x, el)* once per
+    node.
+    """
+
+    is_vectorized = True
+
+    def __init__(self, f, shape=()):
+        self.f = f
+        self.shape = shape
+
+    def __call__(self, points, el_ids):
+        return self.f(points, el_ids)
+
+
 class _PointEvaluator(object):
     def __init__(self, discr, el_range, interp_coeff):
         self.discr = discr
@@ -65,6 +94,13 @@ class _PointEvaluator(object):
             return np.dot(self.interp_coeff, field[self.el_range])
 
 
+def _warn_use_btree_deprecated():
+    from warnings import warn
+    warn("use_btree is deprecated and ignored. Points are located "
+            "using element bins.",
+            DeprecationWarning, stacklevel=3)
+
+
 # {{{ timestep calculator (deprecated)
 
 class TimestepCalculator(object):
@@ -155,11 +191,24 @@ class Discretization(TimestepCalculator):
         Default numpy type for :meth:`volume_zeros`
         and company.
 
+    .. attribute:: geometry_dtype
+
+        The real numpy type matching :attr:`default_scalar_type`,
+        used for geometric factors such as :meth:`volume_jacobians`
+        and :meth:`inverse_metric_derivatives`, so that operators on
+        single-precision fields do not read double-precision geometry.
+
     .. attribute:: quad_min_degrees
 
         A mapping from quadrature tags to the degrees to
         which the desired quadrature is supposed to be exact.
 
+    .. attribute:: buffer_pool
+
+        A :class:`hedge.tools.buffers.BufferPool` from which backends
+        draw temporaries during operator execution. Disabled by the
+        debug flag ``no_buffer_pool``.
+
     .. attribute:: inverse_metric_derivatives
 
         A list of lists of full-volume vectors,
@@ -180,6 +229,8 @@ class Discretization(TimestepCalculator):
             "dump_op_code",
             "dump_dataflow_graph",
             "dump_optemplate_stages",
+            "no_buffer_pool",
+            "no_execution_plan",
             "help",
             ])
 
@@ -205,10 +256,7 @@ class Discretization(TimestepCalculator):
                     "and order")
         if local_discretization is None:
             from hedge.discretization.local import GEOMETRY_TO_LDIS
-            from pytools import single_valued
-            ldis_class = single_valued(
-                    GEOMETRY_TO_LDIS[type(el)]
-                    for el in mesh.elements)
+            ldis_class = GEOMETRY_TO_LDIS[mesh.get_arrays().element_class]
             return ldis_class(order)
         else:
             return local_discretization
@@ -216,13 +264,17 @@ class Discretization(TimestepCalculator):
     # {{{ construction / finalization
     def __init__(self, mesh, local_discretization=None,
             order=None, quad_min_degrees={},
-            debug=set(), default_scalar_type=np.float64, run_context=None):
+            debug=set(), default_scalar_type=np.float64, run_context=None,
+            restore_from=None):
         """
         :param quad_min_degrees: A mapping from quadrature tags to the degrees to
           which the desired quadrature is supposed to be exact.
         :param debug: A set of strings indicating which debug checks should
           be activated. See validity check below for the currently defined
           set of debug flags.
+        :param restore_from: the name of a file written by :meth:`save`
+          for the same mesh and local discretization. Its arrays are
+          memory-mapped instead of being rebuilt. See :meth:`load`.
         """
 
         self.run_context = run_context
@@ -255,11 +307,29 @@ class Discretization(TimestepCalculator):
         self.quad_min_degrees = quad_min_degrees
         self.default_scalar_type = default_scalar_type
 
+        from pytools import to_uncomplex_dtype
+        self.geometry_dtype = np.dtype(to_uncomplex_dtype(default_scalar_type))
+
         self.exec_functions = {}
 
-        self._build_element_groups_and_nodes(local_discretization)
+        from hedge.tools.buffers import BufferPool
+        self.buffer_pool = BufferPool(
+                enabled="no_buffer_pool" not in self.debug)
+
+        if restore_from is not None:
+            from hedge.tools.arraystore import ArrayStore
+            self._store = ArrayStore(restore_from)
+            self._check_store(self._store, local_discretization)
+        else:
+            self._store = None
+
+        self._build_element_groups_and_nodes(local_discretization,
+                self._store)
         self._calculate_local_matrices()
-        self._build_interior_face_groups()
+        if self._store is not None:
+            self._restore_interior_face_groups()
+        else:
+            self._build_interior_face_groups()
 
     def close(self):
         pass
@@ -371,34 +441,34 @@ class Discretization(TimestepCalculator):
     # }}}
 
     # {{{ initialization ------------------------------------------------------
-    def _build_element_groups_and_nodes(self, local_discretization):
-        from hedge.mesh.element import CurvedElement
+    def _build_element_groups_and_nodes(self, local_discretization,
+            store=None):
+        """
+        :arg store: *None* or a :class:`hedge.tools.arraystore.ArrayStore`
+          written by :meth:`save`, from which nodes and element maps are
+          taken instead of being computed.
+        """
         from hedge.mesh.element import SimplicialElement
 
-        straight_elements = [el
-                for el in self.mesh.elements
-                if isinstance(el, SimplicialElement)]
-        curved_elements = [el
-                for el in self.mesh.elements
-                if isinstance(el, CurvedElement)]
+        mesh_arrays = self.mesh.get_arrays()
+        element_count = mesh_arrays.element_count
 
         self.element_groups = []
 
         from hedge._internal import UniformElementRanges
-        if straight_elements:
+        if issubclass(mesh_arrays.element_class, SimplicialElement):
             from hedge.discretization.data import StraightElementGroup
 
             eg = StraightElementGroup()
             self.element_groups.append(eg)
 
-            eg.members = straight_elements
-            eg.member_nrs = np.fromiter((el.id for el in eg.members),
-                    dtype=np.uint32)
+            eg.members = self.mesh.elements
+            eg.member_nrs = np.arange(element_count, dtype=np.uint32)
             eg.local_discretization = ldis = local_discretization
             eg.ranges = UniformElementRanges(
                     0,
                     len(ldis.unit_nodes()),
-                    len(self.mesh.elements))
+                    element_count)
             eg.quadrature_info = {}
 
             nodes_per_el = ldis.node_count()
@@ -409,32 +479,52 @@ class Discretization(TimestepCalculator):
             #   | | |
             #   x y z
 
-            # while it seems convenient, nodes should not have an
-            # "element number" dimension: this would break once
-            # p-adaptivity is implemented
-            self.nodes = np.empty(
-                    (len(self.mesh.elements) * nodes_per_el, self.dimensions),
-                    dtype=float, order="C")
-
-            unit_nodes = np.empty((nodes_per_el, self.dimensions),
-                    dtype=float, order="C")
-
-            for i_node, node in enumerate(ldis.unit_nodes()):
-                unit_nodes[i_node] = node
-
-            from hedge._internal import map_element_nodes
-
-            for el in eg.members:
-                map_element_nodes(
-                        self.nodes,
-                        el.id * nodes_per_el * self.dimensions,
-                        el.map,
-                        unit_nodes,
-                        self.dimensions)
-
-            self.group_map = [(eg, i) for i in range(len(self.mesh.elements))]
+            if store is not None:
+                from hedge.tools.affine import StackedAffineMaps
+                eg.vertex_indices = store["eg/vertex_indices"]
+                eg.maps = StackedAffineMaps(
+                        store["eg/map_matrices"], store["eg/map_vectors"])
+                eg.inverse_maps = StackedAffineMaps(
+                        store["eg/inverse_map_matrices"],
+                        store["eg/inverse_map_vectors"])
+                eg.map_jacobians = store["eg/map_jacobians"]
+                self.nodes = store["nodes"]
+            else:
+                # while it seems convenient, nodes should not have an
+                # "element number" dimension: this would break once
+                # p-adaptivity is implemented
+                self.nodes = np.empty(
+                        (element_count * nodes_per_el,
+                            self.dimensions),
+                        dtype=float, order="C")
+
+                unit_nodes = np.empty((nodes_per_el, self.dimensions),
+                        dtype=float, order="C")
+
+                for i_node, node in enumerate(ldis.unit_nodes()):
+                    unit_nodes[i_node] = node
+
+                # Stack the element maps so that node placement and the
+                # geometric factors derived from them are computed for the
+                # whole group at once.
+                eg.vertex_indices = mesh_arrays.vertex_indices
+                eg.maps = mesh_arrays.get_maps()
+                eg.inverse_maps = eg.maps.inverted()
+                eg.map_jacobians = eg.maps.jacobians()
+
+                self.nodes.reshape(element_count, nodes_per_el,
+                        self.dimensions)[eg.member_nrs] = eg.maps(unit_nodes)
+
+            logger.debug("element group: %d elements, stacked maps "
+                    "%d bytes, nodes %d bytes" % (
+                        element_count,
+                        eg.maps.nbytes + eg.inverse_maps.nbytes
+                        + eg.map_jacobians.nbytes,
+                        self.nodes.nbytes))
+
+            self.group_map = [(eg, i) for i in range(element_count)]
 
-        if curved_elements:
+        else:
             raise NotImplementedError
 
     def _calculate_local_matrices(self):
@@ -452,38 +542,77 @@ class Discretization(TimestepCalculator):
             eg.minv_st = \
                     [np.dot(np.dot(immat, d.T), mmat) for d in dmats]
 
+    # {{{ geometric factors
+
     @memoize_method
-    def volume_jacobians(self, quadrature_tag=None, kind="numpy"):
-        """Return a full-volume vector of jacobians on nodal/
-        quadrature grid.
+    def elementwise_geometry(self, quadrature_tag=None):
+        """Return a :class:`hedge.discretization.data.ElementwiseGeometry`
+        holding the geometric factors of the nodal grid (or the
+        quadrature grid named by *quadrature_tag*) with one value per
+        element. Kernels broadcast these across the nodes of each
+        element, which avoids keeping full-volume copies resident.
         """
-
-        if kind != "numpy":
-            raise ValueError("invalid vector kind requested")
+        eg, = self.element_groups
 
         if quadrature_tag is None:
-            vol_jac = self.volume_empty(kind=kind)
-
-            for eg in self.element_groups:
-                (eg.el_array_from_volume(vol_jac).T)[:, :] = np.array([
-                    abs(el.map.jacobian())
-                    for el in eg.members])
+            ranges = eg.ranges
+        else:
+            self.get_quadrature_info(quadrature_tag)
+            ranges = eg.quadrature_info[quadrature_tag].ranges
+
+        assert ranges.start == 0
+
+        def make_factor(values):
+            return np.ascontiguousarray(values, dtype=self.geometry_dtype)
+
+        dims = self.dimensions
+        from hedge.discretization.data import ElementwiseGeometry
+        result = ElementwiseGeometry(
+                el_size=ranges.el_size,
+                jacobians=make_factor(np.abs(eg.map_jacobians)),
+                inverse_metric_derivatives=[
+                    [make_factor(eg.inverse_maps.matrices[:, rst, xyz])
+                        for rst in range(dims)]
+                    for xyz in range(dims)],
+                forward_metric_derivatives=[
+                    [make_factor(eg.maps.matrices[:, rst, xyz])
+                        for rst in range(dims)]
+                    for xyz in range(dims)])
+
+        logger.debug("elementwise geometry: %d bytes" % result.nbytes)
+        return result
 
-            return vol_jac
+    def _expand_elementwise(self, el_values, quadrature_tag):
+        """Return a full-volume vector on the nodal or quadrature grid
+        holding *el_values[i]* at each node of element *i*.
+        """
+        if quadrature_tag is None:
+            result = self.volume_empty(dtype=self.geometry_dtype, kind="numpy")
+            el_array_from_volume = self.element_groups[0].el_array_from_volume
         else:
             q_info = self.get_quadrature_info(quadrature_tag)
+            result = np.empty(q_info.node_count, dtype=self.geometry_dtype)
+            el_array_from_volume = (self.element_groups[0]
+                    .quadrature_info[quadrature_tag].el_array_from_volume)
+
+        el_array_from_volume(result).T[:, :] = el_values
+        return result
 
-            def make_empty_quad_vol_vector():
-                return np.empty(q_info.node_count, dtype=np.float64)
+    @memoize_method
+    def volume_jacobians(self, quadrature_tag=None, kind="numpy"):
+        """Return a full-volume vector of jacobians on nodal/
+        quadrature grid.
 
-            vol_jac = make_empty_quad_vol_vector()
+        Prefer :meth:`elementwise_geometry`, which stores one value
+        per element.
+        """
 
-            for eg in self.element_groups:
-                eg_q_info = eg.quadrature_info[quadrature_tag]
-                (eg_q_info.el_array_from_volume(vol_jac).T)[:, :] \
-                        = np.array([abs(el.map.jacobian()) for el in eg.members])
+        if kind != "numpy":
+            raise ValueError("invalid vector kind requested")
 
-            return vol_jac
+        return self._expand_elementwise(
+                self.elementwise_geometry(quadrature_tag).jacobians,
+                quadrature_tag)
 
     @memoize_method
     def inverse_metric_derivatives(self, quadrature_tag=None, kind="numpy"):
@@ -493,43 +622,15 @@ class Discretization(TimestepCalculator):
 
         .. math::
             \frac{d r_{\mathtt{rst\_axis}} }{d x_{\mathtt{xyz\_axis}} }
-        """
-
-        if quadrature_tag is None:
-            result = [[
-                    self.volume_empty(kind="numpy")
-                    for i in range(self.dimensions)]
-                    for i in range(self.dimensions)]
-
-            for eg in self.element_groups:
-                ldis = eg.local_discretization
 
-                for xyz_coord in range(ldis.dimensions):
-                    for rst_coord in range(ldis.dimensions):
-                        (eg.el_array_from_volume(
-                            result[xyz_coord][rst_coord]).T)[:, :] \
-                                    = [el.inverse_map.matrix[rst_coord, xyz_coord]
-                                            for el in eg.members]
+        Prefer :meth:`elementwise_geometry`, which stores one value
+        per element.
+        """
 
-        else:
-            q_info = self.get_quadrature_info(quadrature_tag)
-            result = [[
-                np.empty(q_info.node_count)
-                for i in range(self.dimensions)]
-                for i in range(self.dimensions)]
-
-            for eg in self.element_groups:
-                ldis = eg.local_discretization
-                eg_q_info = eg.quadrature_info
-
-                for xyz_coord in range(ldis.dimensions):
-                    for rst_coord in range(ldis.dimensions):
-                        (eg_q_info.el_array_from_volume(
-                            result[xyz_coord][rst_coord]).T)[:, :] \
-                                    = [el.inverse_map.matrix[rst_coord, xyz_coord]
-                                            for el in eg.members]
-
-        return result
+        return [[self._expand_elementwise(el_values, quadrature_tag)
+            for el_values in row]
+            for row in self.elementwise_geometry(
+                quadrature_tag).inverse_metric_derivatives]
 
     @memoize_method
     def forward_metric_derivatives(self, quadrature_tag=None, kind="numpy"):
@@ -539,44 +640,47 @@ class Discretization(TimestepCalculator):
 
         .. math::
             \frac{d x_{\mathtt{xyz\_axis}} }{d r_{\mathtt{rst\_axis}} }
-        """
 
-        if quadrature_tag is None:
-            result = [[
-                    self.volume_empty(kind="numpy")
-                    for i in range(self.dimensions)]
-                    for i in range(self.dimensions)]
-
-            for eg in self.element_groups:
-                ldis = eg.local_discretization
+        Prefer :meth:`elementwise_geometry`, which stores one value
+        per element.
+        """
 
-                for xyz_coord in range(ldis.dimensions):
-                    for rst_coord in range(ldis.dimensions):
-                        (eg.el_array_from_volume(
-                            result[xyz_coord][rst_coord]).T)[:, :] \
-                                    = [el.map.matrix[rst_coord, xyz_coord]
-                                            for el in eg.members]
+        return [[self._expand_elementwise(el_values, quadrature_tag)
+            for el_values in row]
+            for row in self.elementwise_geometry(
+                quadrature_tag).forward_metric_derivatives]
 
-            return result
-        else:
-            raise NotImplementedError(
-                    "forward_metric_derivatives on quadrature grids")
+    # }}}
 
-    def _set_face_pair_index_data(self, fg, fp, fi_l, fi_n,
+    def _register_face_pair_index_lists(self, fg, fi_l, fi_n,
             findices_l, findices_n, findices_shuffle_op_n):
-        fp.int_side.face_index_list_number = fg.register_face_index_list(
+        """Return a tuple *(int_number, ext_number, ext_write_map_number)*
+        of index list numbers in *fg* for a face pair joining face *fi_l*
+        to face *fi_n*.
+        """
+        int_number = fg.register_face_index_list(
                 identifier=fi_l,
                 generator=lambda: findices_l)
-        fp.ext_side.face_index_list_number = fg.register_face_index_list(
+        ext_number = fg.register_face_index_list(
                 identifier=(fi_n, findices_shuffle_op_n),
                 generator=lambda: findices_shuffle_op_n(findices_n))
         from pytools import get_write_to_map_from_permutation
-        fp.ext_native_write_map = fg.register_face_index_list(
+        ext_write_map_number = fg.register_face_index_list(
                 identifier=(fi_n, findices_shuffle_op_n, "wtm"),
                 generator=lambda:
                 get_write_to_map_from_permutation(
                     findices_shuffle_op_n(findices_n), findices_n))
 
+        return int_number, ext_number, ext_write_map_number
+
+    def _set_face_pair_index_data(self, fg, fp, fi_l, fi_n,
+            findices_l, findices_n, findices_shuffle_op_n):
+        (fp.int_side.face_index_list_number,
+                fp.ext_side.face_index_list_number,
+                fp.ext_native_write_map) = \
+                        self._register_face_pair_index_lists(fg, fi_l, fi_n,
+                                findices_l, findices_n, findices_shuffle_op_n)
+
     def _set_flux_face_data(self, f, ldis, (el, fi)):
         f.element_jacobian = el.map.jacobian()
         f.face_jacobian = el.face_jacobians[fi]
@@ -593,100 +697,253 @@ class Discretization(TimestepCalculator):
         # This unification happens below.
         f.h = abs(el.map.jacobian() / f.face_jacobian)
 
+    @memoize_method
+    def _element_face_geometry(self):
+        """Return a tuple *(face_jacobians, face_normals)* of arrays of
+        shape *(element_count, face_count)* and *(element_count,
+        face_count, dimensions)*, indexed by element number.
+        """
+        return self.mesh.get_arrays().get_face_geometry()
+
+    def _build_boundary_face_group(self, els, fis, int_el_bases,
+            face_index_lists, face_length, bdry_start=0):
+        """Return a single-sided face group (not yet committed) with one
+        face pair for face *fis[i]* of element *els[i]*, for each *i*.
+
+        :arg int_el_bases: the base index of each element in the vector
+          read on the interior side.
+        :arg face_index_lists: a sequence of node index tuples relative
+          to the element base, one for each face number.
+        :arg face_length: the number of nodes per face.
+        :arg bdry_start: the boundary node number at which the
+          exterior sides start. Each face occupies *face_length*
+          consecutive boundary nodes, in the order of *els*.
+        """
+        from hedge._internal import (INVALID_ELEMENT, INVALID_FACE,
+                INVALID_INDEX, append_face_pairs)
+        from hedge.discretization.data import StraightFaceGroup
+
+        eg, = self.element_groups
+        ldis = eg.local_discretization
+        fp_count = len(els)
+
+        fg = StraightFaceGroup(double_sided=False,
+                debug="ilist_generation" in self.debug)
+
+        int_ilist_numbers = np.zeros(ldis.face_count(), dtype=np.uint32)
+        for fi in np.unique(fis):
+            fi = int(fi)
+            int_ilist_numbers[fi] = fg.register_face_index_list(
+                    identifier=fi,
+                    generator=lambda: face_index_lists[fi])
+        ext_ilist_number = fg.register_face_index_list(
+                identifier=(),
+                generator=lambda: tuple(xrange(face_length)))
+
+        int_data = np.empty((fp_count, 5), dtype=np.uint32)
+        int_data[:, 0] = int_el_bases
+        int_data[:, 1] = int_ilist_numbers[fis]
+        int_data[:, 2] = els
+        int_data[:, 3] = fis
+        int_data[:, 4] = ldis.order
+
+        ext_data = np.empty((fp_count, 5), dtype=np.uint32)
+        ext_data[:, 0] = bdry_start + face_length*np.arange(fp_count)
+        ext_data[:, 1] = ext_ilist_number
+        ext_data[:, 2] = INVALID_ELEMENT
+        ext_data[:, 3] = INVALID_FACE
+        ext_data[:, 4] = 0
+
+        # See _set_flux_face_data.
+        face_jacobians, face_normals = self._element_face_geometry()
+        el_jacobians = eg.map_jacobians[els]
+        fj = face_jacobians[els, fis]
+
+        int_geometry = np.empty((fp_count, 3+self.dimensions),
+                dtype=np.float64)
+        int_geometry[:, 0] = abs(el_jacobians / fj)
+        int_geometry[:, 1] = fj
+        int_geometry[:, 2] = el_jacobians
+        int_geometry[:, 3:] = face_normals[els, fis]
+
+        ext_native_write_map = np.empty(fp_count, dtype=np.uint32)
+        ext_native_write_map.fill(INVALID_INDEX)
+
+        append_face_pairs(fg, int_data, ext_data, ext_native_write_map,
+                int_geometry, np.zeros_like(int_geometry))
+
+        return fg
+
     def _build_interior_face_groups(self):
-        from hedge.discretization.local import FaceVertexMismatch
+        """Build the face group of all interior faces.
+
+        Rather than visiting each entry of :attr:`hedge.mesh.Mesh.interfaces`
+        in turn, face matching, index lists and geometric data are
+        computed as :mod:`numpy` arrays and handed to
+        :func:`hedge._internal.append_face_pairs` in one go.
+        """
         from hedge.discretization.data import StraightFaceGroup
-        fg_type = StraightFaceGroup
-        fg = fg_type(double_sided=True,
+        fg = StraightFaceGroup(double_sided=True,
                 debug="ilist_generation" in self.debug)
 
-        all_ldis_l = []
-        all_ldis_n = []
+        mesh_arrays = self.mesh.get_arrays()
 
-        debug_node_perm = "node_permutation" in self.debug
+        # columns: local element, local face, neighbor element, neighbor face
+        iface = mesh_arrays.interfaces
 
-        # find and match node indices along faces
-        for i, (local_face, neigh_face) in enumerate(self.mesh.interfaces):
-            e_l, fi_l = local_face
-            e_n, fi_n = neigh_face
+        if not len(iface):
+            self.face_groups = []
+            return
 
-            eslice_l, ldis_l = self.find_el_data(e_l.id)
-            eslice_n, ldis_n = self.find_el_data(e_n.id)
+        el_l, fi_l, el_n, fi_n = iface.T
+        fp_count = len(iface)
 
-            all_ldis_l.append(ldis_l)
-            all_ldis_n.append(ldis_n)
+        # {{{ per-element data
 
-            vertices_l = e_l.faces[fi_l]
-            vertices_n = e_n.faces[fi_n]
+        eg, = self.element_groups
+        ldis = eg.local_discretization
+        dims = self.dimensions
 
-            findices_l = ldis_l.face_indices()[fi_l]
-            findices_n = ldis_n.face_indices()[fi_n]
+        # Element number i is entry i of the sole element group,
+        # cf. _build_element_groups_and_nodes.
+        el_base_indices = (eg.ranges.start
+                + eg.ranges.el_size*np.arange(
+                    mesh_arrays.element_count, dtype=np.intp))
 
-            try:
-                findices_shuffle_op_n = ldis_l.get_face_index_shuffle_to_match(
-                        vertices_l, vertices_n)
+        # shape: (element, face, vertex)
+        face_vertices = eg.vertex_indices[:, mesh_arrays.face_vertex_numbers()]
 
-            except FaceVertexMismatch:
-                # This happens if vertices_l is not a permutation
-                # of vertices_n. Periodicity is the only reason why
-                # that would be so.
+        el_jacobians = eg.map_jacobians
+        face_jacobians, face_normals = self._element_face_geometry()
 
-                vertices_n, periodic_axis = self.mesh.periodic_opposite_faces[
-                        vertices_n]
+        # }}}
 
-                findices_shuffle_op_n = \
-                        ldis_l.get_face_index_shuffle_to_match(
-                                vertices_l, vertices_n)
-            else:
-                periodic_axis = None
+        # {{{ match face vertices
 
-            # create and fill the face pair
-            fp = fg_type.FacePair()
+        vertices_l = face_vertices[el_l, fi_l]
+        vertices_n = face_vertices[el_n, fi_n]
 
-            fp.int_side.el_base_index = eslice_l.start
-            fp.ext_side.el_base_index = eslice_n.start
+        def get_vertex_matches():
+            # shape: (face pair, neighbor vertex, local vertex)
+            return vertices_n[:, :, np.newaxis] == vertices_l[:, np.newaxis, :]
 
-            self._set_face_pair_index_data(fg, fp, fi_l, fi_n,
-                    findices_l, findices_n, findices_shuffle_op_n)
+        vertex_matches = get_vertex_matches()
+        mismatched = ~np.all(np.any(vertex_matches, axis=2), axis=1)
 
-            self._set_flux_face_data(fp.int_side, ldis_l, local_face)
-            self._set_flux_face_data(fp.ext_side, ldis_n, neigh_face)
+        periodic_axes = np.empty(fp_count, dtype=np.intp)
+        periodic_axes.fill(-1)
 
-            # unify h across the faces
-            fp.int_side.h = fp.ext_side.h = max(fp.int_side.h, fp.ext_side.h)
-            assert (abs(fp.int_side.face_jacobian - fp.ext_side.face_jacobian)
-                    / abs(fp.int_side.face_jacobian)) < 1e-13
+        if mismatched.any():
+            # This happens if vertices_l is not a permutation
+            # of vertices_n. Periodicity is the only reason why
+            # that would be so.
+            for i in np.nonzero(mismatched)[0]:
+                opp_vertices, periodic_axes[i] = \
+                        self.mesh.periodic_opposite_faces[
+                                tuple(vertices_n[i])]
+                vertices_n[i] = opp_vertices
 
-            # check that we set the C++ attrs, not new Python ones
-            assert len(fp.__dict__) == 0
-            assert len(fp.int_side.__dict__) == 0
-            assert len(fp.ext_side.__dict__) == 0
+            vertex_matches = get_vertex_matches()
+            if not np.all(np.any(vertex_matches, axis=2)):
+                from hedge.discretization.local import FaceVertexMismatch
+                raise FaceVertexMismatch("face vertices do not match")
 
-            fg.face_pairs.append(fp)
+        # position of each neighbor vertex among the local ones
+        vertex_perms = np.argmax(vertex_matches, axis=2)
+        vertex_count = vertex_perms.shape[1]
+        perm_codes = np.dot(vertex_perms, vertex_count**np.arange(vertex_count))
+        _, perm_representatives, perm_numbers = np.unique(
+                perm_codes, return_index=True, return_inverse=True)
 
-            # check that nodes match up
-            if (debug_node_perm
-                    and ldis_l.has_facial_nodes
-                    and ldis_n.has_facial_nodes):
-                findices_shuffled_n = findices_shuffle_op_n(findices_n)
+        shuffle_lookup_map = ldis.get_face_index_shuffle_lookup_map()
+        shuffles = [shuffle_lookup_map[tuple(vertex_perms[i])]
+                for i in perm_representatives]
 
-                for i, j in zip(findices_l, findices_shuffled_n):
-                    dist = self.nodes[eslice_l.start + i] \
-                            - self.nodes[eslice_n.start + j]
-                    if periodic_axis is not None:
-                        dist[periodic_axis] = 0
-                    assert la.norm(dist) < 1e-14
+        # }}}
 
-        if len(fg.face_pairs):
-            from pytools import single_valued
-            ldis_l = single_valued(all_ldis_l)
-            ldis_n = single_valued(all_ldis_n)
+        # {{{ register index lists
 
-            fg.commit(self, ldis_l, ldis_n)
+        face_indices = ldis.face_indices()
 
-            self.face_groups = [fg]
-        else:
-            self.face_groups = []
+        # one combination of (local face, neighbor face, shuffle)
+        # per distinct set of index lists
+        combo_codes = (fi_l*len(face_indices) + fi_n)*len(shuffles) \
+                + perm_numbers
+        unique_combo_codes, combo_numbers = np.unique(
+                combo_codes, return_inverse=True)
+
+        combo_ilist_numbers = np.empty((len(unique_combo_codes), 3),
+                dtype=np.uint32)
+        for i, code in enumerate(unique_combo_codes):
+            code, perm_number = divmod(code, len(shuffles))
+            combo_fi_l, combo_fi_n = divmod(code, len(face_indices))
+
+            combo_ilist_numbers[i] = self._register_face_pair_index_lists(
+                    fg, combo_fi_l, combo_fi_n,
+                    face_indices[combo_fi_l], face_indices[combo_fi_n],
+                    shuffles[perm_number])
+
+        # columns: interior list, exterior list, exterior write map
+        fp_ilist_numbers = combo_ilist_numbers[combo_numbers]
+
+        # }}}
+
+        # {{{ assemble face pair data
+
+        def make_side_data(els, fis, ilist_numbers):
+            result = np.empty((fp_count, 5), dtype=np.uint32)
+            result[:, 0] = el_base_indices[els]
+            result[:, 1] = ilist_numbers
+            result[:, 2] = els
+            result[:, 3] = fis
+            result[:, 4] = ldis.order
+            return result
+
+        int_data = make_side_data(el_l, fi_l, fp_ilist_numbers[:, 0])
+        ext_data = make_side_data(el_n, fi_n, fp_ilist_numbers[:, 1])
+
+        fj_l = face_jacobians[el_l, fi_l]
+        fj_n = face_jacobians[el_n, fi_n]
+        assert (abs(fj_l - fj_n) / abs(fj_l) < 1e-13).all()
+
+        # This approximation is shamelessly stolen from sledge.
+        # h on both sides of an interface must be the same, otherwise
+        # the penalty term will behave very oddly. See _set_flux_face_data.
+        h = np.maximum(
+                abs(el_jacobians[el_l] / fj_l),
+                abs(el_jacobians[el_n] / fj_n))
+
+        def make_side_geometry(els, fis):
+            result = np.empty((fp_count, 3+dims), dtype=np.float64)
+            result[:, 0] = h
+            result[:, 1] = face_jacobians[els, fis]
+            result[:, 2] = el_jacobians[els]
+            result[:, 3:] = face_normals[els, fis]
+            return result
+
+        from hedge._internal import append_face_pairs
+        append_face_pairs(fg, int_data, ext_data,
+                fp_ilist_numbers[:, 2].copy(),
+                make_side_geometry(el_l, fi_l),
+                make_side_geometry(el_n, fi_n))
+
+        # }}}
+
+        # check that nodes match up
+        if "node_permutation" in self.debug and ldis.has_facial_nodes:
+            index_lists = np.array(fg.fil_registry.index_lists, dtype=np.intp)
+            dist = (
+                    self.nodes[el_base_indices[el_l][:, np.newaxis]
+                        + index_lists[fp_ilist_numbers[:, 0]]]
+                    - self.nodes[el_base_indices[el_n][:, np.newaxis]
+                        + index_lists[fp_ilist_numbers[:, 1]]])
+
+            is_periodic = periodic_axes >= 0
+            dist[is_periodic, :, periodic_axes[is_periodic]] = 0
+            assert (np.sum(dist**2, axis=-1) < 1e-28).all()
+
+        fg.commit(self, ldis, ldis)
+        self.face_groups = [fg]
 
     # }}}
 
@@ -703,76 +960,202 @@ class Discretization(TimestepCalculator):
         (Otherwise get_boundary would unnecessarily become non-local when run
         in parallel.)
         """
-        from hedge.discretization.data import StraightFaceGroup
-        nodes = []
-        vol_indices = []
-        fg_type = StraightFaceGroup
-        face_group = fg_type(double_sided=False,
-                debug="ilist_generation" in self.debug)
-        ldis = None  # if this boundary is empty, we might as well have no ldis
-        el_face_to_face_group_and_face_pair = {}
+        if (self._store is not None
+                and self._boundary_tag_key(tag)
+                in self._store.metadata["boundaries"]):
+            return self._restore_boundary(tag)
 
-        for ef in self.mesh.tag_to_boundary.get(tag, []):
-            el, face_nr = ef
-
-            el_slice, ldis = self.find_el_data(el.id)
-            face_indices = ldis.face_indices()[face_nr]
-            face_indices_ary = np.array(face_indices, dtype=np.intp)
-
-            f_start = len(nodes)
-            nodes.extend(self.nodes[el_slice.start + face_indices_ary])
-            vol_indices.extend(el_slice.start + face_indices_ary)
-
-            # create the face pair
-            fp = face_group.FacePair()
-            fp.int_side.el_base_index = el_slice.start
-            fp.ext_side.el_base_index = f_start
-            fp.int_side.face_index_list_number = face_group.register_face_index_list(
-                    identifier=face_nr,
-                    generator=lambda: face_indices)
-            fp.ext_side.face_index_list_number = face_group.register_face_index_list(
-                    identifier=(),
-                    generator=lambda: tuple(xrange(len(face_indices))))
-            self._set_flux_face_data(fp.int_side, ldis, ef)
-
-            # check that all property assigns found their C++-side slots
-            assert len(fp.__dict__) == 0
-            assert len(fp.int_side.__dict__) == 0
-            assert len(fp.ext_side.__dict__) == 0
-
-            face_group.face_pairs.append(fp)
-
-            # and make it possible to find it later
-            el_face_to_face_group_and_face_pair[ef] = \
-                    face_group, len(face_group.face_pairs)-1
-
-        if ldis is not None:
-            face_group.commit(self, ldis, ldis)
-            face_groups = [face_group]
-        else:
-            face_groups = []
+        from hedge.discretization.data import Boundary
+
+        bdry_el_faces = self.mesh.get_arrays().tag_to_boundary.get(tag)
+
+        if bdry_el_faces is None or not len(bdry_el_faces):
+            return Boundary(
+                    discr=self,
+                    nodes=np.zeros((0, self.dimensions), dtype=np.float64),
+                    vol_indices=[],
+                    face_groups=[],
+                    fg_ranges=[])
+
+        eg, = self.element_groups
+        ldis = eg.local_discretization
+
+        els = bdry_el_faces[:, 0]
+        fis = bdry_el_faces[:, 1]
+
+        # Element number i is entry i of the sole element group,
+        # cf. _build_element_groups_and_nodes.
+        el_bases = eg.ranges.start + eg.ranges.el_size*els
+
+        face_index_lists = ldis.face_indices()
+        face_length = ldis.face_node_count()
+
+        vol_indices = (el_bases[:, np.newaxis]
+                + np.array(face_index_lists, dtype=np.intp)[fis]).reshape(-1)
+
+        face_group = self._build_boundary_face_group(
+                els, fis, el_bases, face_index_lists, face_length)
+        face_group.commit(self, ldis, ldis)
 
         from hedge._internal import UniformElementRanges
         fg_ranges = [UniformElementRanges(
             0,  # FIXME: need to vary element starts
-            fg.ldis_loc.face_node_count(), len(face_group.face_pairs))
-            for fg in face_groups]
+            face_length, len(face_group.face_pairs))]
 
-        nodes_ary = np.array(nodes)
-        nodes_ary.shape = (len(nodes), self.dimensions)
+        return Boundary(
+                discr=self,
+                nodes=self.nodes[vol_indices],
+                vol_indices=vol_indices,
+                face_groups=[face_group],
+                fg_ranges=fg_ranges,
+                el_face_to_face_group_and_face_pair=dict(
+                    (tuple(ef), (face_group, i))
+                    for i, ef in enumerate(bdry_el_faces.tolist())))
 
-        from hedge.discretization.data import Boundary
-        bdry = Boundary(
+    # }}}
+
+    # {{{ persistence
+
+    # Increment when the set or meaning of the arrays written by save()
+    # changes.
+    STORE_VERSION = 1
+
+    @staticmethod
+    def _boundary_tag_key(tag):
+        if isinstance(tag, type):
+            return "%s.%s" % (tag.__module__, tag.__name__)
+        else:
+            return repr(tag)
+
+    def _get_store_metadata(self, local_discretization):
+        return dict(
+                version=self.STORE_VERSION,
+                dimensions=self.dimensions,
+                element_count=len(self.mesh.elements),
+                vertex_count=len(self.mesh.points),
+                local_discretization="%s(%d)" % (
+                    type(local_discretization).__name__,
+                    local_discretization.order))
+
+    def _check_store(self, store, local_discretization):
+        expected = self._get_store_metadata(local_discretization)
+        for key, value in expected.iteritems():
+            if store.metadata.get(key) != value:
+                raise ValueError("stored discretization does not match: "
+                        "%s is %s, expected %s"
+                        % (key, store.metadata.get(key), value))
+
+    def _get_stored_arrays(self, prefix):
+        store = self._store
+        return dict(
+                (name[len(prefix):], store[name])
+                for name in store.keys()
+                if name.startswith(prefix))
+
+    def save(self, filename, boundary_tags=None):
+        """Write the arrays that make up this discretization (nodes,
+        element maps, face groups and boundaries) to *filename*, from
+        which :meth:`load` restores it without rebuilding.
+
+        :arg boundary_tags: the tags whose boundaries are saved. Defaults
+          to all tags of the mesh.
+        """
+        if boundary_tags is None:
+            boundary_tags = list(self.mesh.tag_to_boundary.keys())
+
+        eg, = self.element_groups
+        arrays = {
+                "nodes": self.nodes,
+                "eg/vertex_indices": eg.vertex_indices,
+                "eg/map_matrices": eg.maps.matrices,
+                "eg/map_vectors": eg.maps.vectors,
+                "eg/inverse_map_matrices": eg.inverse_maps.matrices,
+                "eg/inverse_map_vectors": eg.inverse_maps.vectors,
+                "eg/map_jacobians": eg.map_jacobians,
+                }
+
+        def add_face_groups(prefix, face_groups):
+            for fg_nr, fg in enumerate(face_groups):
+                for name, ary in fg.get_arrays(self.dimensions).iteritems():
+                    arrays["%sfg%d/%s" % (prefix, fg_nr, name)] = ary
+
+        add_face_groups("", self.face_groups)
+
+        boundaries = {}
+        for tag in boundary_tags:
+            bdry = self.get_boundary(tag)
+            key = self._boundary_tag_key(tag)
+            boundaries[key] = len(bdry.face_groups)
+            arrays["bdry/%s/vol_indices" % key] = bdry.vol_indices
+            add_face_groups("bdry/%s/" % key, bdry.face_groups)
+
+        metadata = self._get_store_metadata(eg.local_discretization)
+        metadata["face_group_count"] = len(self.face_groups)
+        metadata["boundaries"] = boundaries
+
+        from hedge.tools.arraystore import write_array_store
+        write_array_store(filename, arrays, metadata)
+
+    @classmethod
+    def load(cls, filename, mesh, *args, **kwargs):
+        """Return a discretization of *mesh* restored from *filename*,
+        which was written by :meth:`save`. The remaining arguments are
+        passed to the constructor and must specify the same local
+        discretization as when the file was saved.
+
+        The stored arrays are memory-mapped, so processes loading the
+        same file share its pages.
+        """
+        kwargs["restore_from"] = filename
+        return cls(mesh, *args, **kwargs)
+
+    def _restore_interior_face_groups(self):
+        from hedge.discretization.data import StraightFaceGroup
+        ldis = self.element_groups[0].local_discretization
+
+        self.face_groups = [
+                StraightFaceGroup.from_arrays(
+                    self._get_stored_arrays("fg%d/" % fg_nr),
+                    double_sided=True, ldis_loc=ldis, ldis_opp=ldis,
+                    debug="ilist_generation" in self.debug)
+                for fg_nr in range(self._store.metadata["face_group_count"])]
+
+    def _restore_boundary(self, tag):
+        from hedge.discretization.data import StraightFaceGroup, Boundary
+        from hedge._internal import (UniformElementRanges,
+                get_face_pair_side_data)
+
+        key = self._boundary_tag_key(tag)
+        prefix = "bdry/%s/" % key
+        ldis = self.element_groups[0].local_discretization
+
+        face_groups = [
+                StraightFaceGroup.from_arrays(
+                    self._get_stored_arrays("%sfg%d/" % (prefix, fg_nr)),
+                    double_sided=False, ldis_loc=ldis, ldis_opp=ldis,
+                    debug="ilist_generation" in self.debug)
+                for fg_nr in range(self._store.metadata["boundaries"][key])]
+
+        el_face_to_face_group_and_face_pair = {}
+        for fg in face_groups:
+            side_data = get_face_pair_side_data(fg)
+            for fp_nr, el_face in enumerate(side_data[:, 0, 1:3].tolist()):
+                el_face_to_face_group_and_face_pair[tuple(el_face)] = \
+                        fg, fp_nr
+
+        vol_indices = self._store[prefix + "vol_indices"]
+        return Boundary(
                 discr=self,
-                nodes=nodes_ary,
+                nodes=self.nodes[vol_indices],
                 vol_indices=vol_indices,
                 face_groups=face_groups,
-                fg_ranges=fg_ranges,
+                fg_ranges=[
+                    UniformElementRanges(
+                        0, ldis.face_node_count(), len(fg.face_pairs))
+                    for fg in face_groups],
                 el_face_to_face_group_and_face_pair=
                 el_face_to_face_group_and_face_pair)
 
-        return bdry
-
     # }}}
 
     # {{{ quadrature descriptors
@@ -963,7 +1346,51 @@ class Discretization(TimestepCalculator):
             dtype = self.default_scalar_type
         return np.zeros(shape + (len(self.nodes),), dtype)
 
+    def pooled_volume_empty(self, dtype=None, shape=()):
+        """Like :meth:`volume_empty`, but reuse an array from
+        :attr:`buffer_pool` if one has been released.
+        """
+        if dtype is None:
+            dtype = self.default_scalar_type
+        return self.buffer_pool.empty(shape + (len(self.nodes),), dtype)
+
+    def pooled_volume_zeros(self, dtype=None, shape=()):
+        """Like :meth:`volume_zeros`, but reuse an array from
+        :attr:`buffer_pool` if one has been released.
+        """
+        if dtype is None:
+            dtype = self.default_scalar_type
+        return self.buffer_pool.zeros(shape + (len(self.nodes),), dtype)
+
+    @memoize_method
+    def node_coordinate_component(self, axis, kind="numpy"):
+        """Return a full-volume vector of the *axis* coordinate of all
+        nodes, in :attr:`geometry_dtype`.
+        """
+        return self.convert_volume(
+                np.array(self.nodes[:, axis], dtype=self.geometry_dtype),
+                kind=kind)
+
+    def _interpolate_function(self, f, points, el_ids, out, get_el):
+        """Evaluate *f* at the *n* nodes *points*, lying in the elements
+        numbered *el_ids*, into *out*, of shape *f.shape + (n,)*.
+        *get_el* maps an element number to the element passed to
+        functions that are not vectorized.
+        """
+        if getattr(f, "is_vectorized", False):
+            out[...] = f(points, el_ids)
+        else:
+            slice_pfx = (slice(None),) * (out.ndim - 1)
+            for point_nr, (x, el_id) in enumerate(zip(points, el_ids)):
+                out[slice_pfx + (point_nr,)] = f(x, get_el(el_id))
+
     def interpolate_volume_function(self, f, dtype=None, kind=None):
+        """Return a volume vector holding *f* at each node.
+
+        :arg f: a :class:`VectorizedFunction`, or a callable *f(x, el)*
+          of a single node *x* in the element *el*. If *f* has a *shape*
+          attribute, the result has that many leading axes.
+        """
         if kind is None:
             kind = self.compute_kind
 
@@ -974,13 +1401,16 @@ class Discretization(TimestepCalculator):
             # no, just one
             shape = ()
 
-        slice_pfx = (slice(None),) * len(shape)
         out = self.volume_empty(shape, dtype, kind="numpy")
         for eg in self.element_groups:
-            for el, el_slice in zip(eg.members, eg.ranges):
-                for point_nr in xrange(el_slice.start, el_slice.stop):
-                    out[slice_pfx + (point_nr,)] = \
-                                f(self.nodes[point_nr], el)
+            start = eg.ranges.start
+            stop = start + eg.ranges.total_size
+            self._interpolate_function(f,
+                    self.nodes[start:stop],
+                    np.repeat(eg.member_nrs, eg.ranges.el_size),
+                    out[..., start:stop],
+                    lambda el_id: self.mesh.elements[el_id])
+
         return self.convert_volume(out, kind=kind)
 
     def boundary_empty(self, tag, shape=(), dtype=None, kind="numpy"):
@@ -999,7 +1429,24 @@ class Discretization(TimestepCalculator):
 
         return np.zeros(shape + (len(self.get_boundary(tag).nodes),), dtype)
 
+    @memoize_method
+    def _boundary_element_ids(self, tag):
+        bdry = self.get_boundary(tag)
+        if bdry.is_empty():
+            return np.zeros(0, dtype=np.intp)
+
+        # Element number i is entry i of the sole element group,
+        # cf. _build_element_groups_and_nodes.
+        eg, = self.element_groups
+        return eg.member_nrs[
+                (bdry.vol_indices - eg.ranges.start) // eg.ranges.el_size]
+
     def interpolate_boundary_function(self, f, tag, dtype=None, kind=None):
+        """Return a boundary vector holding *f* at each node of the
+        boundary tagged *tag*. *f* is as for
+        :meth:`interpolate_volume_function`, except that functions that
+        are not vectorized receive *None* for the element.
+        """
         if kind is None:
             kind = self.compute_kind
 
@@ -1011,9 +1458,11 @@ class Discretization(TimestepCalculator):
             shape = ()
 
         out = self.boundary_zeros(tag, shape, dtype, kind="numpy")
-        slice_pfx = (slice(None),) * len(shape)
-        for point_nr, x in enumerate(self.get_boundary(tag).nodes):
-            out[slice_pfx + (point_nr,)] = f(x, None)  # FIXME
+        self._interpolate_function(f,
+                self.get_boundary(tag).nodes,
+                self._boundary_element_ids(tag),
+                out,
+                lambda el_id: None)  # FIXME
 
         return self.convert_boundary(out, tag, kind)
 
@@ -1021,16 +1470,25 @@ class Discretization(TimestepCalculator):
     def boundary_normals(self, tag, dtype=None, kind=None):
         if kind is None:
             kind = self.compute_kind
+        if dtype is None:
+            dtype = self.geometry_dtype
 
         result = self.boundary_zeros(shape=(self.dimensions,),
                 tag=tag, dtype=dtype, kind="numpy")
+
+        from hedge._internal import get_face_pair_side_data
+        face_jacobians, face_normals = self._element_face_geometry()
         for fg in self.get_boundary(tag).face_groups:
-            for face_pair in fg.face_pairs:
-                oeb = face_pair.ext_side.el_base_index
-                opp_index_list = \
-                        fg.index_lists[face_pair.ext_side.face_index_list_number]
-                for i in opp_index_list:
-                    result[:, oeb+i] = face_pair.int_side.normal
+            side_data = get_face_pair_side_data(fg).astype(np.intp)
+            els = side_data[:, 0, 1]
+            fis = side_data[:, 0, 2]
+
+            # The boundary side of each face pair occupies consecutive
+            # boundary nodes, cf. _build_boundary_face_group.
+            bdry_indices = (side_data[:, 1, 0][:, np.newaxis]
+                    + np.arange(fg.face_length()))
+            result[:, bdry_indices] = \
+                    face_normals[els, fis].T[:, :, np.newaxis]
 
         return self.convert_boundary(result, tag, kind)
 
@@ -1089,8 +1547,8 @@ class Discretization(TimestepCalculator):
 
             return result
         else:
-            return field[tuple(slice(None) for i in range(
-                len(ls))) + (bdry.vol_indices,)]
+            # leading (ensemble) axes are carried along
+            return field[..., bdry.vol_indices]
 
     def boundarize_volume_field_async(self, field, tag, kind=None):
         from hedge.tools.futures import ImmediateFuture
@@ -1209,77 +1667,143 @@ class Discretization(TimestepCalculator):
 
     @memoize_method
     def dt_geometric_factor(self):
-        return min(min(eg.local_discretization.dt_geometric_factor(
-            [self.mesh.points[i] for i in el.vertex_indices], el)
-            for el in eg.members)
-            for eg in self.element_groups)
-
-    def get_point_evaluator(self, point, use_btree=False, thresh=0):
-        def make_point_evaluator(el, eg, rng):
-            """For a given element *el*/element group *eg* in which *point*
-            is contained, return a callable that accepts fields an returns
-            an evaluation at *point*.
-            """
+        return min(
+                eg.local_discretization.dt_geometric_factors(
+                    self.mesh.points[eg.vertex_indices],
+                    eg.map_jacobians,
+                    self._element_face_geometry()[0][eg.member_nrs]).min()
+                for eg in self.element_groups)
 
-            ldis = eg.local_discretization
-            basis_values = np.array([
-                phi(el.inverse_map(point))
-                for phi in ldis.basis_functions()])
-            vdm_t = ldis.vandermonde().T
+    @memoize_method
+    def get_element_bin_grid(self, eg):
+        """Return a
+        :class:`hedge.discretization.point_location.ElementBinGrid` over
+        the elements of the element group *eg*.
+        """
+        from hedge.discretization.point_location import ElementBinGrid
+        return ElementBinGrid(
+                self.mesh.points[eg.vertex_indices], eg.inverse_maps)
+
+    def locate_points(self, points, thresh=0):
+        """Find the elements containing *points*, an array of shape
+        *(n_points, dimensions)*.
+
+        :returns: a list of tuples *(eg, point_indices, el_indices,
+          unit_points)*, one for each element group containing any of
+          *points*. *el_indices* are indices into *eg.members*, and
+          *unit_points* are the coordinates of the points relative to
+          these elements. Points contained in no element do not appear.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        remaining = np.arange(len(points), dtype=np.intp)
+
+        result = []
+        for eg in self.element_groups:
+            if not len(remaining):
+                break
+
+            el_indices, unit_points = self.get_element_bin_grid(eg).locate(
+                    points[remaining], thresh)
+            found = el_indices >= 0
+            if found.any():
+                result.append((eg, remaining[found], el_indices[found],
+                    unit_points[found]))
+            remaining = remaining[~found]
+
+        return result
+
+    def get_point_evaluation_operator(self, points, thresh=0):
+        """Return a
+        :class:`hedge.discretization.point_location.PointEvaluationOperator`
+        evaluating volume vectors at *points*, an array of shape
+        *(n_points, dimensions)*.
+
+        :arg thresh: tolerance by which a point may lie outside of an
+          element and still be considered contained in it, in unit
+          coordinates.
+        :raises RuntimeError: if any of *points* is not found.
+        """
+        points = np.asarray(points, dtype=np.float64)
+
+        el_sizes = set(eg.local_discretization.node_count()
+                for eg in self.element_groups)
+        if len(el_sizes) != 1:
+            raise NotImplementedError("point evaluation with "
+                    "differing element sizes")
+        el_size, = el_sizes
+
+        node_indices = np.empty((len(points), el_size), dtype=np.intp)
+        node_indices.fill(-1)
+        coefficients = np.empty((len(points), el_size), dtype=np.float64)
+
+        for eg, point_indices, el_indices, unit_points in \
+                self.locate_points(points, thresh):
+            node_indices[point_indices] = (
+                    eg.ranges.start + el_indices[:, np.newaxis]*el_size
+                    + np.arange(el_size, dtype=np.intp))
+            coefficients[point_indices] = \
+                    eg.local_discretization.lagrange_basis_values(unit_points)
+
+        missing = np.flatnonzero(node_indices[:, 0] < 0)
+        if len(missing):
+            raise RuntimeError(
+                    "%d of %d points not found, e.g. %s. "
+                    "Consider changing threshold."
+                    % (len(missing), len(points), points[missing[0]]))
+
+        from hedge.discretization.point_location import \
+                PointEvaluationOperator
+        return PointEvaluationOperator(
+                node_indices, coefficients, len(self.nodes))
+
+    def get_point_evaluator(self, point, use_btree=None, thresh=0):
+        """Return a callable that accepts volume vectors and returns
+        their value at *point*.
+
+        Uses the same element bins as :meth:`get_point_evaluation_operator`.
+        To evaluate at many points, use
+        :meth:`get_point_evaluation_operator` instead.
+
+        :param use_btree: deprecated and ignored.
+        """
+        if use_btree is not None:
+            _warn_use_btree_deprecated()
+
+        point = np.asarray(point, dtype=np.float64)
+        for eg, point_indices, el_indices, unit_points in \
+                self.locate_points(point[np.newaxis], thresh):
+            el_index, = el_indices
             return _PointEvaluator(
                     discr=self,
-                    el_range=rng,
-                    interp_coeff=la.solve(vdm_t, basis_values))
-
-        if use_btree:
-            elements_in_bucket = self.get_spatial_btree().generate_matches(point)
-            for el, rng, eg in elements_in_bucket:
-                if el.contains_point(point, thresh):
-                    pe = make_point_evaluator(el, eg, rng)
-                    return pe
-        else:
-            for eg in self.element_groups:
-                for el, rng in zip(eg.members, eg.ranges):
-                    if el.contains_point(point, thresh):
-                        pe = make_point_evaluator(el, eg, rng)
-                        return pe
+                    el_range=eg.ranges[int(el_index)],
+                    interp_coeff=eg.local_discretization
+                    .lagrange_basis_values(unit_points)[0])
 
         raise RuntimeError(
                 "point %s not found. Consider changing threshold."
                 % point)
 
     def get_regrid_values(self, field_in, new_discr, dtype=None,
-            use_btree=True, thresh=0):
+            use_btree=None, thresh=0):
         """:param field_in: nodal values on old grid.
         :param new_discr: new discretization.
-        :param use_btree: bool to decide if a spatial binary tree will be used.
+        :param use_btree: deprecated and ignored.
+
+        To regrid repeatedly between the same discretizations, build a
+        :class:`Regridder` once instead.
         """
+        if use_btree is not None:
+            _warn_use_btree_deprecated()
 
         if self.get_kind(field_in) != "numpy":
             raise NotImplementedError(
                     "get_regrid_values needs numpy input field")
 
-        def regrid(scalar_field):
-            result = new_discr.volume_empty(dtype=dtype, kind="numpy")
-            for ii in range(len(new_discr.nodes)):
-                pe = self.get_point_evaluator(new_discr.nodes[ii], use_btree, thresh)
-                result[ii] = pe(scalar_field)
-            return result
-
-        from pytools.obj_array import with_object_array_or_scalar
-        return with_object_array_or_scalar(regrid, field_in)
-
-    @memoize_method
-    def get_spatial_btree(self):
-        from pytools.spatial_btree import SpatialBinaryTreeBucket
-        spatial_btree = SpatialBinaryTreeBucket(*self.mesh.bounding_box())
-
-        for eg in self.element_groups:
-            for el, rng in zip(eg.members, eg.ranges):
-                spatial_btree.insert(
-                        (el, rng, eg), el.bounding_box(self.mesh.points))
+        if dtype is None:
+            dtype = new_discr.default_scalar_type
 
-        return spatial_btree
+        return Regridder(self, new_discr, thresh=thresh, dtype=dtype)(
+                field_in)
 
     # }}}
 
@@ -1448,34 +1972,189 @@ class Projector:
                         leftsolve(from_matrix, np.dot(to_matrix, pmat)),
                         order="C"))
 
-    def __call__(self, from_vec):
-        from hedge._internal import perform_elwise_operator
+    def _project_stacked(self, stacked, results):
+        """Project the rows of *stacked*, an array of shape
+        *(n_components, from_node_count)*, into *results*, a list of
+        *n_components* volume vectors of :attr:`to_discr`, using one matrix
+        product per element group.
+        """
+        n_components = len(stacked)
+
+        for from_eg, to_eg, imat in zip(
+                self.from_discr.element_groups,
+                self.to_discr.element_groups,
+                self.interp_matrices):
+            from_rng = from_eg.ranges
+            to_rng = to_eg.ranges
+            el_count = len(from_rng)
+
+            from_blocks = stacked[:, from_rng.start:
+                    from_rng.start+from_rng.total_size].reshape(
+                            n_components*el_count, from_rng.el_size)
+            to_blocks = np.dot(from_blocks, imat.T).reshape(
+                    n_components, el_count, to_rng.el_size)
+
+            for result, to_block in zip(results, to_blocks):
+                result[to_rng.start:to_rng.start+to_rng.total_size] \
+                        .reshape(el_count, to_rng.el_size)[:] = to_block
+
+    def __call__(self, from_vec, out=None):
+        """Project *from_vec*, a volume vector of :attr:`from_discr` or an
+        object array of these, to :attr:`to_discr`.
+
+        The components of an object array are projected together, with one
+        matrix product per element group.
+
+        :arg out: if given, a volume vector (or object array of volume
+          vectors) of :attr:`to_discr` of matching shape into which the
+          result is written, and which is returned.
+        """
         from hedge.tools import log_shape
+        from pytools import indices_in_shape
 
         ls = log_shape(from_vec)
-        result = np.empty(shape=ls, dtype=object)
+        if ls == ():
+            components = [from_vec]
+        else:
+            components = [from_vec[i] for i in indices_in_shape(ls)]
+
+        if out is None:
+            dtype = np.result_type(self.to_discr.default_scalar_type,
+                    *[c.dtype for c in components])
+            stacked_result = np.zeros(
+                    (len(components), len(self.to_discr.nodes)), dtype=dtype)
+            results = list(stacked_result)
+        elif ls == ():
+            results = [out]
+        else:
+            results = [out[i] for i in indices_in_shape(ls)]
 
-        from pytools import indices_in_shape
-        for i in indices_in_shape(ls):
-            result_i = self.to_discr.volume_zeros(kind="numpy")
-            result[i] = result_i
-
-            for from_eg, to_eg, imat in zip(
-                    self.from_discr.element_groups,
-                    self.to_discr.element_groups,
-                    self.interp_matrices):
-                perform_elwise_operator(
-                        from_eg.ranges, to_eg.ranges,
-                        imat, from_vec[i], result_i)
+        if len(set((c.shape, c.dtype) for c in components)) == 1:
+            self._project_stacked(np.array(components), results)
+        else:
+            for component, result in zip(components, results):
+                self._project_stacked(component[np.newaxis], [result])
 
-        if ls == ():
-            return result[()]
+        if out is not None:
+            return out
+        elif ls == ():
+            return results[0]
         else:
+            result = np.empty(shape=ls, dtype=object)
+            for i, result_i in zip(indices_in_shape(ls), results):
+                result[i] = result_i
             return result
 
 # }}}
 
 
+# {{{ regridding between different discretizations
+
+_forked_regrid_discr = None
+
+
+def _get_point_evaluation_chunk(args):
+    points, thresh = args
+    op = _forked_regrid_discr.get_point_evaluation_operator(points, thresh)
+    return op.node_indices, op.coefficients
+
+
+def _get_point_evaluation_operator_forked(discr, points, thresh, processes):
+    """Like :meth:`Discretization.get_point_evaluation_operator`, but split
+    across *processes* worker processes. The workers inherit *discr* by
+    forking, since discretizations cannot be pickled.
+
+    Forking a process that runs threads may deadlock the children, so if
+    *discr* has an instruction thread pool or threaded element loops, the
+    operator is built in this process instead.
+    """
+    if (getattr(discr, "instruction_thread_pool", None) is not None
+            or getattr(discr, "thread_count", 1) > 1):
+        from warnings import warn
+        warn("not forking worker processes from a discretization "
+                "that uses threads, locating points in this process")
+        return discr.get_point_evaluation_operator(points, thresh)
+
+    # build the element bins once, before forking
+    for eg in discr.element_groups:
+        discr.get_element_bin_grid(eg)
+
+    global _forked_regrid_discr
+    _forked_regrid_discr = discr
+
+    from multiprocessing import Pool
+    pool = Pool(processes)
+    try:
+        chunks = pool.map(_get_point_evaluation_chunk,
+                [(chunk, thresh)
+                    for chunk in np.array_split(points, processes)])
+    except:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+        _forked_regrid_discr = None
+
+    from hedge.discretization.point_location import PointEvaluationOperator
+    return PointEvaluationOperator(
+            np.concatenate([node_indices for node_indices, _ in chunks]),
+            np.concatenate([coefficients for _, coefficients in chunks]),
+            len(discr.nodes))
+
+
+class Regridder(object):
+    """Interpolates volume vectors of one discretization to the nodes of
+    another, unrelated one.
+
+    The interpolation is assembled once, as a sparse matrix (see
+    :class:`hedge.discretization.point_location.PointEvaluationOperator`),
+    so that regridding a field is a single gather and reduction. Instances
+    hold no reference to either discretization and may be pickled, e.g. to
+    be reused after a restart.
+    """
+
+    def __init__(self, from_discr, to_discr, thresh=0, dtype=None,
+            processes=None):
+        """
+        :arg thresh: tolerance by which nodes of *to_discr* may lie outside
+          of the elements of *from_discr*, in unit coordinates.
+        :arg dtype: the dtype of the regridded fields. If *None*, it
+          follows from the input.
+        :arg processes: if greater than one, locate the nodes of
+          *to_discr* using this many forked worker processes. This is
+          skipped, with a warning, if *from_discr* uses threads (see
+          the *thread_count* and *instruction_thread_count* arguments of
+          :class:`hedge.backends.jit.Discretization`), and should not be
+          used while other threads of this process are running.
+        """
+        points = to_discr.nodes
+        if processes is not None and processes > 1:
+            self.operator = _get_point_evaluation_operator_forked(
+                    from_discr, points, thresh, processes)
+        else:
+            self.operator = from_discr.get_point_evaluation_operator(
+                    points, thresh)
+
+        self.dtype = dtype
+
+    def __call__(self, field):
+        """Regrid *field*, a volume vector or an object array of these,
+        in one step.
+        """
+        result = self.operator(field)
+
+        if self.dtype is not None:
+            from pytools.obj_array import with_object_array_or_scalar
+            result = with_object_array_or_scalar(
+                    lambda subresult: subresult.astype(self.dtype), result)
+
+        return result
+
+# }}}
+
+
 # {{{ filter
 
 class ExponentialFilterResponseFunction:
@@ -56,6 +56,47 @@ class QuadratureInfo(object):
 # }}}
 
 
+# {{{ elementwise geometry
+
+class ElementwiseGeometry(object):
+    r"""Geometric factors of straight-sided elements, which are constant
+    on each element and are therefore stored with one value per element
+    instead of one value per node.
+
+    :ivar el_size: the number of nodes per element on the grid these
+      factors belong to. Node *i* of that grid lies in element
+      *i // el_size*.
+    :ivar jacobians: a vector of element jacobians.
+    :ivar inverse_metric_derivatives: A list of lists of per-element
+        vectors, such that the vector
+        *inverse_metric_derivatives[xyz_axis][rst_axis]* gives
+
+        .. math::
+            \frac{d r_{\mathtt{rst\_axis}} }{d x_{\mathtt{xyz\_axis}} }
+
+    :ivar forward_metric_derivatives: laid out like
+      *inverse_metric_derivatives*, for the forward map.
+    """
+
+    def __init__(self, el_size, jacobians,
+            inverse_metric_derivatives, forward_metric_derivatives):
+        self.el_size = el_size
+        self.jacobians = jacobians
+        self.inverse_metric_derivatives = inverse_metric_derivatives
+        self.forward_metric_derivatives = forward_metric_derivatives
+
+    @property
+    def nbytes(self):
+        return self.jacobians.nbytes + sum(
+                v.nbytes
+                for mds in [self.inverse_metric_derivatives,
+                    self.forward_metric_derivatives]
+                for row in mds
+                for v in row)
+
+# }}}
+
+
 # {{{ element groups
 
 class ElementGroupBase(object):
@@ -79,6 +120,12 @@ class StraightElementGroup(ElementGroupBase):
     :ivar stiffness_matrices: the element-local stiffness matrices
         :math:`MD_r, MD_s,\dots`.
     :ivar quadrature_info: a map from quadrature tag to QuadratureInfo instance.
+    :ivar vertex_indices: an integer array of shape *(n, dim+1)* holding
+      the vertex numbers of each member.
+    :ivar maps: a :class:`hedge.tools.affine.StackedAffineMaps` holding the
+      unit-to-global map of each member.
+    :ivar inverse_maps: the inverses of *maps*.
+    :ivar map_jacobians: an array of the jacobians of *maps*.
     """
 
     def vol_el_view(self, vol_array):
@@ -170,6 +217,8 @@ class StraightFaceGroup(hedge._internal.StraightFaceGroup):
         in :attr:`ldis_loc`.
     :ivar local_el_write_base: a list of global volume
         element base indices, indexed in local element numbers.
+    :ivar color_starts: see :meth:`color_face_pairs`.
+    :ivar colored_face_pairs: see :meth:`color_face_pairs`.
 
     Face groups on quadrature grids additionally have these
     properties:
@@ -185,6 +234,7 @@ class StraightFaceGroup(hedge._internal.StraightFaceGroup):
 
     .. method:: element_count()
     .. method:: face_length()
+    .. method:: color_count()
     """
 
     def __init__(self, double_sided, debug):
@@ -215,38 +265,159 @@ class StraightFaceGroup(hedge._internal.StraightFaceGroup):
         else:
             self.face_count = ldis_loc.face_count()
 
-        # number elements locally
-        used_bases_and_els = list(set(
-                (side.el_base_index, side.element_id)
-                for fp in self.face_pairs
-                for side in [fp.int_side, fp.ext_side]
-                if side.element_id != hedge._internal.INVALID_ELEMENT))
+        # number elements locally, in order of (base index, element id)
+        from hedge._internal import (INVALID_ELEMENT, INVALID_INDEX,
+                get_face_pair_side_data, set_local_el_numbers)
+        side_data = get_face_pair_side_data(self)
+        el_bases = side_data[:, :, 0]
+        el_ids = side_data[:, :, 1]
+        has_element = el_ids != INVALID_ELEMENT
+
+        side_bases = el_bases[has_element]
+        side_els = el_ids[has_element]
+        order = np.lexsort((side_els, side_bases))
+        is_new = np.ones(len(order), dtype=bool)
+        is_new[1:] = ((np.diff(side_bases[order]) != 0)
+                | (np.diff(side_els[order]) != 0))
+
+        used_bases = side_bases[order][is_new]
+        used_els = side_els[order][is_new]
+
+        local_el_numbers = np.empty(el_ids.shape, dtype=np.uint32)
+        local_el_numbers.fill(INVALID_INDEX)
+        side_local_el_numbers = np.empty(len(order), dtype=np.uint32)
+        side_local_el_numbers[order] = np.cumsum(is_new) - 1
+        local_el_numbers[has_element] = side_local_el_numbers
+        set_local_el_numbers(self, local_el_numbers)
 
         if get_write_el_base is None:
-            def get_write_el_base(read_base, el_id):
-                return read_base
-
-        used_bases_and_els.sort()
-        el_id_to_local_number = dict(
-                (bae[1], i) for i, bae in enumerate(used_bases_and_els))
-        self.local_el_write_base = np.fromiter(
-                (get_write_el_base(*bae)
-                    for bae in used_bases_and_els), dtype=np.uint32)
-
-        for fp in self.face_pairs:
-            for side in [fp.int_side, fp.ext_side]:
-                if side.element_id != hedge._internal.INVALID_ELEMENT:
-                    side.local_el_number = el_id_to_local_number[side.element_id]
+            self.local_el_write_base = used_bases.astype(np.uint32)
+        else:
+            self.local_el_write_base = np.fromiter(
+                    (get_write_el_base(read_base, el_id)
+                        for read_base, el_id in zip(used_bases, used_els)),
+                    dtype=np.uint32)
 
         # transfer inverse jacobians
-        self.local_el_inverse_jacobians = np.fromiter(
-                (abs(discr.mesh.elements[bae[1]].inverse_map.jacobian())
-                    for bae in used_bases_and_els),
-                dtype=float)
+        # Element number i is entry i of the sole element group.
+        eg, = discr.element_groups
+        self.local_el_inverse_jacobians = 1/np.abs(
+                eg.map_jacobians[used_els])
+
+        self.color_face_pairs()
 
         self.ldis_loc = ldis_loc
         self.ldis_opp = ldis_opp
 
+    # {{{ persistence
+
+    def get_arrays(self, dimensions):
+        """Return a dictionary of the arrays describing this committed
+        face group, from which :meth:`from_arrays` restores it.
+        """
+        from hedge._internal import get_face_pairs, get_face_pair_side_data
+        (int_data, ext_data, ext_native_write_map,
+                int_geometry, ext_geometry) = get_face_pairs(self, dimensions)
+
+        return dict(
+                int_data=int_data,
+                ext_data=ext_data,
+                ext_native_write_map=ext_native_write_map,
+                int_geometry=int_geometry,
+                ext_geometry=ext_geometry,
+                local_el_numbers=get_face_pair_side_data(self)[:, :, 3],
+                index_lists=self.index_lists,
+                local_el_write_base=self.local_el_write_base,
+                local_el_inverse_jacobians=self.local_el_inverse_jacobians,
+                colored_face_pairs=self.colored_face_pairs,
+                color_starts=self.color_starts)
+
+    @classmethod
+    def from_arrays(cls, arrays, double_sided, ldis_loc, ldis_opp,
+            debug=False):
+        """Return a committed face group restored from the dictionary
+        *arrays* returned by :meth:`get_arrays`.
+        """
+        from hedge._internal import append_face_pairs, set_local_el_numbers
+
+        fg = cls(double_sided=double_sided, debug=debug)
+        del fg.fil_registry
+
+        append_face_pairs(fg,
+                arrays["int_data"], arrays["ext_data"],
+                arrays["ext_native_write_map"],
+                arrays["int_geometry"], arrays["ext_geometry"])
+        set_local_el_numbers(fg, arrays["local_el_numbers"])
+
+        fg.index_lists = arrays["index_lists"]
+        fg.face_count = ldis_loc.face_count()
+        fg.local_el_write_base = arrays["local_el_write_base"]
+        fg.local_el_inverse_jacobians = arrays["local_el_inverse_jacobians"]
+        fg.colored_face_pairs = arrays["colored_face_pairs"]
+        fg.color_starts = arrays["color_starts"]
+
+        fg.ldis_loc = ldis_loc
+        fg.ldis_opp = ldis_opp
+
+        return fg
+
+    # }}}
+
+    def color_face_pairs(self):
+        """Partition the face pairs into batches ("colors") such that no
+        two face pairs of the same color write to the same slot of a
+        fluxes-on-faces vector. The face pairs of each color may then be
+        gathered in parallel without synchronization.
+
+        Sets :attr:`colored_face_pairs` to the face pair numbers, sorted
+        by color, and :attr:`color_starts` to the start of each color in
+        :attr:`colored_face_pairs`, followed by its total length.
+
+        In a conformal mesh, every (element, face) slot is written by
+        exactly one face pair, so this results in a single color.
+        """
+        from hedge._internal import INVALID_ELEMENT, get_face_pair_side_data
+        side_data = get_face_pair_side_data(self)
+        has_element = side_data[:, :, 1] != INVALID_ELEMENT
+        face_ids = side_data[:, :, 2].astype(np.intp)
+        local_el_numbers = side_data[:, :, 3].astype(np.intp)
+
+        if has_element.any():
+            face_id_count = face_ids[has_element].max() + 1
+        else:
+            face_id_count = 1
+
+        # one slot number per (local element, face)
+        slots = local_el_numbers*face_id_count + face_ids
+
+        if len(np.unique(slots[has_element])) == has_element.sum():
+            # no two face pairs share a slot
+            fp_colors = np.zeros(len(slots), dtype=np.uint32)
+        else:
+            # greedy coloring
+            slot_to_colors = {}
+            fp_colors = np.empty(len(slots), dtype=np.uint32)
+            for fp_nr, (fp_slots, fp_has_element) in enumerate(
+                    zip(slots, has_element)):
+                fp_slots = fp_slots[fp_has_element]
+
+                taken_colors = set()
+                for slot in fp_slots:
+                    taken_colors.update(slot_to_colors.get(slot, ()))
+
+                color = 0
+                while color in taken_colors:
+                    color += 1
+
+                for slot in fp_slots:
+                    slot_to_colors.setdefault(slot, set()).add(color)
+                fp_colors[fp_nr] = color
+
+        self.colored_face_pairs = np.argsort(
+                fp_colors, kind="mergesort").astype(np.uint32)
+        self.color_starts = np.hstack((
+            [0], np.cumsum(np.bincount(fp_colors)))).astype(np.uint32)
+
 
 class CurvedFaceGroup(hedge._internal.CurvedFaceGroup):
     def __init__(self, double_sided, debug):
@@ -361,7 +532,8 @@ class Boundary(object):
       DOF numbers in the boundary vector for each face. Note: The entries of
       this list are actually C++ ElementRanges objects. There is one list per face
       group object, in the same order.
-    :ivar el_face_to_face_group_and_face_pair:
+    :ivar el_face_to_face_group_and_face_pair: a mapping
+      *(element number, face number) -> (face group, face pair index)*.
     """
     def __init__(self, discr, nodes, vol_indices, face_groups, fg_ranges,
             el_face_to_face_group_and_face_pair={}):
@@ -374,16 +546,22 @@ class Boundary(object):
                 el_face_to_face_group_and_face_pair
 
     def find_facepair(self, el_face):
-        fg, fp_idx = self.el_face_to_face_group_and_face_pair[el_face]
+        """Return the face pair for *el_face*, a tuple *(element, face
+        number)* whose element may be given as an instance or by number.
+        """
+        el, face_nr = el_face
+        fg, fp_idx = self.el_face_to_face_group_and_face_pair[
+                getattr(el, "id", el), face_nr]
 
         return fg.face_pairs[fp_idx]
 
     def find_facepair_side(self, el_face):
         fp = self.find_facepair(el_face)
         el, face_nbr = el_face
+        el_id = getattr(el, "id", el)
 
         for flux_face in [fp.int_side, fp.ext_side]:
-            if flux_face.element_id == el.id and flux_face.face_id == face_nbr:
+            if flux_face.element_id == el_id and flux_face.face_id == face_nbr:
                 return flux_face
         raise KeyError("flux face not found in boundary")
 
@@ -412,6 +590,7 @@ class Boundary(object):
     @memoize_method
     def get_quadrature_info(self, quadrature_tag):
         discr = self.discr
+        discr.get_quadrature_info(quadrature_tag)
 
         from hedge._internal import UniformElementRanges
 
@@ -440,45 +619,24 @@ class Boundary(object):
             fg_start += quad_fg_range.total_size
 
             # create the quadrature face group
-            quad_fg = type(fg)(double_sided=False,
-                    debug="ilist_generation" in discr.debug)
+            from hedge._internal import get_face_pair_side_data
+            side_data = get_face_pair_side_data(fg).astype(np.intp)
+            els = side_data[:, 0, 1]
+            fis = side_data[:, 0, 2]
+
+            # Element number i is entry i of the sole element group.
+            eg, = discr.element_groups
+            el_faces_ranges = eg.quadrature_info[quadrature_tag].el_faces_ranges
+
+            quad_fg = discr._build_boundary_face_group(
+                    els, fis,
+                    el_faces_ranges.start + el_faces_ranges.el_size*els,
+                    [tuple(range(quad_fnc*face_nr, quad_fnc*(face_nr+1)))
+                        for face_nr in range(ldis.face_count())],
+                    quad_fnc, f_start)
             quad_face_groups.append(quad_fg)
 
-            # create quadrature face pairs
-            for fp in fg.face_pairs:
-                el = discr.mesh.elements[fp.int_side.element_id]
-                face_nr = fp.int_side.face_id
-                ef = el, face_nr
-
-                quad_fp = quad_fg.FacePair()
-
-                def find_el_base_index(el):
-                    group, idx = discr.group_map[el.id]
-                    return group.quadrature_info[quadrature_tag] \
-                            .el_faces_ranges[idx].start
-
-                face_indices = tuple(range(quad_fnc*face_nr, quad_fnc*(face_nr+1)))
-
-                quad_fp.int_side.el_base_index = find_el_base_index(el)
-                quad_fp.ext_side.el_base_index = f_start
-                quad_fp.int_side.face_index_list_number = \
-                        quad_fg.register_face_index_list(
-                                identifier=face_nr,
-                                generator=lambda: face_indices)
-                quad_fp.ext_side.face_index_list_number = \
-                        quad_fg.register_face_index_list(
-                                identifier=(),
-                                generator=lambda: tuple(xrange(quad_fnc)))
-                self.discr._set_flux_face_data(quad_fp.int_side, ldis, ef)
-
-                # check that all property assigns found their C++-side slots
-                assert len(fp.__dict__) == 0
-                assert len(fp.int_side.__dict__) == 0
-                assert len(fp.ext_side.__dict__) == 0
-
-                quad_fg.face_pairs.append(quad_fp)
-
-                f_start += quad_fnc
+            f_start += quad_fnc*len(els)
 
             assert f_start == fg_start
 
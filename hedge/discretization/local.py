@@ -525,6 +525,35 @@ class PkSimplexDiscretization(OrthonormalLocalDiscretization):
         return generate_nonnegative_integer_tuples_summing_to_at_most(
                 self.order, self.dimensions)
 
+    def _onb_vandermonde(self, unit_points):
+        """Return :meth:`vandermonde` for *unit_points*, an array of shape
+        *(dimensions, n)*, evaluated for all points at once.
+        """
+        from hedge.polynomial import simplex_onb_vandermonde
+        return simplex_onb_vandermonde(unit_points,
+                self.generate_mode_identifiers())
+
+    @memoize_method
+    def _inverse_vandermonde(self):
+        return la.inv(self._onb_vandermonde(
+            numpy.array(self.unit_nodes()).T))
+
+    def lagrange_basis_values(self, unit_points):
+        """Return an array of shape *(len(unit_points), node_count())*
+        holding the values of the nodal basis functions at each of
+        *unit_points*, an array of shape *(n, dimensions)*.
+
+        Row *i* of the result, dotted with the nodal values of a field on
+        an element, evaluates that field at *unit_points[i]*. The nodal
+        basis is obtained from the orthonormal basis through the inverse
+        of :meth:`vandermonde`, which is well-conditioned.
+        """
+        unit_points = numpy.asarray(unit_points, dtype=numpy.float64)
+        return numpy.dot(
+                self._onb_vandermonde(
+                    unit_points.reshape(-1, self.dimensions).T),
+                self._inverse_vandermonde())
+
     # }}}
 
     # {{{ time step scaling ---------------------------------------------------
@@ -539,6 +568,15 @@ class PkSimplexDiscretization(OrthonormalLocalDiscretization):
                     for face_node_index in face_indices)
                     for face_indices in self.face_indices())
 
+    def dt_geometric_factor(self, vertices, el):
+        """Return :meth:`dt_geometric_factors` for the single element *el*
+        with *vertices*.
+        """
+        return self.dt_geometric_factors(
+                numpy.asarray(vertices)[numpy.newaxis],
+                numpy.array([el.map.jacobian()]),
+                numpy.array([el.face_jacobians]))[0]
+
     # }}}
 
     # {{{ quadrature ----------------------------------------------------------
@@ -828,8 +866,15 @@ class IntervalDiscretization(PkSimplexDiscretization):
             unodes = self.unit_nodes()
             return la.norm(unodes[0] - unodes[1]) * 0.85
 
-    def dt_geometric_factor(self, vertices, el):
-        return abs(el.map.jacobian())
+    def dt_geometric_factors(self, vertices, jacobians, face_jacobians):
+        """Return a factor by which the time step for each of *n* elements
+        scales with its geometry.
+
+        :arg vertices: an array of shape *(n, 2, 1)*.
+        :arg jacobians: an array of shape *(n,)* of map jacobians.
+        :arg face_jacobians: an array of shape *(n, 2)*.
+        """
+        return numpy.abs(jacobians)
 
 # }}}
 
@@ -1049,9 +1094,11 @@ class TriangleDiscretization(PkSimplexDiscretization):
     # }}}
 
     # time step scaling -------------------------------------------------------
-    def dt_geometric_factor(self, vertices, el):
-        area = abs(2 * el.map.jacobian())
-        semiperimeter = sum(la.norm(vertices[vi1] - vertices[vi2])
+    def dt_geometric_factors(self, vertices, jacobians, face_jacobians):
+        area = numpy.abs(2 * jacobians)
+        semiperimeter = sum(
+                numpy.sqrt(numpy.sum(
+                    (vertices[:, vi1] - vertices[:, vi2])**2, axis=-1))
                 for vi1, vi2 in [(0, 1), (1, 2), (2, 0)])/2
         return area / semiperimeter
 
@@ -1375,8 +1422,9 @@ class TetrahedronDiscretization(PkSimplexDiscretization):
                     self.order, self.dimensions-1)]
 
     # time step scaling -------------------------------------------------------
-    def dt_geometric_factor(self, vertices, el):
-        result = abs(el.map.jacobian())/max(abs(fj) for fj in el.face_jacobians)
+    def dt_geometric_factors(self, vertices, jacobians, face_jacobians):
+        result = (numpy.abs(jacobians)
+                / numpy.max(numpy.abs(face_jacobians), axis=-1))
         if self.order in [1, 2]:
             from warnings import warn
             warn("cowardly halving timestep for order 1 and 2 tets "
@@ -0,0 +1,240 @@
+"""Batched point location and evaluation of volume fields at points."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+
+import numpy as np
+
+
+def _expand_segments(counts):
+    """For segments of lengths *counts*, return a pair *(owners, offsets)*
+    of arrays with one entry per segment member, holding the index of
+    the segment it belongs to and its position within that segment.
+    """
+    counts = np.asarray(counts, dtype=np.intp)
+    owners = np.repeat(np.arange(len(counts), dtype=np.intp), counts)
+    starts = np.cumsum(counts) - counts
+    offsets = np.arange(len(owners), dtype=np.intp) - starts[owners]
+    return owners, offsets
+
+
+# {{{ element bin grid
+
+class ElementBinGrid(object):
+    """A uniform grid of bins covering a set of simplices, with each bin
+    listing the simplices whose bounding boxes overlap it. The grid has
+    about as many bins as there are simplices, so that each point only
+    needs to be tested against a handful of candidates.
+
+    .. attribute:: origin
+    .. attribute:: bin_size
+    .. attribute:: shape
+
+        number of bins along each axis.
+
+    .. attribute:: bin_starts
+    .. attribute:: bin_elements
+
+        candidate lists in compressed form: the simplices overlapping bin
+        *i* (in C order of the grid) are
+        *bin_elements[bin_starts[i]:bin_starts[i+1]]*, ascending.
+    """
+
+    def __init__(self, vertices, inverse_maps):
+        """
+        :arg vertices: an array of shape *(n_el, dim+1, dim)*.
+        :arg inverse_maps: a :class:`hedge.tools.affine.StackedAffineMaps`
+          taking global coordinates to the unit coordinates of each simplex.
+        """
+        vertices = np.asarray(vertices)
+        el_min = vertices.min(axis=1)
+        el_max = vertices.max(axis=1)
+        n_el, dim = el_min.shape
+
+        self.inverse_maps = inverse_maps
+        self.dimensions = dim
+
+        self.origin = el_min.min(axis=0)
+        extent = el_max.max(axis=0) - self.origin
+        extent[extent == 0] = 1
+
+        bin_size = (np.prod(extent) / max(n_el, 1)) ** (1/dim)
+        self.shape = np.maximum(
+                np.ceil(extent / bin_size).astype(np.intp), 1)
+        self.bin_size = extent / self.shape
+
+        lower = self.get_bin_coordinates(el_min)
+        bin_extents = self.get_bin_coordinates(el_max) - lower + 1
+
+        pair_els, k = _expand_segments(np.prod(bin_extents, axis=1))
+        pair_coords = np.empty((len(pair_els), dim), dtype=np.intp)
+        for axis in reversed(range(dim)):
+            axis_extents = bin_extents[pair_els, axis]
+            pair_coords[:, axis] = lower[pair_els, axis] + k % axis_extents
+            k = k // axis_extents
+
+        pair_bins = np.ravel_multi_index(tuple(pair_coords.T), self.shape)
+        order = np.lexsort((pair_els, pair_bins))
+
+        self.bin_elements = pair_els[order]
+        self.bin_starts = np.zeros(np.prod(self.shape)+1, dtype=np.intp)
+        np.cumsum(np.bincount(pair_bins, minlength=np.prod(self.shape)),
+                out=self.bin_starts[1:])
+
+    def get_bin_coordinates(self, points):
+        """Return the integer grid coordinates of the bins containing
+        *points*. Points outside the grid are assigned to the nearest bin.
+        """
+        return np.clip(
+                np.floor((points - self.origin) / self.bin_size).astype(np.intp),
+                0, self.shape - 1)
+
+    def locate(self, points, thresh=0):
+        """Find the simplices containing *points*, an array of shape
+        *(n_points, dim)*.
+
+        :arg thresh: tolerance by which a point may lie outside of a
+          simplex and still be considered contained in it, in unit
+          coordinates. (see
+          :meth:`hedge.mesh.element.SimplicialElement.contains_point`)
+          Only simplices whose bounding boxes overlap the bin of a point
+          are tested.
+        :returns: a tuple *(el_indices, unit_points)*. *el_indices* holds,
+          for each point, the index of the first simplex containing it,
+          or -1 if there is none. *unit_points* holds the coordinates of
+          each point relative to that simplex.
+        """
+        points = np.asarray(points, dtype=np.float64)
+        n_points = len(points)
+        dim = self.dimensions
+
+        bins = np.ravel_multi_index(
+                tuple(self.get_bin_coordinates(points).T), self.shape)
+        bin_starts = self.bin_starts[bins]
+        pair_points, k = _expand_segments(self.bin_starts[bins+1] - bin_starts)
+        pair_els = self.bin_elements[bin_starts[pair_points] + k]
+
+        pair_unit_points = np.einsum("pij,pj->pi",
+                self.inverse_maps.matrices[pair_els],
+                points[pair_points]) + self.inverse_maps.vectors[pair_els]
+
+        contained = np.flatnonzero(
+                (pair_unit_points >= -1-thresh).all(axis=1)
+                & (pair_unit_points.sum(axis=1) <= -(dim-2)+thresh))
+
+        # pair_points is ascending, and candidates within a bin are
+        # ascending, so this picks the lowest-numbered containing simplex,
+        # as a linear search would.
+        found_points, first = np.unique(
+                pair_points[contained], return_index=True)
+        first = contained[first]
+
+        el_indices = np.empty(n_points, dtype=np.intp)
+        el_indices.fill(-1)
+        el_indices[found_points] = pair_els[first]
+
+        unit_points = np.zeros((n_points, dim), dtype=np.float64)
+        unit_points[found_points] = pair_unit_points[first]
+
+        return el_indices, unit_points
+
+# }}}
+
+
+# {{{ point evaluation operator
+
+class PointEvaluationOperator(object):
+    """Evaluates volume vectors at a fixed set of points.
+
+    This is a sparse matrix with one row per point, holding the values of
+    the nodal basis functions of the element containing the point. Since
+    every row has the same number of entries, it is stored as two dense
+    arrays, and applying it to a field is one gather and one reduction.
+
+    .. attribute:: node_indices
+
+        an integer array of shape *(n_points, nodes_per_element)* holding
+        the volume node numbers each point's value depends on.
+
+    .. attribute:: coefficients
+
+        the corresponding weights, of the same shape.
+
+    .. attribute:: volume_node_count
+    """
+
+    def __init__(self, node_indices, coefficients, volume_node_count):
+        self.node_indices = node_indices
+        self.coefficients = coefficients
+        self.volume_node_count = volume_node_count
+
+    def __len__(self):
+        return len(self.node_indices)
+
+    def __call__(self, field):
+        """Evaluate *field* at the points. *field* may be an object array of
+        volume vectors, or have leading ensemble axes.
+
+        The components of an object array are stacked and evaluated in a
+        single gather if they all have the same shape and dtype.
+        """
+        def evaluate(subfield):
+            return np.sum(
+                    subfield[..., self.node_indices] * self.coefficients,
+                    axis=-1)
+
+        from pytools.obj_array import is_obj_array
+        if not is_obj_array(field):
+            return evaluate(field)
+
+        components = list(field.flat)
+        if not (components
+                and all(isinstance(c, np.ndarray) for c in components)
+                and len(set((c.shape, c.dtype) for c in components)) == 1):
+            from pytools.obj_array import with_object_array_or_scalar
+            return with_object_array_or_scalar(evaluate, field)
+
+        values = evaluate(np.array(components))
+
+        result = np.empty(field.shape, dtype=object)
+        for value, i in zip(values, np.ndindex(*field.shape)):
+            result[i] = value
+        return result
+
+    def to_scipy_sparse(self):
+        """Return this operator as a :class:`scipy.sparse.csr_matrix`."""
+        from scipy.sparse import csr_matrix
+
+        n_points, row_length = self.node_indices.shape
+        return csr_matrix(
+                (self.coefficients.ravel(), self.node_indices.ravel(),
+                    np.arange(0, n_points*row_length+1, row_length)),
+                shape=(n_points, self.volume_node_count))
+
+# }}}
+
+
+# vim: foldmethod=marker
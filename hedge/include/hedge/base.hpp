@@ -67,6 +67,52 @@ namespace hedge {
 
 
 
+  // threading ----------------------------------------------------------------
+  /* Number of threads used by the element loops in the volume operators.
+   * Only has an effect if hedge was built with OpenMP support.
+   */
+  inline unsigned &thread_count_setting()
+  {
+    static unsigned thread_count = 1;
+    return thread_count;
+  }
+
+  inline unsigned get_thread_count()
+  { return thread_count_setting(); }
+
+  inline void set_thread_count(unsigned thread_count)
+  {
+    if (thread_count == 0)
+      throw std::runtime_error("thread count must be positive");
+    thread_count_setting() = thread_count;
+  }
+
+
+  /* Releases the Python global interpreter lock for the lifetime of the
+   * object, so that other Python threads may run alongside a kernel.
+   * No Python objects (including numpy_vector copies) may be touched
+   * while it exists.
+   */
+  class release_gil
+  {
+    private:
+      PyThreadState *m_thread_state;
+
+      release_gil(const release_gil &);
+      release_gil &operator=(const release_gil &);
+
+    public:
+      release_gil()
+        : m_thread_state(PyEval_SaveThread())
+      { }
+
+      ~release_gil()
+      { PyEval_RestoreThread(m_thread_state); }
+  };
+
+
+
+
   // basic linear algebra -----------------------------------------------------
   /* Matrix inversion 
    * Modified from original by Fredrik Orderud. 
@@ -131,6 +131,17 @@ namespace hedge
     unsigned face_count;
     numpy_vector<npy_uint> local_el_write_base;
 
+    /* Face pairs are partitioned into "colors", within each of which
+     * no two face pairs write to the same fluxes-on-faces slot. The
+     * face pairs of color c are
+     *
+     * face_pairs[colored_face_pairs[i]]
+     *
+     * for color_starts[c] <= i < color_starts[c+1].
+     */
+    numpy_vector<npy_uint> color_starts;
+    numpy_vector<npy_uint> colored_face_pairs;
+
     face_group(bool d_sided)
       : double_sided(d_sided), 
       face_count(0)
@@ -139,6 +150,9 @@ namespace hedge
     unsigned element_count() const
     { return local_el_write_base.size(); }
 
+    unsigned color_count() const
+    { return color_starts.size() ? color_starts.size()-1 : 0; }
+
     unsigned face_length() const
     { return index_lists.dims()[1]; }
 
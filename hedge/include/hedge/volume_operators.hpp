@@ -198,11 +198,18 @@ namespace hedge {
       numpy_vector<Scalar> const &operand,
       numpy_vector<Scalar> result)
   {
-    unsigned i = 0;
-    BOOST_FOREACH(const element_range er, ers)
+    const int el_count = ers.size();
+    const unsigned thread_count = get_thread_count();
+
+#ifdef _OPENMP
+#pragma omp parallel for num_threads(thread_count) schedule(static) \
+    if(thread_count > 1)
+#endif
+    for (int i = 0; i < el_count; ++i)
     {
+      const element_range er = ers[i];
       noalias(subrange(result, er.first, er.second)) += 
-        Scalar(scale_factors[i++]) * 
+        Scalar(scale_factors[i]) * 
         subrange(operand, er.first, er.second);
     }
   }
@@ -227,15 +234,21 @@ namespace hedge {
     size_type h = mat.size1();
     size_type w = mat.size2();
 
-    unsigned i = 0;
-    BOOST_FOREACH(const element_range src_er, src_ers)
+    // Each thread processes a contiguous chunk of element ranges.
+    const int el_count = src_ers.size();
+    const unsigned thread_count = get_thread_count();
+
+#ifdef _OPENMP
+#pragma omp parallel for num_threads(thread_count) schedule(static) \
+    if(thread_count > 1)
+#endif
+    for (int i = 0; i < el_count; ++i)
     {
+      const element_range src_er = src_ers[i];
       const element_range dest_er = dest_ers[i];
 
       noalias(subrange(result, dest_er.first, dest_er.first+h)) +=
         Scalar(scale_factors[i]) * prod(mat, subrange(operand, src_er.first, src_er.first+w));
-
-      ++i;
     }
   }
 
@@ -259,15 +272,21 @@ namespace hedge {
     size_type h = mat.size1();
     size_type w = mat.size2();
 
-    unsigned i = 0;
-    BOOST_FOREACH(const element_range src_er, src_ers)
+    // Each thread processes a contiguous chunk of element ranges.
+    const int el_count = src_ers.size();
+    const unsigned thread_count = get_thread_count();
+
+#ifdef _OPENMP
+#pragma omp parallel for num_threads(thread_count) schedule(static) \
+    if(thread_count > 1)
+#endif
+    for (int i = 0; i < el_count; ++i)
     {
+      const element_range src_er = src_ers[i];
       const element_range dest_er = dest_ers[i];
 
       noalias(subrange(result, dest_er.first, dest_er.first+h)) +=
         prod(mat, subrange(operand, src_er.first, src_er.first+w));
-
-      ++i;
     }
   }
 
@@ -291,12 +310,20 @@ namespace hedge {
     if (dest_ers.size()*dest_ers.el_size() != result.size())
       throw std::runtime_error("result is of wrong size");
 
-    unsigned i = 0;
     numpy_vector<Scalar> new_operand(operand.size());
-    BOOST_FOREACH(const element_range r, src_ers)
+
+    const int el_count = src_ers.size();
+    const unsigned thread_count = get_thread_count();
+
+#ifdef _OPENMP
+#pragma omp parallel for num_threads(thread_count) schedule(static) \
+    if(thread_count > 1)
+#endif
+    for (int i = 0; i < el_count; ++i)
     {
+      const element_range r = src_ers[i];
       noalias(subrange(new_operand, r.first, r.second)) = 
-        Scalar(scale_factors[i++]) * subrange(operand, r.first, r.second);
+        Scalar(scale_factors[i]) * subrange(operand, r.first, r.second);
     }
 
     perform_elwise_operator_using_blas(src_ers, dest_ers, matrix, new_operand, result);
@@ -148,37 +148,193 @@ class Mesh(pytools.Record):
                     )
             return self._bounding_box
 
-    def element_adjacency_graph(self):
+    def get_arrays(self):
+        """Return a :class:`hedge.mesh.arrays.MeshArrays` describing the
+        connectivity of *self*.
+        """
+        try:
+            return self._arrays
+        except AttributeError:
+            from hedge.mesh.arrays import MeshArrays
+            self._arrays = MeshArrays.from_mesh(self)
+            return self._arrays
+
+    def element_adjacency_graph(self, csr=False):
         """Return a dictionary mapping each element id to a
         list of adjacent element ids.
+
+        :param csr: if *True*, return a tuple *(xadj, adjncy)* of
+          compressed sparse row arrays instead, where the neighbors of
+          element *i* are *adjncy[xadj[i]:xadj[i+1]]*, in ascending order.
         """
-        adjacency = {}
-        for (e1, f1), (e2, f2) in self.interfaces:
-            adjacency.setdefault(e1.id, set()).add(e2.id)
-            adjacency.setdefault(e2.id, set()).add(e1.id)
-        return adjacency
+        arrays = self.get_arrays()
+        el_count = arrays.element_count
+
+        pairs = arrays.interfaces[:, [0, 2]]
+        pairs = numpy.vstack([pairs, pairs[:, ::-1]])
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+        pairs = pairs[numpy.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+        if len(pairs):
+            is_new = numpy.ones(len(pairs), dtype=bool)
+            is_new[1:] = (pairs[1:] != pairs[:-1]).any(axis=1)
+            pairs = pairs[is_new]
+
+        xadj = numpy.zeros(el_count+1, dtype=numpy.intp)
+        numpy.cumsum(numpy.bincount(pairs[:, 0], minlength=el_count),
+                out=xadj[1:])
+        adjncy = pairs[:, 1].copy()
+
+        if csr:
+            return xadj, adjncy
+        else:
+            return dict(
+                    (el_nr, set(adjncy[xadj[el_nr]:xadj[el_nr+1]].tolist()))
+                    for el_nr in xrange(el_count)
+                    if xadj[el_nr+1] > xadj[el_nr])
 
 
 
 
 
-def find_matching_vertices_along_axis(axis, points_a, points_b, numbers_a, numbers_b):
-    a_to_b = {}
-    not_found = []
+def _sort_rows(rows, tiebreak=None):
+    """Return the permutation sorting the rows of the integer array *rows*
+    lexicographically, ordering equal rows by *tiebreak* and then by their
+    original position, along with a boolean array marking the first row
+    of each run of equal rows in sorted order.
+    """
+    keys = [rows[:, i] for i in reversed(range(rows.shape[1]))]
+    if tiebreak is not None:
+        keys.insert(0, tiebreak)
+    if not keys:
+        keys = [numpy.zeros(len(rows), dtype=numpy.intp)]
+
+    order = numpy.lexsort(keys)
+    sorted_rows = rows[order]
+
+    run_starts = numpy.ones(len(rows), dtype=bool)
+    run_starts[1:] = (sorted_rows[1:] != sorted_rows[:-1]).any(axis=1)
+    return order, run_starts
 
-    for i, pi in enumerate(points_a):
-        found = False
-        for j, pj in enumerate(points_b):
-            dist = pi-pj
-            dist[axis] = 0
-            if la.norm(dist) < 1e-12:
-                a_to_b[numbers_a[i]] = numbers_b[j]
-                found = True
-                break
-        if not found:
-            not_found.append(numbers_a[i])
 
-    return a_to_b, not_found
+
+
+def _find_rows(haystack, needles):
+    """Return, for each row of *needles*, the index of an identical row in
+    *haystack*, or -1 if there is none. Both are integer arrays with the
+    same number of columns. Of several identical rows in *haystack*, the
+    first is found.
+    """
+    rows = numpy.vstack([haystack, needles])
+    is_needle = numpy.arange(len(rows)) >= len(haystack)
+
+    # haystack rows sort before equal needle rows
+    order, run_starts = _sort_rows(rows, tiebreak=is_needle)
+
+    run_start_positions = numpy.maximum.accumulate(
+            numpy.where(run_starts, numpy.arange(len(rows)), 0))
+    candidates = order[run_start_positions]
+    candidates[candidates >= len(haystack)] = -1
+
+    result = numpy.empty(len(needles), dtype=numpy.intp)
+    result[order[is_needle[order]] - len(haystack)] = \
+            candidates[is_needle[order]]
+    return result
+
+
+
+
+def find_matching_vertices_along_axis(axis, points_a, points_b, numbers_a, numbers_b,
+        tolerance=1e-12):
+    """Match up the points in *points_a* and *points_b* that differ only
+    in their coordinate along *axis*, up to *tolerance*.
+
+    :returns: a tuple *(a_to_b, not_found)*, where *a_to_b* maps entries of
+      *numbers_a* to those of the matching points in *numbers_b*, and
+      *not_found* lists the entries of *numbers_a* without a match.
+    """
+    numbers_a = numpy.asarray(numbers_a)
+    numbers_b = numpy.asarray(numbers_b)
+    if not len(numbers_a) or not len(numbers_b):
+        return {}, list(numbers_a)
+
+    other_axes = [i for i in range(len(points_a[0])) if i != axis]
+    coords_a = numpy.asarray(points_a, dtype=numpy.float64)[:, other_axes]
+    coords_b = numpy.asarray(points_b, dtype=numpy.float64)[:, other_axes]
+
+    # Points that match almost always fall on the same point of a grid
+    # much coarser than the tolerance. Match those by sorting, and check
+    # the remaining ones by brute force.
+    grid_keys = numpy.round(
+            numpy.vstack([coords_a, coords_b]) / (1e3*tolerance)) \
+                    .astype(numpy.int64)
+    b_indices = _find_rows(
+            grid_keys[len(coords_a):], grid_keys[:len(coords_a)])
+
+    matched = b_indices >= 0
+    matched[matched] = numpy.sqrt(numpy.sum(
+        (coords_a[matched] - coords_b[b_indices[matched]])**2,
+        axis=1)) < tolerance
+
+    for i in numpy.flatnonzero(~matched):
+        close = numpy.sqrt(numpy.sum(
+            (coords_b - coords_a[i])**2, axis=1)) < tolerance
+        if close.any():
+            b_indices[i] = numpy.argmax(close)
+            matched[i] = True
+
+    a_to_b = dict(zip(
+        numbers_a[matched].tolist(),
+        numbers_b[b_indices[matched]].tolist()))
+    return a_to_b, numbers_a[~matched].tolist()
+
+
+
+
+def _get_face_vertex_indices(elements):
+    """Return an integer array of shape *(n_elements, faces_per_element,
+    vertices_per_face)* holding the vertex indices of the faces of
+    *elements*, in the order of :attr:`hedge.mesh.element.Element.faces`.
+    """
+    el_classes = set(type(el) for el in elements)
+    if len(el_classes) == 1:
+        el_class, = el_classes
+        vertex_indices = numpy.array(
+                [el.vertex_indices for el in elements], dtype=numpy.intp)
+        local_face_vertices = numpy.array(
+                el_class.face_vertices(range(vertex_indices.shape[1])),
+                dtype=numpy.intp)
+        return vertex_indices[:, local_face_vertices]
+    else:
+        return numpy.array(
+                [el.faces for el in elements], dtype=numpy.intp)
+
+
+
+
+def _match_faces(face_vertices):
+    """Given an array of shape *(n_faces, vertices_per_face)*, find the faces
+    made up of the same vertices.
+
+    :returns: a tuple *(pairs, singles)* of face numbers. *pairs* has shape
+      *(n_pairs, 2)* and is ordered by its first column, which holds the
+      lower face number of each pair. *singles* is ascending.
+    """
+    order, run_starts = _sort_rows(numpy.sort(face_vertices, axis=1))
+
+    run_start_positions = numpy.flatnonzero(run_starts)
+    run_lengths = numpy.diff(numpy.append(
+        run_start_positions, len(face_vertices)))
+    if (run_lengths > 2).any():
+        raise RuntimeError("face can at most border two elements")
+
+    paired = run_start_positions[run_lengths == 2]
+    pairs = numpy.array([order[paired], order[paired+1]]).T.reshape(-1, 2)
+    pairs = pairs[numpy.argsort(pairs[:, 0])]
+
+    singles = numpy.sort(order[run_start_positions[run_lengths == 1]])
+
+    return pairs, singles
 
 
 
@@ -255,13 +411,16 @@ def make_conformal_mesh_ext(points, elements,
             tag_to_elements.setdefault(el_tag, []).append(el)
         tag_to_elements[TAG_ALL].append(el)
 
-    # create face_map, which is a mapping of
-    # (vertices on a face) ->
-    #  [(element, face_idx) for elements bordering that face]
-    face_map = {}
-    for el in elements:
-        for fid, face_vertices in enumerate(el.faces):
-            face_map.setdefault(frozenset(face_vertices), []).append((el, fid))
+    # find interior and boundary faces by sorting face vertex indices.
+    # Faces are numbered as el_index*faces_per_el + face_index.
+    face_vertices = _get_face_vertex_indices(elements)
+    faces_per_el = face_vertices.shape[1]
+    face_vertices = face_vertices.reshape(-1, face_vertices.shape[2])
+
+    def get_el_face(face_nr):
+        return elements[face_nr // faces_per_el], face_nr % faces_per_el
+
+    interior_face_pairs, boundary_face_nrs = _match_faces(face_vertices)
 
     # build non-periodic connectivity structures
     interfaces = []
@@ -270,113 +429,126 @@ def make_conformal_mesh_ext(points, elements,
             TAG_ALL: [],
             TAG_REALLY_ALL: [],
             }
-
-    for face_vertices, els_faces in face_map.iteritems():
-        boundary_el_faces_tags = []
-        if len(els_faces) == 2:
-            if allow_internal_boundaries:
-                el_face_a, el_face_b = els_faces
-                el_a, face_a = el_face_a
-                el_b, face_b = el_face_b
-
-                tags_a = boundary_tagger(face_vertices, el_a, face_a, points)
-                tags_b = boundary_tagger(face_vertices, el_b, face_b, points)
-
-                if not tags_a and not tags_b:
-                    interfaces.append(els_faces)
-                elif tags_a and tags_b:
-                    boundary_el_faces_tags.append((el_face_a, tags_a))
-                    boundary_el_faces_tags.append((el_face_b, tags_b))
-                else:
-                    raise RuntimeError("boundary tagger is inconsistent "
-                            "about boundary-ness of interior interface")
+    tag_to_boundary_face_nrs = {}
+
+    boundary_face_nrs_tags = []
+    for face_nr_a, face_nr_b in interior_face_pairs.tolist():
+        el_face_a = get_el_face(face_nr_a)
+        el_face_b = get_el_face(face_nr_b)
+
+        if allow_internal_boundaries:
+            face_vertex_set = frozenset(face_vertices[face_nr_a])
+            tags_a = boundary_tagger(face_vertex_set,
+                    el_face_a[0], el_face_a[1], points)
+            tags_b = boundary_tagger(face_vertex_set,
+                    el_face_b[0], el_face_b[1], points)
+
+            if not tags_a and not tags_b:
+                interfaces.append([el_face_a, el_face_b])
+            elif tags_a and tags_b:
+                boundary_face_nrs_tags.append((face_nr_a, tags_a))
+                boundary_face_nrs_tags.append((face_nr_b, tags_b))
             else:
-                interfaces.append(els_faces)
-        elif len(els_faces) == 1:
-            el_face = el, face = els_faces[0]
-            tags = boundary_tagger(face_vertices, el, face, points)
-            boundary_el_faces_tags.append((el_face, tags))
+                raise RuntimeError("boundary tagger is inconsistent "
+                        "about boundary-ness of interior interface")
         else:
-            raise RuntimeError("face can at most border two elements")
-
-        for el_face, tags in boundary_el_faces_tags:
-            el, face = el_face
-            tags = set(tags) - MESH_CREATION_TAGS
-            assert not isinstance(tags, str), \
-                RuntimeError("Received string as tag list")
-            assert TAG_ALL not in tags
-            assert TAG_REALLY_ALL not in tags
-
-            for btag in tags:
-                tag_to_boundary.setdefault(btag, []) \
-                        .append(el_face)
-
-            if TAG_NO_BOUNDARY not in tags:
-                # TAG_NO_BOUNDARY is used to mark rank interfaces
-                # as not being part of the boundary
-                tag_to_boundary[TAG_ALL].append(el_face)
-
-            tag_to_boundary[TAG_REALLY_ALL].append(el_face)
+            interfaces.append([el_face_a, el_face_b])
+
+    for face_nr in boundary_face_nrs.tolist():
+        el, face = get_el_face(face_nr)
+        boundary_face_nrs_tags.append((face_nr, boundary_tagger(
+            frozenset(face_vertices[face_nr]), el, face, points)))
+
+    for face_nr, tags in boundary_face_nrs_tags:
+        el_face = get_el_face(face_nr)
+        tags = set(tags) - MESH_CREATION_TAGS
+        assert not isinstance(tags, str), \
+            RuntimeError("Received string as tag list")
+        assert TAG_ALL not in tags
+        assert TAG_REALLY_ALL not in tags
+
+        for btag in tags:
+            tag_to_boundary.setdefault(btag, []) \
+                    .append(el_face)
+            tag_to_boundary_face_nrs.setdefault(btag, []) \
+                    .append(face_nr)
+
+        if TAG_NO_BOUNDARY not in tags:
+            # TAG_NO_BOUNDARY is used to mark rank interfaces
+            # as not being part of the boundary
+            tag_to_boundary[TAG_ALL].append(el_face)
+
+        tag_to_boundary[TAG_REALLY_ALL].append(el_face)
 
     # add periodicity-induced connectivity
-    from pytools import flatten, reverse_dictionary
-
     periodic_opposite_faces = {}
     periodic_opposite_vertices = {}
-
-    for tag_bdries in tag_to_boundary.itervalues():
-        assert len(set(tag_bdries)) == len(tag_bdries)
+    periodic_faces = set()
 
     for axis, axis_periodicity in enumerate(periodicity):
         if axis_periodicity is not None:
             # find faces on +-axis boundaries
             minus_tag, plus_tag = axis_periodicity
-            minus_faces = tag_to_boundary.get(minus_tag, [])
-            plus_faces = tag_to_boundary.get(plus_tag, [])
-
-            # find vertex indices and points on these faces
-            minus_vertex_indices = list(set(flatten(el.faces[face]
-                for el, face in minus_faces)))
-            plus_vertex_indices = list(set(flatten(el.faces[face]
-                for el, face in plus_faces)))
+            minus_face_nrs = numpy.array(
+                    tag_to_boundary_face_nrs.get(minus_tag, []),
+                    dtype=numpy.intp)
+            plus_face_nrs = numpy.array(
+                    tag_to_boundary_face_nrs.get(plus_tag, []),
+                    dtype=numpy.intp)
 
-            minus_z_points = [points[pi] for pi in minus_vertex_indices]
-            plus_z_points = [points[pi] for pi in plus_vertex_indices]
+            # find vertex indices on these faces
+            minus_vertex_indices = numpy.unique(face_vertices[minus_face_nrs])
+            plus_vertex_indices = numpy.unique(face_vertices[plus_face_nrs])
 
             # find a mapping from -axis to +axis vertices
             minus_to_plus, not_found = find_matching_vertices_along_axis(
-                    axis, minus_z_points, plus_z_points,
+                    axis,
+                    points[minus_vertex_indices], points[plus_vertex_indices],
                     minus_vertex_indices, plus_vertex_indices)
-            plus_to_minus = reverse_dictionary(minus_to_plus)
+            plus_to_minus = dict(
+                    (b, a) for a, b in minus_to_plus.iteritems())
 
             for a, b in minus_to_plus.iteritems():
                 periodic_opposite_vertices.setdefault(a, []).append((b, axis))
                 periodic_opposite_vertices.setdefault(b, []).append((a, axis))
 
-            # establish face connectivity
-            for minus_face in minus_faces:
-                minus_el, minus_fi = minus_face
-                minus_fvi = minus_el.faces[minus_fi]
+            # establish face connectivity by looking up the mapped
+            # -axis faces among the boundary faces
+            vertex_map = numpy.empty(len(points), dtype=numpy.intp)
+            vertex_map.fill(-1)
+            if minus_to_plus:
+                vertex_map[minus_to_plus.keys()] = minus_to_plus.values()
+
+            mapped_minus_faces = vertex_map[face_vertices[minus_face_nrs]]
+            plus_indices = _find_rows(
+                    numpy.sort(face_vertices[boundary_face_nrs], axis=1),
+                    numpy.sort(mapped_minus_faces, axis=1))
+            plus_indices[(mapped_minus_faces < 0).any(axis=1)] = -1
+
+            for minus_face_nr, plus_index in zip(
+                    minus_face_nrs.tolist(), plus_indices.tolist()):
+                minus_face = get_el_face(minus_face_nr)
 
-                try:
-                    mapped_plus_fvi = tuple(minus_to_plus[i] for i in minus_fvi)
-                    plus_faces = face_map[frozenset(mapped_plus_fvi)]
-                    assert len(plus_faces) == 1
-                except KeyError:
+                if plus_index < 0:
                     # is our periodic counterpart is in a different mesh clump?
                     if _is_rankbdry_face(minus_face):
                         # if so, cool. parallel handler will take care of it.
                         continue
                     else:
                         # if not, bad.
-                        raise
+                        raise RuntimeError(
+                                "periodic counterpart of face %s not found"
+                                % (minus_face[0].faces[minus_face[1]],))
 
-                plus_face = plus_faces[0]
+                plus_face = get_el_face(int(boundary_face_nrs[plus_index]))
                 interfaces.append([minus_face, plus_face])
 
+                minus_el, minus_fi = minus_face
+                minus_fvi = minus_el.faces[minus_fi]
                 plus_el, plus_fi = plus_face
                 plus_fvi = plus_el.faces[plus_fi]
 
+                mapped_plus_fvi = tuple(minus_to_plus[i] for i in minus_fvi)
                 mapped_minus_fvi = tuple(plus_to_minus[i] for i in plus_fvi)
 
                 # periodic_opposite_faces maps face vertex tuples from
@@ -386,11 +558,17 @@ def make_conformal_mesh_ext(points, elements,
                 periodic_opposite_faces[minus_fvi] = mapped_plus_fvi, axis
                 periodic_opposite_faces[plus_fvi] = mapped_minus_fvi, axis
 
-                tag_to_boundary[TAG_ALL].remove(plus_face)
-                tag_to_boundary[TAG_ALL].remove(minus_face)
+                periodic_faces.add(plus_face)
+                periodic_faces.add(minus_face)
 
-                tag_to_boundary[TAG_REALLY_ALL].remove(plus_face)
-                tag_to_boundary[TAG_REALLY_ALL].remove(minus_face)
+    for tag_bdries in tag_to_boundary.itervalues():
+        assert len(set(tag_bdries)) == len(tag_bdries)
+
+    if periodic_faces:
+        for tag in [TAG_ALL, TAG_REALLY_ALL]:
+            tag_to_boundary[tag] = [el_face
+                    for el_face in tag_to_boundary[tag]
+                    if el_face not in periodic_faces]
 
     return ConformalMesh(
             points=points,
@@ -472,6 +650,56 @@ def make_conformal_mesh(points, elements,
 
 
 
+def make_conformal_mesh_from_arrays(arrays, periodicity=None,
+        periodic_opposite_faces={}, periodic_opposite_vertices={},
+        has_internal_boundaries=False):
+    """Construct a :class:`ConformalMesh` backed by the
+    :class:`hedge.mesh.arrays.MeshArrays` *arrays*.
+
+    The *elements*, *interfaces*, *tag_to_boundary* and *tag_to_elements*
+    attributes of the result are sequences that create element objects
+    only as they are accessed. Consumers that only need the connectivity
+    should use :meth:`Mesh.get_arrays` instead, which never creates them.
+
+    See :class:`Mesh` for the remaining arguments.
+    """
+    from hedge.mesh.arrays import (LazyElementList, _IndexedElementList,
+            _ElementFaceList, _InterfaceList)
+
+    if periodicity is None:
+        periodicity = arrays.dimensions*[None]
+
+    elements = LazyElementList(arrays)
+
+    tag_to_boundary = dict(
+            (tag, _ElementFaceList(elements, el_faces))
+            for tag, el_faces in arrays.tag_to_boundary.iteritems())
+    for tag in [TAG_NONE, TAG_ALL, TAG_REALLY_ALL]:
+        tag_to_boundary.setdefault(tag, [])
+
+    tag_to_elements = dict(
+            (tag, _IndexedElementList(elements, els))
+            for tag, els in arrays.tag_to_elements.iteritems())
+    tag_to_elements.setdefault(TAG_NONE, [])
+    if TAG_ALL not in tag_to_elements:
+        tag_to_elements[TAG_ALL] = elements
+
+    mesh = ConformalMesh(
+            points=arrays.points,
+            elements=elements,
+            interfaces=_InterfaceList(elements, arrays.interfaces),
+            tag_to_boundary=tag_to_boundary,
+            tag_to_elements=tag_to_elements,
+            periodicity=periodicity,
+            periodic_opposite_faces=periodic_opposite_faces,
+            periodic_opposite_vertices=periodic_opposite_vertices,
+            has_internal_boundaries=has_internal_boundaries)
+    mesh._arrays = arrays
+    return mesh
+
+
+
+
 class ConformalMesh(Mesh):
     """A mesh whose elements' faces exactly match up with one another.
 
@@ -488,14 +716,27 @@ class ConformalMesh(Mesh):
     def get_reorder_oldnumbers(self, method):
         if method == "cuthill":
             from hedge.mesh.tools import cuthill_mckee
-            return cuthill_mckee(self.element_adjacency_graph())
+            return cuthill_mckee(self.element_adjacency_graph(csr=True))
+        elif method == "rcm":
+            from hedge.mesh.tools import reverse_cuthill_mckee
+            return reverse_cuthill_mckee(
+                    self.element_adjacency_graph(csr=True))
+        elif method in ["morton", "hilbert"]:
+            from hedge.mesh.tools import space_filling_curve_order
+            return space_filling_curve_order(
+                    self.get_arrays().centroids(), curve=method)
         else:
             raise ValueError("invalid mesh reorder method")
 
     def reordered_by(self, method):
         """Return a reordered copy of *self*.
 
-        :param method: "cuthill"
+        :param method: "cuthill", "rcm" (reverse Cuthill-McKee),
+          or "morton" or "hilbert" to number
+          elements along a space-filling curve through their centroids.
+
+        See :func:`hedge.mesh.tools.get_locality_report` to compare the
+        resulting orderings.
         """
 
         old_numbers = self.get_reorder_oldnumbers(method)
@@ -508,40 +749,9 @@ class ConformalMesh(Mesh):
         element.
         """
 
-        elements = [self.elements[old_numbers[i]].copy(
-            id=i, all_vertices=self.points)
-                for i in range(len(self.elements))]
-
-        old2new_el = dict(
-                (self.elements[old_numbers[i]], new_el)
-                for i, new_el in enumerate(elements)
-                )
-
-        # sort interfaces by element id -- this is actually the most important part
-        def face_cmp(face1, face2):
-            (face1_el1, _), (face1_el2, _) = face1
-            (face2_el1, _), (face2_el2, _) = face2
-
-            return cmp(
-                    min(face1_el1.id, face1_el2.id),
-                    min(face2_el1.id, face2_el2.id))
-
-        interfaces = [
-                ((old2new_el[e1], f1), (old2new_el[e2], f2))
-                for (e1, f1), (e2, f2) in self.interfaces]
-        interfaces.sort(face_cmp)
-
-        tag_to_boundary = dict(
-                (tag, [(old2new_el[old_el], fnr) for old_el, fnr in elfaces])
-                for tag, elfaces in self.tag_to_boundary.iteritems())
-
-        tag_to_elements = dict(
-                (tag, [old2new_el[old_el] for old_el in tag_els])
-                for tag, tag_els in self.tag_to_elements.iteritems())
-
-        return ConformalMesh(
-                self.points, elements, interfaces,
-                tag_to_boundary, tag_to_elements, self.periodicity,
+        return make_conformal_mesh_from_arrays(
+                self.get_arrays().reordered(old_numbers),
+                self.periodicity,
                 self.periodic_opposite_faces, self.periodic_opposite_vertices,
                 self.has_internal_boundaries)
 
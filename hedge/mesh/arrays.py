@@ -0,0 +1,366 @@
+"""Array-backed mesh storage, with element objects created on demand."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+
+import numpy
+from pytools import memoize_method
+
+
+
+
+# {{{ mesh arrays
+
+class MeshArrays(object):
+    """The connectivity of a mesh of straight simplices of a single type,
+    stored as arrays rather than as lists of
+    :class:`hedge.mesh.element.Element` instances.
+
+    Elements are referred to by their number, which is their position
+    in :attr:`vertex_indices`, and faces by their number within an
+    element.
+
+    .. attribute:: points
+
+        an array of shape *(vertex_count, dimensions)*.
+
+    .. attribute:: element_class
+
+        a subclass of :class:`hedge.mesh.element.SimplicialElement`.
+
+    .. attribute:: vertex_indices
+
+        an integer array of shape *(element_count, dimensions+1)*.
+
+    .. attribute:: interfaces
+
+        an integer array of shape *(interface_count, 4)*, with columns
+        *(element_a, face_a, element_b, face_b)*.
+
+    .. attribute:: tag_to_boundary
+
+        a mapping from boundary tags to integer arrays of shape
+        *(face_count, 2)*, with columns *(element, face)*.
+
+    .. attribute:: tag_to_elements
+
+        a mapping from element tags to integer arrays of element numbers.
+    """
+
+    def __init__(self, points, element_class, vertex_indices, interfaces,
+            tag_to_boundary, tag_to_elements):
+        self.points = points
+        self.element_class = element_class
+        self.vertex_indices = numpy.asarray(vertex_indices, dtype=numpy.intp)
+        self.interfaces = numpy.asarray(
+                interfaces, dtype=numpy.intp).reshape(-1, 4)
+        self.tag_to_boundary = dict(
+                (tag, numpy.asarray(el_faces, dtype=numpy.intp).reshape(-1, 2))
+                for tag, el_faces in tag_to_boundary.iteritems())
+        self.tag_to_elements = dict(
+                (tag, numpy.asarray(els, dtype=numpy.intp))
+                for tag, els in tag_to_elements.iteritems())
+
+    @classmethod
+    def from_mesh(cls, mesh):
+        """Gather the connectivity of the :class:`hedge.mesh.Mesh` *mesh*,
+        whose elements must all be of the same type and numbered by their
+        position in *mesh.elements*.
+        """
+        elements = mesh.elements
+        if not len(elements):
+            raise ValueError("mesh contains no elements")
+
+        from pytools import single_valued
+        element_class = single_valued(type(el) for el in elements)
+
+        for i, el in enumerate(elements):
+            if el.id != i:
+                raise ValueError("element numbers do not match "
+                        "element positions")
+
+        def el_face_array(el_faces):
+            return numpy.array([(el.id, face_nr)
+                for el, face_nr in el_faces], dtype=numpy.intp)
+
+        return cls(
+                points=mesh.points,
+                element_class=element_class,
+                vertex_indices=numpy.array(
+                    [el.vertex_indices for el in elements],
+                    dtype=numpy.intp),
+                interfaces=numpy.array([
+                    (el_a.id, face_a, el_b.id, face_b)
+                    for (el_a, face_a), (el_b, face_b) in mesh.interfaces],
+                    dtype=numpy.intp),
+                tag_to_boundary=dict(
+                    (tag, el_face_array(el_faces))
+                    for tag, el_faces in mesh.tag_to_boundary.iteritems()),
+                tag_to_elements=dict(
+                    (tag, numpy.array([el.id for el in els], dtype=numpy.intp))
+                    for tag, els in mesh.tag_to_elements.iteritems()))
+
+    @property
+    def element_count(self):
+        return len(self.vertex_indices)
+
+    @property
+    def dimensions(self):
+        return self.points.shape[1]
+
+    @property
+    def nbytes(self):
+        return (self.vertex_indices.nbytes + self.interfaces.nbytes
+                + sum(ary.nbytes for ary in self.tag_to_boundary.itervalues())
+                + sum(ary.nbytes for ary in self.tag_to_elements.itervalues()))
+
+    def centroids(self):
+        """Return an array of shape *(element_count, dimensions)*."""
+        return numpy.mean(self.points[self.vertex_indices], axis=1)
+
+    def make_element(self, el_nr):
+        """Return a new :class:`hedge.mesh.element.Element` instance for
+        element number *el_nr*.
+        """
+        return self.element_class(
+                el_nr, self.vertex_indices[el_nr], self.points)
+
+    # {{{ geometry
+
+    @memoize_method
+    def face_vertex_numbers(self):
+        """Return an integer array of shape *(faces_per_element,
+        vertices_per_face)* giving the face vertices as positions within
+        a row of :attr:`vertex_indices`.
+        """
+        return numpy.array(
+                self.element_class.face_vertices(
+                    range(self.vertex_indices.shape[1])),
+                dtype=numpy.intp)
+
+    def face_vertices(self):
+        """Return an integer array of shape *(element_count,
+        faces_per_element, vertices_per_face)* of face vertex indices.
+        """
+        return self.vertex_indices[:, self.face_vertex_numbers()]
+
+    @memoize_method
+    def get_maps(self):
+        """Return the :class:`hedge.tools.affine.StackedAffineMaps` taking
+        the unit simplex to each element.
+        """
+        from hedge.tools.affine import get_stacked_simplex_maps_unit_to_global
+        return get_stacked_simplex_maps_unit_to_global(
+                self.points[self.vertex_indices])
+
+    @memoize_method
+    def get_face_geometry(self):
+        """Return a tuple *(face_jacobians, face_normals)* of arrays of
+        shape *(element_count, faces_per_element)* and *(element_count,
+        faces_per_element, dimensions)*, in the conventions of
+        :attr:`hedge.mesh.element.SimplicialElement.face_jacobians` and
+        :attr:`hedge.mesh.element.SimplicialElement.face_normals`:
+        the jacobians are the ratios of each face's measure to that of
+        the unit face, and the normals are outward unit normals.
+        """
+        dims = self.dimensions
+        fvn = self.face_vertex_numbers()
+        el_vertices = self.points[self.vertex_indices]
+        face_points = el_vertices[:, fvn]
+
+        if dims == 1:
+            raw_normals = numpy.ones(face_points.shape[:2] + (1,))
+        elif dims == 2:
+            edges = face_points[:, :, 1] - face_points[:, :, 0]
+            raw_normals = numpy.empty_like(edges)
+            raw_normals[..., 0] = edges[..., 1]
+            raw_normals[..., 1] = -edges[..., 0]
+        elif dims == 3:
+            raw_normals = numpy.cross(
+                    face_points[:, :, 1] - face_points[:, :, 0],
+                    face_points[:, :, 2] - face_points[:, :, 0])
+        else:
+            raise ValueError("%d-dimensional meshes are unsupported" % dims)
+
+        raw_lengths = numpy.sqrt(numpy.sum(raw_normals**2, axis=-1))
+        normals = raw_normals / raw_lengths[..., numpy.newaxis]
+
+        # point away from the vertex opposite each face
+        opposite = numpy.array([
+            (set(range(dims+1)) - set(face)).pop() for face in fvn])
+        outward = numpy.sum(
+                normals * (face_points[:, :, 0] - el_vertices[:, opposite]),
+                axis=-1)
+        normals[outward < 0] *= -1
+
+        # The unit faces are a point, the interval [-1,1] and
+        # the unit triangle of area 2.
+        if dims == 1:
+            jacobians = raw_lengths
+        elif dims == 2:
+            jacobians = raw_lengths / 2
+        else:
+            jacobians = raw_lengths / 4
+
+        return jacobians, normals
+
+    # }}}
+
+    def reordered(self, old_numbers):
+        """Return a copy of *self* with elements renumbered so that new
+        element *i* is old element *old_numbers[i]*.
+
+        Interfaces are sorted by the lower, then the higher of their two
+        new element numbers, and boundary faces by their new element
+        number, so that traversing either visits elements in order.
+        """
+        old_numbers = numpy.asarray(old_numbers, dtype=numpy.intp)
+        new_numbers = numpy.empty_like(old_numbers)
+        new_numbers[old_numbers] = numpy.arange(
+                len(old_numbers), dtype=numpy.intp)
+
+        interfaces = self.interfaces.copy()
+        interfaces[:, [0, 2]] = new_numbers[interfaces[:, [0, 2]]]
+        interfaces = interfaces[numpy.lexsort((
+            numpy.maximum(interfaces[:, 0], interfaces[:, 2]),
+            numpy.minimum(interfaces[:, 0], interfaces[:, 2])))]
+
+        def renumber_el_faces(el_faces):
+            el_faces = el_faces.copy()
+            el_faces[:, 0] = new_numbers[el_faces[:, 0]]
+            return el_faces[numpy.lexsort(el_faces.T[::-1])]
+
+        return MeshArrays(
+                points=self.points,
+                element_class=self.element_class,
+                vertex_indices=self.vertex_indices[old_numbers],
+                interfaces=interfaces,
+                tag_to_boundary=dict(
+                    (tag, renumber_el_faces(el_faces))
+                    for tag, el_faces in self.tag_to_boundary.iteritems()),
+                tag_to_elements=dict(
+                    (tag, new_numbers[els])
+                    for tag, els in self.tag_to_elements.iteritems()))
+
+# }}}
+
+
+
+
+# {{{ on-demand element sequences
+
+class LazyElementList(object):
+    """A sequence of the elements of a :class:`MeshArrays`, each created on
+    first access and then kept, so that the same element is always
+    represented by the same object.
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self._elements = [None] * arrays.element_count
+
+    def __len__(self):
+        return len(self._elements)
+
+    def __getitem__(self, el_nr):
+        if isinstance(el_nr, slice):
+            return [self[i] for i in xrange(*el_nr.indices(len(self)))]
+
+        el = self._elements[el_nr]
+        if el is None:
+            el = self._elements[el_nr] = self.arrays.make_element(el_nr)
+        return el
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self[i]
+
+
+class _IndexedElementList(object):
+    """A sequence of the entries of *elements* at *el_nrs*."""
+
+    def __init__(self, elements, el_nrs):
+        self.elements = elements
+        self.el_nrs = el_nrs
+
+    def __len__(self):
+        return len(self.el_nrs)
+
+    def __getitem__(self, i):
+        return self.elements[int(self.el_nrs[i])]
+
+    def __iter__(self):
+        for el_nr in self.el_nrs.tolist():
+            yield self.elements[el_nr]
+
+
+class _ElementFaceList(object):
+    """A sequence of *(element, face_nr)* tuples for the rows of
+    *el_faces*.
+    """
+
+    def __init__(self, elements, el_faces):
+        self.elements = elements
+        self.el_faces = el_faces
+
+    def __len__(self):
+        return len(self.el_faces)
+
+    def __getitem__(self, i):
+        el_nr, face_nr = self.el_faces[i]
+        return self.elements[int(el_nr)], int(face_nr)
+
+    def __iter__(self):
+        for el_nr, face_nr in self.el_faces.tolist():
+            yield self.elements[el_nr], face_nr
+
+
+class _InterfaceList(object):
+    """A sequence of *((element_a, face_a), (element_b, face_b))* pairs for
+    the rows of *interfaces*.
+    """
+
+    def __init__(self, elements, interfaces):
+        self.elements = elements
+        self.interfaces = interfaces
+
+    def __len__(self):
+        return len(self.interfaces)
+
+    def __getitem__(self, i):
+        el_a, face_a, el_b, face_b = self.interfaces[i].tolist()
+        return ((self.elements[el_a], face_a),
+                (self.elements[el_b], face_b))
+
+    def __iter__(self):
+        for el_a, face_a, el_b, face_b in self.interfaces.tolist():
+            yield ((self.elements[el_a], face_a),
+                    (self.elements[el_b], face_b))
+
+# }}}
+
+
+# vim: foldmethod=marker
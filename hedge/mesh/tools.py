@@ -26,8 +26,79 @@ THE SOFTWARE.
 
 
 
+import numpy
+
+
+
+
+# adjacency graphs ------------------------------------------------------------
+def adjacency_dict_to_csr(graph, node_count=None):
+    """Convert an adjacency mapping from integer nodes to lists of their
+    neighbors into compressed sparse row arrays *(xadj, adjncy)*, where the
+    neighbors of node *i* are *adjncy[xadj[i]:xadj[i+1]]*.
+    """
+    if node_count is None:
+        node_count = max(graph.iterkeys()) + 1 if graph else 0
+
+    xadj = numpy.zeros(node_count+1, dtype=numpy.intp)
+    for node, neighbors in graph.iteritems():
+        xadj[node+1] = len(neighbors)
+    numpy.cumsum(xadj, out=xadj)
+
+    adjncy = numpy.empty(xadj[-1], dtype=numpy.intp)
+    for node, neighbors in graph.iteritems():
+        adjncy[xadj[node]:xadj[node+1]] = sorted(neighbors)
+
+    return xadj, adjncy
+
+
+
+
+def _get_csr_neighbors(xadj, adjncy, nodes):
+    """Return a tuple *(owners, neighbors)* listing all neighbors of
+    *nodes*, where *owners* gives the position in *nodes* of the node each
+    neighbor belongs to.
+    """
+    counts = xadj[nodes+1] - xadj[nodes]
+    owners = numpy.repeat(numpy.arange(len(nodes), dtype=numpy.intp), counts)
+    offsets = (numpy.arange(len(owners), dtype=numpy.intp)
+            - (numpy.cumsum(counts) - counts)[owners])
+    return owners, adjncy[xadj[nodes][owners] + offsets]
+
+
+
+
+def _cuthill_mckee_levels(xadj, adjncy, degrees, start, visited):
+    """Visit the component of *start* in Cuthill-McKee order, marking
+    visited nodes in *visited*. Return the list of level sets, each an
+    array of nodes in visiting order.
+    """
+    visited[start] = True
+    level = numpy.array([start], dtype=numpy.intp)
+    levels = []
+
+    while len(level):
+        levels.append(level)
+
+        owners, neighbors = _get_csr_neighbors(xadj, adjncy, level)
+        unvisited = ~visited[neighbors]
+        owners = owners[unvisited]
+        neighbors = neighbors[unvisited]
+
+        # visit neighbors in order of their parent, then by degree,
+        # keeping only the first occurrence of each
+        order = numpy.lexsort((neighbors, degrees[neighbors], owners))
+        neighbors = neighbors[order]
+        _, first = numpy.unique(neighbors, return_index=True)
+        level = neighbors[numpy.sort(first)]
+
+        visited[level] = True
+
+    return levels
+
+
+
 
-# mesh reorderings ------------------------------------------------------------
 def cuthill_mckee(graph):
     """Return a Cuthill-McKee ordering for the given graph.
 
@@ -35,47 +106,287 @@ def cuthill_mckee(graph):
     Y. Saad, Iterative Methods for Sparse Linear System,
     2nd edition, p. 76.
 
-    *graph* is given as an adjacency mapping, i.e. each node is
-    mapped to a list of its neighbors.
+    *graph* is either an adjacency mapping, i.e. each node is
+    mapped to a list of its neighbors, or a tuple *(xadj, adjncy)* of
+    compressed sparse row arrays as returned by
+    :meth:`hedge.mesh.Mesh.element_adjacency_graph` with *csr=True*.
+
+    Each connected component is started from a pseudo-peripheral node
+    found from a node of minimum degree, and visited one level set at a
+    time using array operations. Ordering each level set involves a
+    sort, so that the run time is *O(E log E)* for a graph with *E*
+    edges.
+
+    :returns: an array whose entry *i* is the old number of the node
+      numbered *i* in the new ordering.
     """
-    from pytools import argmin
+    if isinstance(graph, dict):
+        graph = adjacency_dict_to_csr(graph)
+
+    xadj, adjncy = graph
+    xadj = numpy.asarray(xadj, dtype=numpy.intp)
+    adjncy = numpy.asarray(adjncy, dtype=numpy.intp)
+    node_count = len(xadj) - 1
+
+    degrees = numpy.diff(xadj)
+    visited = numpy.zeros(node_count, dtype=bool)
+    # Trial searches stay within the (unvisited) component of their start,
+    # so they mark a scratch array that is reset at just the nodes they
+    # touched.
+    trial_visited = numpy.zeros(node_count, dtype=bool)
+    nodes_by_degree = numpy.argsort(degrees, kind="mergesort")
 
-    # this list is called "old_numbers" because it maps a
-    # "new number to its "old number"
     old_numbers = []
-    visited_nodes = set()
-    levelset = []
+    search_start = 0
+    while True:
+        # find an unvisited node of minimum degree
+        while (search_start < node_count
+                and visited[nodes_by_degree[search_start]]):
+            search_start += 1
+        if search_start == node_count:
+            break
 
-    all_nodes = set(graph.keys())
+        start = nodes_by_degree[search_start]
 
-    def levelset_cmp(node_a, node_b):
-        return cmp(len(graph[node_a]), len(graph[node_b]))
+        # move to a pseudo-peripheral node (George/Liu)
+        for i in range(5):
+            levels = _cuthill_mckee_levels(
+                    xadj, adjncy, degrees, start, trial_visited)
+            trial_visited[numpy.concatenate(levels)] = False
 
-    while len(old_numbers) < len(graph):
-        if not levelset:
-            unvisited = list(set(graph.keys()) - visited_nodes)
+            last_level = levels[-1]
+            candidate = last_level[numpy.argmin(degrees[last_level])]
+            candidate_levels = _cuthill_mckee_levels(
+                    xadj, adjncy, degrees, candidate, trial_visited)
+            trial_visited[numpy.concatenate(candidate_levels)] = False
 
-            if not unvisited:
+            if len(candidate_levels) <= len(levels):
                 break
+            start = candidate
+
+        levels = _cuthill_mckee_levels(xadj, adjncy, degrees, start, visited)
+        old_numbers.extend(levels)
+
+    if not old_numbers:
+        return numpy.zeros(0, dtype=numpy.intp)
+    return numpy.concatenate(old_numbers)
+
+
+
+
+def reverse_cuthill_mckee(graph):
+    """Return the reverse of :func:`cuthill_mckee`, which usually has
+    a smaller profile.
+    """
+    return cuthill_mckee(graph)[::-1].copy()
+
+
 
-            start_node = unvisited[
-                    argmin(len(graph[node]) for node in unvisited)]
-            visited_nodes.add(start_node)
-            old_numbers.append(start_node)
-            levelset = [start_node]
 
-        next_levelset = set()
-        levelset.sort(levelset_cmp)
+def get_bandwidth_and_profile(graph, old_numbers=None):
+    """Return a tuple *(bandwidth, profile)* of the adjacency matrix of
+    *graph* (given as for :func:`cuthill_mckee`), after renumbering the
+    nodes so that new node *i* is old node *old_numbers[i]*.
 
-        for node in levelset:
-            for neighbor in graph[node]:
-                if neighbor in visited_nodes:
-                    continue
+    The bandwidth is the largest difference between the numbers of two
+    neighbors. The profile is the sum over all nodes of the difference
+    between the node's number and the lowest number among itself and its
+    neighbors.
+    """
+    if isinstance(graph, dict):
+        graph = adjacency_dict_to_csr(graph)
+
+    xadj, adjncy = graph
+    xadj = numpy.asarray(xadj, dtype=numpy.intp)
+    node_count = len(xadj) - 1
+
+    new_numbers = numpy.arange(node_count, dtype=numpy.intp)
+    if old_numbers is not None:
+        new_numbers[numpy.asarray(old_numbers, dtype=numpy.intp)] = \
+                numpy.arange(node_count, dtype=numpy.intp)
+
+    owners, neighbors = _get_csr_neighbors(
+            xadj, numpy.asarray(adjncy, dtype=numpy.intp),
+            numpy.arange(node_count, dtype=numpy.intp))
+    row_numbers = new_numbers[owners]
+    neighbor_numbers = new_numbers[neighbors]
+
+    if len(owners):
+        bandwidth = int(numpy.max(numpy.abs(row_numbers - neighbor_numbers)))
+    else:
+        bandwidth = 0
+
+    lowest = numpy.arange(node_count, dtype=numpy.intp)
+    numpy.minimum.at(lowest, row_numbers, neighbor_numbers)
+    profile = int(numpy.sum(numpy.arange(node_count) - lowest))
+
+    return bandwidth, profile
+
+
+
+
+# space-filling curves --------------------------------------------------------
+def _quantize_points(points, bits):
+    """Map *points*, an array of shape *(n, dim)*, to integer coordinates
+    in [0, 2**bits) along each axis, spanning their bounding box.
+    """
+    points = numpy.asarray(points, dtype=numpy.float64)
+    lower = points.min(axis=0)
+    extent = points.max(axis=0) - lower
+    extent[extent == 0] = 1
+
+    return numpy.minimum(
+            ((points - lower) / extent * (1 << bits)).astype(numpy.int64),
+            (1 << bits) - 1)
+
+
+
+
+def _interleave_bits(coords, bits):
+    """Return one integer key per row of *coords* whose bits, from most
+    significant on, are the top bits of all coordinates, then the next
+    lower bits of all coordinates, and so on.
+    """
+    keys = numpy.zeros(len(coords), dtype=numpy.int64)
+    for bit in range(bits-1, -1, -1):
+        for axis in range(coords.shape[1]):
+            keys = (keys << 1) | ((coords[:, axis] >> bit) & 1)
+    return keys
+
+
+
+
+def _curve_bits(dimensions):
+    # keep keys within 62 bits
+    return min(62 // dimensions, 20)
+
+
+
+
+def morton_keys(points):
+    """Return the position of each of *points* along a Morton (Z-order)
+    curve through their bounding box.
+    """
+    bits = _curve_bits(len(points[0]))
+    return _interleave_bits(_quantize_points(points, bits), bits)
+
+
+
+
+def hilbert_keys(points):
+    """Return the position of each of *points* along a Hilbert curve
+    through their bounding box.
+
+    Uses the algorithm from J. Skilling, "Programming the Hilbert curve",
+    AIP Conference Proceedings 707 (2004), applied to all points at once.
+    """
+    bits = _curve_bits(len(points[0]))
+    x = _quantize_points(points, bits)
+    dims = x.shape[1]
+
+    # inverse undo excess work
+    q = 1 << (bits-1)
+    while q > 1:
+        p = q - 1
+        for axis in range(dims):
+            has_bit = (x[:, axis] & q) != 0
+            x[has_bit, 0] ^= p
+
+            no_bit = ~has_bit
+            t = (x[no_bit, 0] ^ x[no_bit, axis]) & p
+            x[no_bit, 0] ^= t
+            x[no_bit, axis] ^= t
+        q >>= 1
+
+    # Gray encode
+    for axis in range(1, dims):
+        x[:, axis] ^= x[:, axis-1]
+
+    t = numpy.zeros(len(x), dtype=numpy.int64)
+    q = 1 << (bits-1)
+    while q > 1:
+        t[(x[:, dims-1] & q) != 0] ^= q - 1
+        q >>= 1
+    x ^= t[:, numpy.newaxis]
+
+    return _interleave_bits(x, bits)
+
+
+
+
+def space_filling_curve_order(points, curve="hilbert"):
+    """Return an ordering of *points* along a space-filling curve, as an
+    array whose entry *i* is the index of the *i*-th point on the curve.
+
+    :param curve: "morton" or "hilbert"
+    """
+    if curve == "morton":
+        keys = morton_keys(points)
+    elif curve == "hilbert":
+        keys = hilbert_keys(points)
+    else:
+        raise ValueError("invalid space-filling curve: %s" % curve)
+
+    return numpy.argsort(keys, kind="mergesort")
+
+
+
+
+# locality measurement --------------------------------------------------------
+class LocalityReport(object):
+    """How far apart in memory the data of face neighbors lies, measured
+    in element numbers.
+
+    .. attribute:: mean_neighbor_distance
+
+        mean of *|element_a - element_b|* over all interfaces.
+
+    .. attribute:: median_neighbor_distance
+    .. attribute:: max_neighbor_distance
+
+    .. attribute:: mean_interface_jump
+
+        mean change of the lower element number between consecutive
+        interfaces, i.e. how far a flux gather moves through memory
+        from one face to the next.
+    """
+
+    def __init__(self, mean_neighbor_distance, median_neighbor_distance,
+            max_neighbor_distance, mean_interface_jump):
+        self.mean_neighbor_distance = mean_neighbor_distance
+        self.median_neighbor_distance = median_neighbor_distance
+        self.max_neighbor_distance = max_neighbor_distance
+        self.mean_interface_jump = mean_interface_jump
+
+    def __str__(self):
+        return ("neighbor distance: mean %g, median %g, max %d; "
+                "mean interface jump %g" % (
+                    self.mean_neighbor_distance,
+                    self.median_neighbor_distance,
+                    self.max_neighbor_distance,
+                    self.mean_interface_jump))
+
+
+
+
+def get_locality_report(mesh):
+    """Return a :class:`LocalityReport` for the element numbering of
+    *mesh*.
+    """
+    interfaces = mesh.get_arrays().interfaces
+    if not len(interfaces):
+        return LocalityReport(0, 0, 0, 0)
 
-                visited_nodes.add(neighbor)
-                next_levelset.add(neighbor)
-                old_numbers.append(neighbor)
+    distances = numpy.abs(interfaces[:, 0] - interfaces[:, 2])
+    lower_els = numpy.minimum(interfaces[:, 0], interfaces[:, 2])
 
-        levelset = list(next_levelset)
+    if len(lower_els) > 1:
+        mean_jump = numpy.mean(numpy.abs(numpy.diff(lower_els)))
+    else:
+        mean_jump = 0
 
-    return old_numbers
+    return LocalityReport(
+            mean_neighbor_distance=numpy.mean(distances),
+            median_neighbor_distance=numpy.median(distances),
+            max_neighbor_distance=int(distances.max()),
+            mean_interface_jump=mean_jump)
@@ -49,7 +49,9 @@ class PartitionData(pytools.Record):
             neighbor_parts,
             global_periodic_opposite_faces,
             part_boundary_tags,
-            tag_to_elements
+            tag_to_elements,
+            global_element_numbers=None,
+            global_vertex_numbers=None,
             ):
         pytools.Record.__init__(self, locals())
 
@@ -57,148 +59,623 @@ class PartitionData(pytools.Record):
 
 
 def partition_from_tags(mesh, tag_to_number):
-    partition = numpy.zeros((len(mesh.elements),), dtype=numpy.int32)
+    mesh_arrays = mesh.get_arrays()
+    partition = numpy.zeros((mesh_arrays.element_count,), dtype=numpy.int32)
 
     for tag, number in tag_to_number.iteritems():
-        for el in mesh.tag_to_elements[tag]:
-            partition[el.id] += number
+        partition[mesh_arrays.tag_to_elements[tag]] += number
 
     return partition
 
 
 
 
-def partition_mesh(mesh, partition, part_bdry_tag_factory):
-    """*partition* is a mapping that maps element id to
-    integers that represent different pieces of the mesh.
+# {{{ single-pass partitioning
+
+def _partition_array(mesh, partition):
+    """Return *partition*, a sequence or a mapping from element ids to
+    parts, as an array with one part number per element of *mesh*.
+    """
+    if isinstance(partition, dict):
+        element_count = mesh.get_arrays().element_count
+        if sorted(partition) != range(element_count):
+            raise ValueError("partition must assign a part to every element")
+        return numpy.array([partition[el_id]
+            for el_id in xrange(element_count)])
+    else:
+        return numpy.asarray(partition)
+
+
+
+
+def _bucket(rows, row_parts, part_count):
+    """Stably sort *rows* by *row_parts*. Return the sorted rows and an
+    array of *part_count+1* offsets delimiting each part's rows.
+    """
+    order = numpy.argsort(row_parts, kind="mergesort")
+    starts = numpy.zeros(part_count+1, dtype=numpy.intp)
+    numpy.cumsum(numpy.bincount(row_parts, minlength=part_count),
+            out=starts[1:])
+    return rows[order], starts
+
+
+
+
+class _PartitionBuckets(object):
+    """The connectivity of a mesh, sorted by the part each element, face
+    and interface belongs to, so that every part's share of it is a
+    contiguous slice. Interfaces between two different parts are split
+    into a boundary face on either side.
+    """
+
+    def __init__(self, mesh, partition):
+        arrays = self.arrays = mesh.get_arrays()
+        self.periodic_opposite_faces = mesh.periodic_opposite_faces
+
+        partition = numpy.asarray(partition)
+        if partition.shape != (arrays.element_count,):
+            raise ValueError("partition must assign a part to every element")
+
+        self.parts, el_part = numpy.unique(partition, return_inverse=True)
+        part_count = len(self.parts)
+
+        def bucket_el_faces(el_faces):
+            return _bucket(el_faces, el_part[el_faces[:, 0]], part_count)
+
+        self.elements, el_starts = _bucket(
+                numpy.arange(arrays.element_count, dtype=numpy.intp),
+                el_part, part_count)
+        self.element_starts = el_starts
+
+        self.local_element_numbers = numpy.empty(
+                arrays.element_count, dtype=numpy.intp)
+        self.local_element_numbers[self.elements] = (
+                numpy.arange(arrays.element_count, dtype=numpy.intp)
+                - numpy.repeat(el_starts[:-1], numpy.diff(el_starts)))
+
+        # {{{ interfaces
+
+        interfaces = arrays.interfaces
+        part_a = el_part[interfaces[:, 0]]
+        part_b = el_part[interfaces[:, 2]]
+        internal = part_a == part_b
+
+        self.interfaces, self.interface_starts = _bucket(
+                interfaces[internal], part_a[internal], part_count)
+
+        # periodic interfaces join faces with different vertices
+        face_vertices = arrays.face_vertices()
+        fv_a = numpy.sort(
+                face_vertices[self.interfaces[:, 0], self.interfaces[:, 1]],
+                axis=1)
+        fv_b = numpy.sort(
+                face_vertices[self.interfaces[:, 2], self.interfaces[:, 3]],
+                axis=1)
+        periodic = (fv_a != fv_b).any(axis=1)
+        self.periodic_interfaces, self.periodic_interface_starts = _bucket(
+                self.interfaces[periodic],
+                el_part[self.interfaces[periodic, 0]], part_count)
+
+        cut = ~internal
+        cut_el_faces = numpy.vstack((
+            interfaces[cut][:, :2], interfaces[cut][:, 2:]))
+        cut_opposite_parts = numpy.hstack((part_b[cut], part_a[cut]))
+        cut_parts = numpy.hstack((part_a[cut], part_b[cut]))
+
+        self.cut_faces, self.cut_starts = _bucket(
+                numpy.hstack((cut_el_faces, cut_opposite_parts[:, None])),
+                cut_parts, part_count)
+
+        # }}}
+
+        self.boundary_tags = list(arrays.tag_to_boundary)
+        self.boundary = [
+                bucket_el_faces(arrays.tag_to_boundary[tag])
+                for tag in self.boundary_tags]
+
+        self.element_tags = list(arrays.tag_to_elements)
+        self.tagged_elements = [
+                _bucket(els, el_part[els], part_count)
+                for els in (
+                    arrays.tag_to_elements[tag] for tag in self.element_tags)]
+
+    def __len__(self):
+        return len(self.parts)
+
+    def get_part(self, part_index):
+        """Return a :class:`_PartConnectivity` for the part with index
+        *part_index* into :attr:`parts`.
+        """
+        from hedge.mesh import TAG_REALLY_ALL, TAG_NO_BOUNDARY
+        from hedge.mesh.arrays import MeshArrays
+
+        arrays = self.arrays
+        local_el_numbers = self.local_element_numbers
+
+        def part_slice((rows, starts)):
+            return rows[starts[part_index]:starts[part_index+1]]
+
+        def localize_el_faces(el_faces):
+            el_faces = el_faces.copy()
+            el_faces[:, 0] = local_el_numbers[el_faces[:, 0]]
+            return el_faces[numpy.lexsort(el_faces.T[::-1])]
+
+        global_el_numbers = part_slice(
+                (self.elements, self.element_starts))
+        global_vertex_indices = arrays.vertex_indices[global_el_numbers]
+        global_vertex_numbers = numpy.unique(global_vertex_indices)
+
+        def localize_vertices(vertices):
+            return numpy.searchsorted(global_vertex_numbers, vertices)
+
+        interfaces = part_slice(
+                (self.interfaces, self.interface_starts)).copy()
+        interfaces[:, [0, 2]] = local_el_numbers[interfaces[:, [0, 2]]]
+
+        # faces towards other parts are boundary, but not under TAG_ALL
+        cut_faces = part_slice((self.cut_faces, self.cut_starts))
+        cut_el_faces = cut_faces[:, :2]
+        cut_opposite_parts = cut_faces[:, 2]
+
+        tag_to_boundary = dict(
+                (tag, part_slice(bucket))
+                for tag, bucket in zip(self.boundary_tags, self.boundary))
+        for tag in [TAG_REALLY_ALL, TAG_NO_BOUNDARY]:
+            tag_to_boundary[tag] = numpy.vstack((
+                tag_to_boundary.get(tag, cut_el_faces[:0]), cut_el_faces))
+
+        tag_to_boundary = dict(
+                (tag, localize_el_faces(el_faces))
+                for tag, el_faces in tag_to_boundary.iteritems())
+
+        rank_boundaries = dict(
+                (int(self.parts[opp_index]),
+                    localize_el_faces(cut_el_faces[
+                        cut_opposite_parts == opp_index]))
+                for opp_index in numpy.unique(cut_opposite_parts))
+
+        tag_to_elements = dict(
+                (tag, local_el_numbers[part_slice(bucket)])
+                for tag, bucket in zip(
+                    self.element_tags, self.tagged_elements))
+
+        # {{{ periodicity within the part
+
+        periodic_opposite_faces = {}
+        periodic_opposite_vertices = {}
+
+        fvn = arrays.face_vertex_numbers()
+        for el_a, face_a, el_b, face_b in part_slice(
+                (self.periodic_interfaces, self.periodic_interface_starts)
+                ).tolist():
+            for el, face in [(el_a, face_a), (el_b, face_b)]:
+                face_vertices = arrays.vertex_indices[el, fvn[face]]
+                opp_face_vertices, axis = self.periodic_opposite_faces[
+                        tuple(face_vertices.tolist())]
+
+                local_face_vertices = tuple(
+                        localize_vertices(face_vertices).tolist())
+                local_opp_face_vertices = tuple(
+                        localize_vertices(opp_face_vertices).tolist())
+
+                periodic_opposite_faces[local_face_vertices] = \
+                        local_opp_face_vertices, axis
+
+                for a, b in zip(local_face_vertices, local_opp_face_vertices):
+                    opp_vertices = periodic_opposite_vertices.setdefault(a, [])
+                    if (b, axis) not in opp_vertices:
+                        opp_vertices.append((b, axis))
+
+        # }}}
+
+        return _PartConnectivity(
+                part_nr=self.parts[part_index].item(),
+                arrays=MeshArrays(
+                    points=arrays.points[global_vertex_numbers],
+                    element_class=arrays.element_class,
+                    vertex_indices=localize_vertices(global_vertex_indices),
+                    interfaces=interfaces,
+                    tag_to_boundary=tag_to_boundary,
+                    tag_to_elements=tag_to_elements),
+                rank_boundaries=rank_boundaries,
+                global_element_numbers=global_el_numbers,
+                global_vertex_numbers=global_vertex_numbers,
+                periodic_opposite_faces=periodic_opposite_faces,
+                periodic_opposite_vertices=periodic_opposite_vertices)
+
+
+
+
+class _PartConnectivity(pytools.Record):
+    """The connectivity of one part of a partitioned mesh, in local
+    numbering. *rank_boundaries* maps each neighboring part to the
+    array of *(element, face)* pairs bordering it.
+    """
+
+    def __init__(self, part_nr, arrays, rank_boundaries,
+            global_element_numbers, global_vertex_numbers,
+            periodic_opposite_faces, periodic_opposite_vertices):
+        pytools.Record.__init__(self, locals())
+
+
+
+
+_forked_partition_buckets = None
+
+
+def _get_forked_part(part_index):
+    return _forked_partition_buckets.get_part(part_index)
+
+
+def _get_parts_forked(buckets, processes):
+    """Generate the parts in *buckets* in order, assembling them in
+    *processes* worker processes, which inherit *buckets* by forking.
+    """
+    global _forked_partition_buckets
+    _forked_partition_buckets = buckets
+
+    from multiprocessing import Pool
+    pool = Pool(processes)
+    try:
+        for part in pool.imap(_get_forked_part, xrange(len(buckets))):
+            yield part
+    finally:
+        pool.terminate()
+        pool.join()
+        _forked_partition_buckets = None
+
+# }}}
+
+
+
+
+def partition_mesh(mesh, partition, part_bdry_tag_factory, processes=None):
+    """*partition* maps element ids to integers that represent different
+    pieces of the mesh. It is either a sequence (such as an array) with
+    one entry per element, or a :class:`dict` keyed by element id.
 
     For historical reasons, the values in partition are called
     'parts'.
+
+    The connectivity of *mesh* is sorted by part once, after which each
+    part's local numbering, interfaces, boundary faces and tags are slices
+    of it. Faces bordering another part *p* are tagged with
+    *part_bdry_tag_factory(p)* and :class:`hedge.mesh.TAG_NO_BOUNDARY`.
+
+    :arg processes: if greater than one, assemble the parts in this many
+      worker processes. Parts are generated in order either way.
     """
 
-    # Find parts to which we need to distribute.
-    all_parts = list(set(
-        partition[el.id] for el in mesh.elements))
-
-    # Prepare a mapping of elements to tags to speed up
-    # copy_el_tagger, below.
-    el2tags = {}
-    for tag, elements in mesh.tag_to_elements.iteritems():
-        if tag == hedge.mesh.TAG_ALL:
-            continue
-        for el in elements:
-            el2tags.setdefault(el, []).append(tag)
-
-    # prepare a mapping of (el, face_nr) to boundary_tags
-    # to speed up partition_bdry_tagger, below
-    elface2tags = {}
-    for tag, elfaces in mesh.tag_to_boundary.iteritems():
-        if tag == hedge.mesh.TAG_ALL:
-            continue
-        for el, fn in elfaces:
-            elface2tags.setdefault((el, fn), []).append(tag)
-
-    # prepare a mapping from (el, face_nr) to the part
-    # at the other end of the interface, if different from
-    # current. concurrently, prepare a mapping
-    #  part -> set([parts that border me])
-    elface2part = {}
-    neighboring_parts = {}
-
-    for elface1, elface2 in mesh.interfaces:
-        e1, f1 = elface1
-        e2, f2 = elface2
-        r1 = partition[e1.id]
-        r2 = partition[e2.id]
-
-        if r1 != r2:
-            neighboring_parts.setdefault(r1, set()).add(r2)
-            neighboring_parts.setdefault(r2, set()).add(r1)
-
-            elface2part[elface1] = r2
-            elface2part[elface2] = r1
-
-    # prepare a new mesh for each part and send it
-    from hedge.mesh import TAG_NO_BOUNDARY
-
-    for part in all_parts:
-        part_global_elements = [el
-                for el in mesh.elements
-                if partition[el.id] == part]
-
-        # pick out this part's vertices
-        from pytools import flatten
-        part_global_vertex_indices = set(flatten(
-                el.vertex_indices for el in part_global_elements))
-
-        part_local_vertices = [mesh.points[vi]
-                for vi in part_global_vertex_indices]
-
-        # find global-to-local maps
-        part_global2local_vertex_indices = dict(
-                (gvi, lvi) for lvi, gvi in
-                enumerate(part_global_vertex_indices))
-
-        part_global2local_elements = dict(
-                (el.id, i) for i, el in
-                enumerate(part_global_elements))
-
-        # find elements in local numbering
-        part_local_elements = [
-                [part_global2local_vertex_indices[vi]
-                    for vi in el.vertex_indices]
-                for el in part_global_elements]
-
-        # make new local Mesh object, including
-        # boundary and element tagging
-        def partition_bdry_tagger(fvi, local_el, fn, all_vertices):
-            el = part_global_elements[local_el.id]
-
-            result = elface2tags.get((el, fn), [])
-            try:
-                opp_part = elface2part[el, fn]
-                result.append(part_bdry_tag_factory(opp_part))
-
-                # keeps this part of the boundary from falling
-                # under TAG_ALL.
-                result.append(TAG_NO_BOUNDARY)
-
-            except KeyError:
-                pass
+    buckets = _PartitionBuckets(mesh, _partition_array(mesh, partition))
 
-            return result
+    if processes is not None and processes > 1:
+        parts = _get_parts_forked(buckets, processes)
+    else:
+        parts = (buckets.get_part(i) for i in xrange(len(buckets)))
 
-        def copy_el_tagger(local_el, all_vertices):
-            return el2tags.get(part_global_elements[local_el.id], [])
+    from hedge.mesh import make_conformal_mesh_from_arrays
 
-        def is_partbdry_face((local_el, face_nr)):
-            return (part_global_elements[local_el.id], face_nr) in elface2part
+    for part in parts:
+        part_boundary_tags = dict(
+                (nb_part, part_bdry_tag_factory(nb_part))
+                for nb_part in part.rank_boundaries)
 
-        from hedge.mesh import make_conformal_mesh
-        part_mesh = make_conformal_mesh(
-                part_local_vertices,
-                part_local_elements,
-                partition_bdry_tagger,
-                copy_el_tagger,
-                mesh.periodicity,
-                is_partbdry_face)
+        tag_to_boundary = part.arrays.tag_to_boundary
+        for nb_part, el_faces in part.rank_boundaries.iteritems():
+            tag_to_boundary[part_boundary_tags[nb_part]] = el_faces
 
-        # assemble per-part data
+        part_mesh = make_conformal_mesh_from_arrays(
+                part.arrays,
+                mesh.periodicity,
+                part.periodic_opposite_faces,
+                part.periodic_opposite_vertices,
+                mesh.has_internal_boundaries)
 
-        my_nb_parts = neighboring_parts.get(part, [])
         yield PartitionData(
-                part,
+                part.part_nr,
                 part_mesh,
-                part_global2local_elements,
-                part_global2local_vertex_indices,
-                my_nb_parts,
+                dict(zip(part.global_element_numbers.tolist(),
+                    xrange(len(part.global_element_numbers)))),
+                dict(zip(part.global_vertex_numbers.tolist(),
+                    xrange(len(part.global_vertex_numbers)))),
+                set(part.rank_boundaries),
                 mesh.periodic_opposite_faces,
-                part_boundary_tags=dict(
-                    (nb_part, part_bdry_tag_factory(nb_part))
-                    for nb_part in my_nb_parts),
-                tag_to_elements = part_mesh.tag_to_elements
+                part_boundary_tags=part_boundary_tags,
+                tag_to_elements=part_mesh.tag_to_elements,
+                global_element_numbers=part.global_element_numbers,
+                global_vertex_numbers=part.global_vertex_numbers,
+                )
+
+
+
+
+
+def get_metis_partition(mesh, part_count):
+    """Return an array assigning each element of *mesh* to one of
+    *part_count* parts, as computed by PyMetis.
+    """
+    from pymetis import part_graph
+    xadj, adjncy = mesh.element_adjacency_graph(csr=True)
+    dummy, partition = part_graph(part_count, xadj=xadj, adjncy=adjncy)
+    return numpy.asarray(partition)
+
+
+
+
+# {{{ pre-partitioned mesh files
+
+MESH_PART_FORMAT = "hedge-mesh-part"
+MESH_PART_VERSION = 1
+
+
+def _encode_tag(tag):
+    from hedge.mesh import TAG_RANK_BOUNDARY
+
+    if isinstance(tag, basestring):
+        return ["str", tag]
+    elif isinstance(tag, type):
+        return ["class", "%s.%s" % (tag.__module__, tag.__name__)]
+    elif isinstance(tag, TAG_RANK_BOUNDARY):
+        return ["rank", int(tag.rank)]
+    elif isinstance(tag, (int, long)):
+        return ["int", tag]
+    else:
+        raise ValueError("cannot store tag %r in a mesh part file" % (tag,))
+
+
+def _decode_tag((kind, value)):
+    from hedge.mesh import TAG_RANK_BOUNDARY
+
+    if kind == "str":
+        return str(value)
+    elif kind == "class":
+        module_name, class_name = str(value).rsplit(".", 1)
+        import sys
+        __import__(module_name)
+        return getattr(sys.modules[module_name], class_name)
+    elif kind == "rank":
+        return TAG_RANK_BOUNDARY(value)
+    elif kind == "int":
+        return value
+    else:
+        raise ValueError("unknown tag kind '%s' in mesh part file" % kind)
+
+
+def _opposite_faces_to_arrays(opposite_faces, face_vertex_count):
+    keys = list(opposite_faces)
+    return (
+            numpy.array(keys, dtype=numpy.intp)
+            .reshape(-1, face_vertex_count),
+            numpy.array([opposite_faces[key][0] for key in keys],
+                dtype=numpy.intp).reshape(-1, face_vertex_count),
+            numpy.array([opposite_faces[key][1] for key in keys],
+                dtype=numpy.intp))
+
+
+def _arrays_to_opposite_faces(faces, opposite_faces, axes):
+    return dict(
+            (tuple(face), (tuple(opposite_face), axis))
+            for face, opposite_face, axis in zip(
+                faces.tolist(), opposite_faces.tolist(), axes.tolist()))
+
+
+def get_part_filename(basename, part_nr):
+    return "%s-part%04d.mesh" % (basename, part_nr)
+
+
+def write_partitioned_mesh(basename, mesh, partition,
+        part_bdry_tag_factory=None, processes=None):
+    """Partition *mesh* using :func:`partition_mesh` and write each part
+    to its own file, named by :func:`get_part_filename`, from which
+    :func:`read_mesh_part` restores its :class:`PartitionData`. Return
+    the list of file names.
+
+    Each file holds the part's local mesh, its global element and vertex
+    numbers, its neighbor parts, and the entries of the global
+    *periodic_opposite_faces* needed to match its periodic faces across
+    part boundaries. Tags must be strings, integers, classes or
+    :class:`hedge.mesh.TAG_RANK_BOUNDARY` instances.
+
+    :arg partition: as for :func:`partition_mesh`, or an integer number
+      of parts to compute with PyMetis. Since part numbers name the files
+      and the ranks that read them, every part number from 0 to the
+      largest one must occur.
+    :arg part_bdry_tag_factory: defaults to
+      :class:`hedge.mesh.TAG_RANK_BOUNDARY`.
+    """
+    if isinstance(partition, (int, long)):
+        part_count = partition
+        partition = get_metis_partition(mesh, part_count)
+    else:
+        part_count = None
+    partition = _partition_array(mesh, partition)
+
+    if len(partition) and partition.min() < 0:
+        raise ValueError("part numbers must be nonnegative")
+    if part_count is None:
+        part_count = partition.max() + 1 if len(partition) else 0
+
+    empty_parts = numpy.setdiff1d(numpy.arange(part_count), partition)
+    if len(empty_parts):
+        raise ValueError("part numbers must run from 0 to %d without gaps, "
+                "but these parts have no elements: %s"
+                % (part_count-1, ", ".join(str(p) for p in empty_parts)))
+
+    if part_bdry_tag_factory is None:
+        from hedge.mesh import TAG_RANK_BOUNDARY
+        part_bdry_tag_factory = TAG_RANK_BOUNDARY
+
+    from hedge.tools.arraystore import write_array_store
+
+    global_pof = mesh.periodic_opposite_faces
+    pof_by_vertex_set = dict(
+            (frozenset(face), face) for face in global_pof)
+
+    filenames = []
+
+    for pd in partition_mesh(mesh, partition, part_bdry_tag_factory,
+            processes=processes):
+        part_arrays = pd.mesh.get_arrays()
+        face_vertex_count = part_arrays.face_vertex_numbers().shape[1]
+        gvi = pd.global_vertex_numbers
+
+        # {{{ global periodicity needed to match faces with neighbors
+
+        part_global_pof = {}
+        for tag in pd.part_boundary_tags.itervalues():
+            el_faces = part_arrays.tag_to_boundary[tag]
+            face_vertices = gvi[part_arrays.face_vertices()[
+                el_faces[:, 0], el_faces[:, 1]]]
+            for face in face_vertices.tolist():
+                face = tuple(face)
+                if face in global_pof:
+                    opposite_face, axis = global_pof[face]
+                    part_global_pof[face] = opposite_face, axis
+
+                    nb_face = pof_by_vertex_set[frozenset(opposite_face)]
+                    part_global_pof[nb_face] = global_pof[nb_face]
+
+        # }}}
+
+        boundary_tags = list(part_arrays.tag_to_boundary)
+        element_tags = list(part_arrays.tag_to_elements)
+
+        arrays = {
+                "points": part_arrays.points,
+                "vertex_indices": part_arrays.vertex_indices,
+                "interfaces": part_arrays.interfaces,
+                "global_element_numbers": pd.global_element_numbers,
+                "global_vertex_numbers": gvi,
+                }
+        for i, tag in enumerate(boundary_tags):
+            arrays["bdry/%d" % i] = part_arrays.tag_to_boundary[tag]
+        for i, tag in enumerate(element_tags):
+            arrays["els/%d" % i] = part_arrays.tag_to_elements[tag]
+
+        for prefix, opposite_faces in [
+                ("periodic", pd.mesh.periodic_opposite_faces),
+                ("global_periodic", part_global_pof)]:
+            (arrays[prefix+"/faces"], arrays[prefix+"/opposite_faces"],
+                    arrays[prefix+"/axes"]) = _opposite_faces_to_arrays(
+                            opposite_faces, face_vertex_count)
+
+        arrays["periodic/opposite_vertices"] = numpy.array([
+            (a, b, axis)
+            for a, opposite_vertices
+            in pd.mesh.periodic_opposite_vertices.iteritems()
+            for b, axis in opposite_vertices], dtype=numpy.intp).reshape(-1, 3)
+
+        def encode_periodicity(axis_periodicity):
+            if axis_periodicity is None:
+                return None
+            return [_encode_tag(tag) for tag in axis_periodicity]
+
+        metadata = dict(
+                format=MESH_PART_FORMAT,
+                version=MESH_PART_VERSION,
+                part_nr=pd.part_nr,
+                part_count=int(part_count),
+                element_class=_encode_tag(part_arrays.element_class),
+                boundary_tags=[_encode_tag(tag) for tag in boundary_tags],
+                element_tags=[_encode_tag(tag) for tag in element_tags],
+                part_boundary_tags=[
+                    [nb_part, _encode_tag(tag)]
+                    for nb_part, tag in pd.part_boundary_tags.iteritems()],
+                periodicity=[encode_periodicity(axis_periodicity)
+                    for axis_periodicity in pd.mesh.periodicity],
+                has_internal_boundaries=bool(
+                    pd.mesh.has_internal_boundaries),
                 )
 
+        filename = get_part_filename(basename, pd.part_nr)
+        write_array_store(filename, arrays, metadata)
+        filenames.append(filename)
+
+    return filenames
+
+
+def read_mesh_part(filename, part_count=None, mmap=True):
+    """Return the :class:`PartitionData` of a part written by
+    :func:`write_partitioned_mesh`.
+
+    :arg part_count: if not *None*, raise :exc:`ValueError` unless the
+      mesh was split into this many parts.
+    :arg mmap: whether to memory-map the mesh arrays rather than read
+      them into memory.
+    """
+    from hedge.tools.arraystore import ArrayStore
+    store = ArrayStore(filename, mmap=mmap)
+    metadata = store.metadata
+
+    if metadata.get("format") != MESH_PART_FORMAT:
+        raise ValueError("'%s' is not a mesh part file" % filename)
+    if metadata["version"] > MESH_PART_VERSION:
+        raise ValueError("'%s' has unsupported version %d"
+                % (filename, metadata["version"]))
+    if part_count is not None and metadata["part_count"] != part_count:
+        raise ValueError("'%s' is part of a mesh split into %d parts, "
+                "expected %d" % (filename, metadata["part_count"], part_count))
+
+    from hedge.mesh.arrays import MeshArrays
+    arrays = MeshArrays(
+            points=store["points"],
+            element_class=_decode_tag(metadata["element_class"]),
+            vertex_indices=store["vertex_indices"],
+            interfaces=store["interfaces"],
+            tag_to_boundary=dict(
+                (_decode_tag(tag), store["bdry/%d" % i])
+                for i, tag in enumerate(metadata["boundary_tags"])),
+            tag_to_elements=dict(
+                (_decode_tag(tag), store["els/%d" % i])
+                for i, tag in enumerate(metadata["element_tags"])))
+
+    periodic_opposite_vertices = {}
+    for a, b, axis in store["periodic/opposite_vertices"].tolist():
+        periodic_opposite_vertices.setdefault(a, []).append((b, axis))
+
+    def decode_periodicity(axis_periodicity):
+        if axis_periodicity is None:
+            return None
+        return tuple(_decode_tag(tag) for tag in axis_periodicity)
+
+    from hedge.mesh import make_conformal_mesh_from_arrays
+    part_mesh = make_conformal_mesh_from_arrays(
+            arrays,
+            [decode_periodicity(axis_periodicity)
+                for axis_periodicity in metadata["periodicity"]],
+            _arrays_to_opposite_faces(
+                store["periodic/faces"],
+                store["periodic/opposite_faces"],
+                store["periodic/axes"]),
+            periodic_opposite_vertices,
+            metadata["has_internal_boundaries"])
+
+    part_boundary_tags = dict(
+            (nb_part, _decode_tag(tag))
+            for nb_part, tag in metadata["part_boundary_tags"])
+
+    global_el_numbers = store["global_element_numbers"]
+    global_vertex_numbers = store["global_vertex_numbers"]
+
+    return PartitionData(
+            metadata["part_nr"],
+            part_mesh,
+            dict(zip(global_el_numbers.tolist(),
+                xrange(len(global_el_numbers)))),
+            dict(zip(global_vertex_numbers.tolist(),
+                xrange(len(global_vertex_numbers)))),
+            set(part_boundary_tags),
+            _arrays_to_opposite_faces(
+                store["global_periodic/faces"],
+                store["global_periodic/opposite_faces"],
+                store["global_periodic/axes"]),
+            part_boundary_tags=part_boundary_tags,
+            tag_to_elements=part_mesh.tag_to_elements,
+            global_element_numbers=global_el_numbers,
+            global_vertex_numbers=global_vertex_numbers,
+            )
+
+# }}}
 
 
 
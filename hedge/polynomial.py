@@ -100,6 +100,103 @@ def generic_multi_vandermonde(points, functions):
 
 
 
+def jacobi_values(alpha, beta, max_n, x):
+    """Return a list whose entry *n* holds the values of
+    *JacobiFunction(alpha, beta, n)* at each entry of the array *x*, for
+    *n* from 0 to *max_n*.
+    """
+    from math import gamma, sqrt
+
+    x = numpy.asarray(x, dtype=numpy.float64)
+
+    gamma0 = (2**(alpha+beta+1)/(alpha+beta+1)
+            * gamma(alpha+1)*gamma(beta+1)/gamma(alpha+beta+1))
+    result = [numpy.ones_like(x)/sqrt(gamma0)]
+    if max_n == 0:
+        return result
+
+    gamma1 = (alpha+1)*(beta+1)/(alpha+beta+3)*gamma0
+    result.append(((alpha+beta+2)/2*x + (alpha-beta)/2)/sqrt(gamma1))
+
+    a_old = 2/(2+alpha+beta)*sqrt((alpha+1)*(beta+1)/(alpha+beta+3))
+    for i in range(1, max_n):
+        h1 = 2*i+alpha+beta
+        a_new = 2/(h1+2)*sqrt((i+1)*(i+1+alpha+beta)*(i+1+alpha)
+                *(i+1+beta)/(h1+1)/(h1+3))
+        b_new = -(alpha**2-beta**2)/h1/(h1+2)
+        result.append((-a_old*result[-2] + (x-b_new)*result[-1])/a_new)
+        a_old = a_new
+
+    return result
+
+
+
+
+def simplex_onb_vandermonde(unit_points, mode_identifiers):
+    """Return the Vandermonde matrix of the orthonormal basis of the
+    unit simplex at *unit_points*, an array of shape *(dims, n)*.
+
+    Entry *(i, j)* is the value of the basis function with mode
+    identifier *mode_identifiers[j]* at point *i*, as computed point by
+    point by :class:`hedge.discretization.local.TriangleBasisFunction`
+    and its interval and tetrahedron counterparts.
+    """
+    unit_points = numpy.asarray(unit_points, dtype=numpy.float64)
+    mode_identifiers = list(mode_identifiers)
+    dims = unit_points.shape[0]
+    max_n = max([sum(mid) for mid in mode_identifiers] + [0])
+
+    # collapsed coordinates, see the C++ basis functions
+    err_settings = numpy.seterr(divide="ignore", invalid="ignore")
+    try:
+        if dims == 1:
+            coords = [unit_points[0]]
+        elif dims == 2:
+            r, s = unit_points
+            coords = [
+                    numpy.where(1-s != 0, 2*(1+r)/(1-s)-1, 1),
+                    s]
+        elif dims == 3:
+            r, s, t = unit_points
+            coords = [
+                    numpy.where(s+t != 0, -2*(1+r)/(s+t)-1, -1),
+                    numpy.where(1-t != 0, 2*(1+s)/(1-t)-1, -1),
+                    t]
+        else:
+            raise ValueError("unsupported dimension: %d" % dims)
+    finally:
+        numpy.seterr(**err_settings)
+
+    jacobi_cache = {}
+
+    def jacobi(axis, alpha, n):
+        try:
+            values = jacobi_cache[axis, alpha]
+        except KeyError:
+            values = jacobi_cache[axis, alpha] = jacobi_values(
+                    alpha, 0, max_n, coords[axis])
+        return values[n]
+
+    result = numpy.empty((unit_points.shape[1], len(mode_identifiers)))
+    for j, mid in enumerate(mode_identifiers):
+        if dims == 1:
+            i, = mid
+            result[:, j] = jacobi(0, 0, i)
+        elif dims == 2:
+            i, k = mid
+            result[:, j] = (numpy.sqrt(2) * jacobi(0, 0, i)
+                    * jacobi(1, 2*i+1, k) * (1-coords[1])**i)
+        else:
+            i, k, l = mid
+            result[:, j] = (numpy.sqrt(8) * jacobi(0, 0, i)
+                    * jacobi(1, 2*i+1, k) * (1-coords[1])**i
+                    * jacobi(2, 2*i+2*k+2, l) * (1-coords[2])**(i+k))
+
+    return result
+
+
+
+
 def legendre_vandermonde(points, N):
     return generic_vandermonde(points,
             [LegendreFunction(i) for i in range(N+1)])
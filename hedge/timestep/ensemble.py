@@ -0,0 +1,85 @@
+"""Time stepping for ensembles of fields."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+
+
+
+from hedge.timestep.base import TimeStepper
+
+
+
+
+class EnsembleTimeStepper(TimeStepper):
+    """Advances all members of an ensemble (see
+    :func:`hedge.tools.ensemble.stack_ensemble`) together, using one
+    right-hand side evaluation per stage for the whole ensemble.
+
+    The wrapped *stepper* sees each component of the ensemble as a
+    single flat vector, so that its linear combinations, norms and
+    step size control (if any) are unaware of the ensemble axis. Note
+    that adaptive steppers therefore take the same step size for all
+    members, governed by the least well-behaved one.
+
+    Example::
+
+        stepper = EnsembleTimeStepper(LSRK4TimeStepper())
+        fields = stack_ensemble([u0, u1, u2])
+        fields = stepper(fields, t, dt, rhs)
+        u0, u1, u2 = unstack_ensemble(fields)
+    """
+
+    def __init__(self, stepper):
+        self.stepper = stepper
+
+    def __getattr__(self, name):
+        # forward dt_fudge_factor, adaptive, add_instrumentation, etc.
+        if name == "stepper":
+            raise AttributeError(name)
+        return getattr(self.stepper, name)
+
+    def __call__(self, ensemble, t, dt, rhs):
+        from pytools.obj_array import with_object_array_or_scalar
+
+        def flatten(field):
+            return with_object_array_or_scalar(
+                    lambda component: component.reshape(-1), field)
+
+        def unflatten(field):
+            return with_object_array_or_scalar(
+                    lambda component: component.reshape(
+                        -1, node_count), field)
+
+        from pytools.obj_array import log_shape
+        if log_shape(ensemble) == ():
+            node_count = ensemble.shape[-1]
+        else:
+            node_count = ensemble.flat[0].shape[-1]
+
+        def flat_rhs(t, y):
+            return flatten(rhs(t, unflatten(y)))
+
+        return unflatten(self.stepper(flatten(ensemble), t, dt, flat_rhs))
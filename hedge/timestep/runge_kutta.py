@@ -38,6 +38,13 @@ class LSRK4TimeStepper(TimeStepper):
     or
     Carpenter, M.H., and Kennedy, C.A., Fourth-order-2N-storage
     Runge-Kutta schemes, NASA Langley Tech Report TM 109112, 1994
+
+    If *rhs_dtype* is given, the right-hand side is evaluated on a copy
+    of the state cast to *rhs_dtype*, while the state and the residual
+    are kept in *dtype*. Passing *dtype=numpy.float64* and
+    *rhs_dtype=numpy.float32* thus gives a mixed-precision scheme that
+    evaluates the (bandwidth-bound) operator in single precision without
+    accumulating round-off from step to step in single precision.
     """
 
     _RK4A = [
@@ -70,7 +77,7 @@ class LSRK4TimeStepper(TimeStepper):
     adaptive = False
 
     def __init__(self, dtype=numpy.float64, rcon=None,
-            vector_primitive_factory=None):
+            vector_primitive_factory=None, rhs_dtype=None):
         if vector_primitive_factory is None:
             from hedge.vector_primitives import VectorPrimitiveFactory
             self.vector_primitive_factory = VectorPrimitiveFactory()
@@ -94,6 +101,12 @@ class LSRK4TimeStepper(TimeStepper):
         self.coeffs = numpy.array([self._RK4A, self._RK4B, self._RK4C],
                 dtype=self.scalar_dtype).T
 
+        if rhs_dtype is not None:
+            rhs_dtype = numpy.dtype(rhs_dtype)
+            if rhs_dtype == self.dtype:
+                rhs_dtype = None
+        self.rhs_dtype = rhs_dtype
+
     def get_stability_relevant_init_args(self):
         return ()
 
@@ -102,6 +115,15 @@ class LSRK4TimeStepper(TimeStepper):
         logmgr.add_quantity(self.flop_counter)
 
     def __call__(self, y, t, dt, rhs):
+        if self.rhs_dtype is not None:
+            from hedge.tools import cast_field
+            rhs_dtype = self.rhs_dtype
+            dtype = self.dtype
+            orig_rhs = rhs
+
+            def rhs(t, y):
+                return cast_field(orig_rhs(t, cast_field(y, rhs_dtype)), dtype)
+
         try:
             self.residual
         except AttributeError:
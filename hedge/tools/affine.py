@@ -100,3 +100,71 @@ def identify_affine_map(from_points, to_points):
     b = to_points[0] - numpy.dot(a, from_points[0])
 
     return AffineMap(a, b)
+
+
+
+
+class StackedAffineMaps(object):
+    """A batch of affine maps :math:`x\mapsto A_i x+b_i`, one for each
+    element of a group, stored as stacked arrays so that they can be
+    applied and inverted in a single vectorized operation.
+
+    .. attribute:: matrices
+
+        an array of shape *(n, dim, dim)*.
+
+    .. attribute:: vectors
+
+        an array of shape *(n, dim)*.
+    """
+
+    def __init__(self, matrices, vectors):
+        self.matrices = numpy.asarray(matrices, dtype=numpy.float64)
+        self.vectors = numpy.asarray(vectors, dtype=numpy.float64)
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def __getitem__(self, i):
+        return AffineMap(
+                numpy.array(self.matrices[i], order="C"),
+                numpy.array(self.vectors[i]))
+
+    @property
+    def nbytes(self):
+        return self.matrices.nbytes + self.vectors.nbytes
+
+    def __call__(self, points):
+        """Map the points in the array *points* of shape *(m, dim)*
+        through every map. Return an array of shape *(n, m, dim)*.
+        """
+        return (numpy.einsum("eij,mj->emi", self.matrices, points)
+                + self.vectors[:, numpy.newaxis, :])
+
+    def jacobians(self):
+        return la.det(self.matrices)
+
+    def inverted(self):
+        inv_matrices = la.inv(self.matrices)
+        return StackedAffineMaps(inv_matrices,
+                -numpy.einsum("eij,ej->ei", inv_matrices, self.vectors))
+
+
+
+
+def get_stacked_simplex_maps_unit_to_global(vertices):
+    """Return the :class:`StackedAffineMaps` taking the unit simplex
+    to each of the simplices given by *vertices*, an array of shape
+    *(n, dim+1, dim)*. This agrees with
+    :func:`hedge._internal.get_simplex_map_unit_to_global` applied to
+    each simplex in turn.
+    """
+    vertices = numpy.asarray(vertices, dtype=numpy.float64)
+    dim = vertices.shape[-1]
+
+    vertex0 = vertices[:, 0]
+    matrices = 0.5*(vertices[:, 1:] - vertex0[:, numpy.newaxis]
+            ).transpose(0, 2, 1)
+    vectors = 0.5*vertices[:, 1:].sum(axis=1) - 0.5*(dim-2)*vertex0
+
+    return StackedAffineMaps(matrices, vectors)
@@ -0,0 +1,161 @@
+"""A single-file, memory-mappable container of named arrays."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+import numpy as np
+
+
+# File layout:
+#
+# - the magic string MAGIC (16 bytes)
+# - the format version, a little-endian uint32
+# - four bytes of padding
+# - the header length in bytes, a little-endian uint64
+# - the header, a JSON object with the keys "metadata" and "arrays"
+# - the array data, each array starting at a multiple of ALIGNMENT
+#
+# Each entry of "arrays" is a list [name, dtype, shape, offset], where
+# *offset* is counted from the start of the file.
+
+MAGIC = "HEDGEARRAYSTORE\0"
+VERSION = 1
+ALIGNMENT = 64
+
+_PREAMBLE_DTYPE = np.dtype([
+    ("magic", "S%d" % len(MAGIC)),
+    ("version", "<u4"),
+    ("padding", "<u4"),
+    ("header_length", "<u8"),
+    ])
+
+
+class ArrayStoreError(RuntimeError):
+    pass
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_array_store(filename, arrays, metadata={}):
+    """Write the arrays in the dictionary *arrays*, which maps names to
+    arrays, along with *metadata*, a JSON-serializable dictionary, to
+    *filename*.
+    """
+    import json
+
+    names = sorted(arrays)
+    arrays = [np.ascontiguousarray(arrays[name]) for name in names]
+
+    def make_header(offsets):
+        return json.dumps(dict(
+            metadata=metadata,
+            arrays=[[name, ary.dtype.str, list(ary.shape), offset]
+                for name, ary, offset in zip(names, arrays, offsets)]))
+
+    # The header length depends on the offsets and vice versa. Offsets
+    # only grow with the header, so iterate to a fixed point.
+    offsets = [0]*len(arrays)
+    while True:
+        header = make_header(offsets)
+        offset = _align(_PREAMBLE_DTYPE.itemsize + len(header))
+        new_offsets = []
+        for ary in arrays:
+            new_offsets.append(offset)
+            offset = _align(offset + ary.nbytes)
+
+        if new_offsets == offsets:
+            break
+        offsets = new_offsets
+
+    preamble = np.zeros((), dtype=_PREAMBLE_DTYPE)
+    preamble["magic"] = MAGIC
+    preamble["version"] = VERSION
+    preamble["header_length"] = len(header)
+
+    outf = open(filename, "wb")
+    try:
+        outf.write(preamble.tostring())
+        outf.write(header)
+        for ary, offset in zip(arrays, offsets):
+            outf.write("\0" * (offset - outf.tell()))
+            outf.write(ary.tostring())
+    finally:
+        outf.close()
+
+
+class ArrayStore(object):
+    """Read access to a file written by :func:`write_array_store`.
+
+    Arrays are memory-mapped read-only by default, so that they are
+    only paged in as they are used and so that processes reading the
+    same file share its pages.
+
+    .. attribute:: metadata
+    .. attribute:: version
+    """
+
+    def __init__(self, filename, mmap=True):
+        import json
+
+        if mmap:
+            data = np.memmap(filename, dtype=np.uint8, mode="r")
+        else:
+            data = np.fromfile(filename, dtype=np.uint8)
+
+        if len(data) < _PREAMBLE_DTYPE.itemsize:
+            raise ArrayStoreError("'%s' is too short to be an array store"
+                    % filename)
+
+        preamble = data[:_PREAMBLE_DTYPE.itemsize].view(_PREAMBLE_DTYPE)[0]
+        if preamble["magic"] != MAGIC.rstrip("\0"):
+            raise ArrayStoreError("'%s' is not an array store" % filename)
+        self.version = int(preamble["version"])
+        if self.version > VERSION:
+            raise ArrayStoreError("'%s' has unsupported format version %d"
+                    % (filename, self.version))
+
+        header_start = _PREAMBLE_DTYPE.itemsize
+        header = json.loads(data[header_start:
+            header_start+int(preamble["header_length"])].tostring())
+
+        self.metadata = header["metadata"]
+        self._data = data
+        self._entries = dict(
+                (str(name), (np.dtype(str(dtype)), tuple(shape), offset))
+                for name, dtype, shape, offset in header["arrays"])
+
+    def keys(self):
+        return self._entries.keys()
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __getitem__(self, name):
+        dtype, shape, offset = self._entries[name]
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        return (self._data[offset:offset+nbytes]
+                .view(dtype).reshape(shape))
@@ -0,0 +1,199 @@
+"""Reuse of temporary arrays."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+
+import numpy
+from threading import Lock
+from weakref import WeakValueDictionary
+
+
+
+
+def _iter_arrays(value):
+    """Generate the arrays in *value*, which may be an array, an object
+    array of arrays, or a list or tuple of these.
+    """
+    if isinstance(value, numpy.ndarray):
+        if value.dtype == object:
+            for subvalue in value.flat:
+                for ary in _iter_arrays(subvalue):
+                    yield ary
+        else:
+            yield value
+    elif isinstance(value, (list, tuple)):
+        for subvalue in value:
+            for ary in _iter_arrays(subvalue):
+                yield ary
+
+
+
+
+class BufferPool(object):
+    """A pool of :mod:`numpy` arrays used for temporaries during operator
+    execution.
+
+    Arrays obtained from :meth:`empty` or :meth:`zeros` are handed out
+    again only after they have been given back using :meth:`release`.
+    :meth:`hedge.compiler.Code.execute` does so for the value of each
+    variable it discards once no remaining instruction depends on it.
+    Results of an operator are not discarded, and are only reused if
+    their user releases them.
+
+    Released arrays are kept in a free list per *(shape, dtype)*. At most
+    *max_free_per_key* arrays are kept per list, and at most *max_keys*
+    lists, the least recently requested of which is dropped first, so that
+    shapes used only once (e.g. by a diagnostic operator) do not stay
+    allocated.
+
+    .. attribute:: allocations
+
+        the number of arrays the pool has had to allocate.
+
+    .. attribute:: reuses
+
+        the number of requests served with a released array.
+
+    The pool may be used from several threads at once.
+    """
+
+    def __init__(self, enabled=True, max_free_per_key=16, max_keys=32):
+        self.enabled = enabled
+        self.max_free_per_key = max_free_per_key
+        self.max_keys = max_keys
+
+        # (shape, dtype, kind) -> list of released arrays,
+        # in order of last request
+        from collections import OrderedDict
+        self.free_lists = OrderedDict()
+
+        # id -> array handed out and not yet released
+        self.outstanding = WeakValueDictionary()
+
+        self.allocations = 0
+        self.reuses = 0
+
+        self.lock = Lock()
+
+    def empty(self, shape, dtype, kind="numpy"):
+        """Return an array with undefined contents."""
+        if kind != "numpy":
+            raise ValueError("invalid vector kind requested")
+
+        if isinstance(shape, int):
+            shape = (shape,)
+        dtype = numpy.dtype(dtype)
+
+        if not self.enabled:
+            return numpy.empty(shape, dtype)
+
+        key = shape, dtype, kind
+
+        self.lock.acquire()
+        try:
+            free_list = self.free_lists.pop(key, [])
+            self.free_lists[key] = free_list
+
+            if free_list:
+                ary = free_list.pop()
+                self.reuses += 1
+            else:
+                ary = numpy.empty(shape, dtype)
+                self.allocations += 1
+
+            self.outstanding[id(ary)] = ary
+
+            while len(self.free_lists) > self.max_keys:
+                self.free_lists.popitem(last=False)
+
+            return ary
+        finally:
+            self.lock.release()
+
+    def zeros(self, shape, dtype, kind="numpy"):
+        """Return an array filled with zeros."""
+        ary = self.empty(shape, dtype, kind)
+        ary.fill(0)
+        return ary
+
+    def release(self, values, live_values=()):
+        """Make the arrays in *values* that were obtained from this pool
+        available for reuse. *values* may contain arrays, object arrays of
+        arrays, and lists or tuples of these. Other arrays are ignored, as
+        are arrays that are the same as, or the base of, an array in
+        *live_values*, which is structured like *values*.
+
+        The caller must not use released arrays any more.
+        """
+        if not self.enabled:
+            return
+
+        live_ids = set()
+        for ary in _iter_arrays(live_values):
+            while ary is not None:
+                live_ids.add(id(ary))
+                ary = ary.base
+
+        self.lock.acquire()
+        try:
+            for ary in _iter_arrays(values):
+                ary_id = id(ary)
+                if ary_id in live_ids or self.outstanding.get(ary_id) is not ary:
+                    continue
+
+                del self.outstanding[ary_id]
+
+                free_list = self.free_lists.get(
+                        (ary.shape, ary.dtype, "numpy"))
+                if (free_list is not None
+                        and len(free_list) < self.max_free_per_key):
+                    free_list.append(ary)
+        finally:
+            self.lock.release()
+
+    def get_free_count(self):
+        return sum(len(free_list)
+                for free_list in self.free_lists.itervalues())
+
+    def get_held_bytes(self):
+        return sum(ary.nbytes
+                for free_list in self.free_lists.itervalues()
+                for ary in free_list)
+
+    def clear(self):
+        """Let go of all released arrays."""
+        self.lock.acquire()
+        try:
+            self.free_lists.clear()
+        finally:
+            self.lock.release()
+
+    def stats(self):
+        return {
+                "allocations": self.allocations,
+                "reuses": self.reuses,
+                "held_bytes": self.get_held_bytes(),
+                }
@@ -0,0 +1,77 @@
+"""Ensembles of fields sharing one discretization."""
+
+from __future__ import division
+
+__copyright__ = "Copyright (C) 2013 Andreas Kloeckner"
+
+__license__ = """
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+"""
+
+
+
+
+
+import numpy
+
+
+
+
+def stack_ensemble(members):
+    """Combine the list of fields *members* (numeric arrays or object
+    arrays thereof, all of the same shape) into one ensemble field that
+    carries a leading axis of length *len(members)* on each component.
+
+    Operators compiled by :mod:`hedge.backends.jit` and
+    :mod:`hedge.backends.pure_numpy` accept such ensemble fields and
+    act on all members at once. Components without the leading axis
+    are shared by all members.
+    """
+    from pytools.obj_array import log_shape
+    ls = log_shape(members[0])
+
+    if ls == ():
+        return numpy.array(members)
+
+    result = numpy.empty(ls, dtype=object)
+    for i in numpy.ndindex(*ls):
+        result[i] = numpy.array([member[i] for member in members])
+
+    return result
+
+
+def unstack_ensemble(ensemble):
+    """Return the list of member fields of *ensemble*, the inverse of
+    :func:`stack_ensemble`. The returned fields are views of *ensemble*.
+    """
+    from pytools.obj_array import log_shape
+    ls = log_shape(ensemble)
+
+    if ls == ():
+        return list(ensemble)
+
+    member_count = len(ensemble.flat[0])
+    result = []
+    for member_nr in range(member_count):
+        member = numpy.empty(ls, dtype=object)
+        for i in numpy.ndindex(*ls):
+            member[i] = ensemble[i][member_nr]
+        result.append(member)
+
+    return result
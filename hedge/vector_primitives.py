@@ -76,6 +76,27 @@ class NumpyLinearCombiner(object):
         return result
 
 
+class PureNumpyLinearCombiner(object):
+    """Like :class:`NumpyLinearCombiner`, but without a compiled kernel.
+    Accumulates into the result in place to avoid temporaries.
+    """
+
+    def __init__(self, result_dtype, scalar_dtype, sample_vec, arg_count):
+        self.result_dtype = result_dtype
+        self.shape = sample_vec.shape
+
+    def __call__(self, *args):
+        result = numpy.zeros(self.shape, self.result_dtype)
+
+        for fac, vec in args:
+            if fac == 1:
+                result += vec
+            else:
+                result += self.result_dtype.type(fac)*vec
+
+        return result
+
+
 class CUDALinearCombiner:
     def __init__(self, result_dtype, scalar_dtype, sample_vec, arg_count,
             pool=None):
@@ -164,6 +185,11 @@ _NO_VPF_SUGGESTION = ("--perhaps you need to pass "
 
 
 class VectorPrimitiveFactory(object):
+    def make_numpy_linear_combiner(self, result_dtype, scalar_dtype,
+            sample_vec, arg_count):
+        return NumpyLinearCombiner(result_dtype, scalar_dtype, sample_vec,
+                arg_count)
+
     def make_special_linear_combiner(self, result_dtype, scalar_dtype,
             sample_vec, arg_count):
         return None
@@ -186,8 +212,8 @@ class VectorPrimitiveFactory(object):
             sample_vec = sample_vec[0]
 
         if isinstance(sample_vec, numpy.ndarray) and sample_vec.dtype != object:
-            kernel = NumpyLinearCombiner(result_dtype, scalar_dtype, sample_vec,
-                    arg_count)
+            kernel = self.make_numpy_linear_combiner(result_dtype, scalar_dtype,
+                    sample_vec, arg_count)
         else:
             kernel = self.make_special_linear_combiner(
                     result_dtype, scalar_dtype, sample_vec, arg_count)
@@ -251,6 +277,15 @@ class VectorPrimitiveFactory(object):
         return kernel
 
 
+class PureNumpyVectorPrimitiveFactory(VectorPrimitiveFactory):
+    """A :class:`VectorPrimitiveFactory` that does not compile any code."""
+
+    def make_numpy_linear_combiner(self, result_dtype, scalar_dtype,
+            sample_vec, arg_count):
+        return PureNumpyLinearCombiner(result_dtype, scalar_dtype, sample_vec,
+                arg_count)
+
+
 class CUDAVectorPrimitiveFactory(VectorPrimitiveFactory):
     def __init__(self, discr=None):
         self.discr = discr
@@ -32,6 +32,9 @@ def get_config_schema():
         LibraryDir("BLAS", []),
         Libraries("BLAS", ["blas"]),
 
+        Switch("HAVE_OPENMP", False,
+            "Whether to build with OpenMP support for threaded element loops"),
+
         StringListOption("CXXFLAGS", [],
             help="Any extra C++ compiler options to include"),
         StringListOption("LDFLAGS", [],
@@ -72,6 +75,12 @@ def main():
 
     handle_component("BLAS")
 
+    EXTRA_COMPILE_ARGS = []
+    EXTRA_LINK_ARGS = []
+    if conf["HAVE_OPENMP"]:
+        EXTRA_COMPILE_ARGS.append("-fopenmp")
+        EXTRA_LINK_ARGS.append("-fopenmp")
+
     try:
         from distutils.command.build_py import build_py_2to3 as build_py
     except ImportError:
@@ -123,6 +132,8 @@ def main():
                     "hedge.tools",
                     ],
 
+            scripts=["bin/hedge-partition-mesh"],
+
             ext_package="hedge",
 
             setup_requires=[
@@ -160,8 +171,8 @@ def main():
                     library_dirs=LIBRARY_DIRS + EXTRA_LIBRARY_DIRS,
                     libraries=LIBRARIES + EXTRA_LIBRARIES,
                     define_macros=list(EXTRA_DEFINES.iteritems()),
-                    extra_compile_args=conf["CXXFLAGS"],
-                    extra_link_args=conf["LDFLAGS"],
+                    extra_compile_args=conf["CXXFLAGS"] + EXTRA_COMPILE_ARGS,
+                    extra_link_args=conf["LDFLAGS"] + EXTRA_LINK_ARGS,
                     ),
                 ],
 
@@ -96,8 +96,10 @@ namespace
 void hedge_expose_base()
 {
   scope().attr("INVALID_ELEMENT") = INVALID_ELEMENT;
+  scope().attr("INVALID_FACE") = INVALID_FACE;
   scope().attr("INVALID_VERTEX") = INVALID_VERTEX;
   scope().attr("INVALID_NODE") = INVALID_NODE;
+  scope().attr("INVALID_INDEX") = INVALID_INDEX;
 
   {
     typedef std::vector<int> cl;
@@ -51,6 +51,186 @@ namespace
 
   MAKE_LIFT_EXPOSER(lift_flux);
   MAKE_LIFT_EXPOSER(lift_flux_without_blas);
+
+
+
+
+  // bulk face pair access ----------------------------------------------------
+  template <class Side>
+  void set_straight_side_data(Side &side,
+      const numpy_matrix<npy_uint> &data,
+      const numpy_matrix<double> &geometry,
+      unsigned i, unsigned dims)
+  {
+    side.el_base_index = data(i, 0);
+    side.face_index_list_number = data(i, 1);
+    side.element_id = data(i, 2);
+    side.face_id = data(i, 3);
+    side.order = data(i, 4);
+
+    side.h = geometry(i, 0);
+    side.face_jacobian = geometry(i, 1);
+    side.element_jacobian = geometry(i, 2);
+    side.normal.resize(dims);
+    for (unsigned j = 0; j < dims; ++j)
+      side.normal[j] = geometry(i, 3+j);
+  }
+
+
+
+
+  /* Append one face pair per row of the given arrays to fg.
+   *
+   * int_data and ext_data have the columns el_base_index,
+   * face_index_list_number, element_id, face_id and order.
+   *
+   * int_geometry and ext_geometry have the columns h, face_jacobian,
+   * element_jacobian, followed by one column per normal component.
+   */
+  template <class FaceGroup>
+  void append_face_pairs(FaceGroup &fg,
+      const numpy_matrix<npy_uint> &int_data,
+      const numpy_matrix<npy_uint> &ext_data,
+      const numpy_vector<npy_uint> &ext_native_write_map,
+      const numpy_matrix<double> &int_geometry,
+      const numpy_matrix<double> &ext_geometry)
+  {
+    const unsigned fp_count = int_data.size1();
+
+    if (ext_data.size1() != fp_count
+        || ext_native_write_map.size() != fp_count
+        || int_geometry.size1() != fp_count
+        || ext_geometry.size1() != fp_count)
+      PYTHON_ERROR(ValueError, "face pair data have differing lengths");
+    if (int_data.size2() != 5 || ext_data.size2() != 5)
+      PYTHON_ERROR(ValueError, "face pair side data must have five columns");
+    if (int_geometry.size2() != ext_geometry.size2()
+        || int_geometry.size2() < 3
+        || int_geometry.size2() > 3 + max_dims)
+      PYTHON_ERROR(ValueError, "invalid number of face pair geometry columns");
+
+    const unsigned dims = int_geometry.size2() - 3;
+
+    fg.face_pairs.reserve(fg.face_pairs.size() + fp_count);
+    for (unsigned i = 0; i < fp_count; ++i)
+    {
+      typename FaceGroup::face_pair_type fp;
+      set_straight_side_data(fp.int_side, int_data, int_geometry, i, dims);
+      set_straight_side_data(fp.ext_side, ext_data, ext_geometry, i, dims);
+      fp.ext_native_write_map = ext_native_write_map[i];
+      fg.face_pairs.push_back(fp);
+    }
+  }
+
+
+
+
+  template <class Side>
+  void get_straight_side_data(const Side &side,
+      numpy_matrix<npy_uint> &data,
+      numpy_matrix<double> &geometry,
+      unsigned i, unsigned dims)
+  {
+    data(i, 0) = side.el_base_index;
+    data(i, 1) = side.face_index_list_number;
+    data(i, 2) = side.element_id;
+    data(i, 3) = side.face_id;
+    data(i, 4) = side.order;
+
+    geometry(i, 0) = side.h;
+    geometry(i, 1) = side.face_jacobian;
+    geometry(i, 2) = side.element_jacobian;
+    for (unsigned j = 0; j < dims; ++j)
+      geometry(i, 3+j) = j < side.normal.size() ? side.normal[j] : 0;
+  }
+
+
+
+
+  /* Return a tuple (int_data, ext_data, ext_native_write_map,
+   * int_geometry, ext_geometry) describing the face pairs of fg, laid
+   * out as expected by append_face_pairs.
+   */
+  template <class FaceGroup>
+  object get_face_pairs(const FaceGroup &fg, unsigned dims)
+  {
+    if (dims > max_dims)
+      PYTHON_ERROR(ValueError, "invalid number of dimensions");
+
+    const unsigned fp_count = fg.face_pairs.size();
+
+    numpy_matrix<npy_uint> int_data(fp_count, 5);
+    numpy_matrix<npy_uint> ext_data(fp_count, 5);
+    numpy_vector<npy_uint> ext_native_write_map(fp_count);
+    numpy_matrix<double> int_geometry(fp_count, 3+dims);
+    numpy_matrix<double> ext_geometry(fp_count, 3+dims);
+
+    for (unsigned i = 0; i < fp_count; ++i)
+    {
+      const typename FaceGroup::face_pair_type &fp = fg.face_pairs[i];
+      get_straight_side_data(fp.int_side, int_data, int_geometry, i, dims);
+      get_straight_side_data(fp.ext_side, ext_data, ext_geometry, i, dims);
+      ext_native_write_map[i] = fp.ext_native_write_map;
+    }
+
+    return boost::python::make_tuple(int_data, ext_data,
+        ext_native_write_map, int_geometry, ext_geometry);
+  }
+
+
+
+
+  /* Return an array of shape (face_pair_count, 2, 4) that holds the
+   * el_base_index, element_id, face_id and local_el_number of the
+   * interior and the exterior side of each face pair in fg.
+   */
+  template <class FaceGroup>
+  pyublas::numpy_array<npy_uint> get_face_pair_side_data(const FaceGroup &fg)
+  {
+    const npy_intp dims[] = { npy_intp(fg.face_pairs.size()), 2, 4 };
+    pyublas::numpy_array<npy_uint> result(3, dims);
+
+    pyublas::numpy_array<npy_uint>::iterator it = result.begin();
+    BOOST_FOREACH(const typename FaceGroup::face_pair_type &fp, fg.face_pairs)
+    {
+      *it++ = fp.int_side.el_base_index;
+      *it++ = fp.int_side.element_id;
+      *it++ = fp.int_side.face_id;
+      *it++ = fp.int_side.local_el_number;
+
+      *it++ = fp.ext_side.el_base_index;
+      *it++ = fp.ext_side.element_id;
+      *it++ = fp.ext_side.face_id;
+      *it++ = fp.ext_side.local_el_number;
+    }
+
+    return result;
+  }
+
+
+
+
+  /* Set the local_el_number of the interior and exterior side of each
+   * face pair in fg from the columns of local_el_numbers. Sides without
+   * an element are left untouched.
+   */
+  template <class FaceGroup>
+  void set_local_el_numbers(FaceGroup &fg,
+      const numpy_matrix<npy_uint> &local_el_numbers)
+  {
+    if (local_el_numbers.size1() != fg.face_pairs.size()
+        || local_el_numbers.size2() != 2)
+      PYTHON_ERROR(ValueError, "local element numbers have invalid shape");
+
+    for (unsigned i = 0; i < fg.face_pairs.size(); ++i)
+    {
+      typename FaceGroup::face_pair_type &fp = fg.face_pairs[i];
+      if (fp.int_side.element_id != INVALID_ELEMENT)
+        fp.int_side.local_el_number = local_el_numbers(i, 0);
+      if (fp.ext_side.element_id != INVALID_ELEMENT)
+        fp.ext_side.local_el_number = local_el_numbers(i, 1);
+    }
+  }
 }
 
 
@@ -109,8 +289,11 @@ void expose_face_pair(std::string const &face_pair_type_name)
       .DEF_SIMPLE_RW_MEMBER(face_count)
       .DEF_BYVAL_RW_MEMBER(local_el_write_base)
       .DEF_BYVAL_RW_MEMBER(index_lists)
+      .DEF_BYVAL_RW_MEMBER(color_starts)
+      .DEF_BYVAL_RW_MEMBER(colored_face_pairs)
       .DEF_SIMPLE_METHOD(element_count)
       .DEF_SIMPLE_METHOD(face_length)
+      .DEF_SIMPLE_METHOD(color_count)
       ;
   }
 }
@@ -152,6 +335,20 @@ void hedge_expose_fluxes()
   expose_face_pair<straight_face, curved_face>("StraightCurved");
   expose_face_pair<curved_face, curved_face>("Curved");
 
+  {
+    typedef face_group<face_pair<straight_face> > fg_type;
+
+    def("append_face_pairs", append_face_pairs<fg_type>,
+        args("fg", "int_data", "ext_data", "ext_native_write_map",
+          "int_geometry", "ext_geometry"));
+    def("get_face_pair_side_data", get_face_pair_side_data<fg_type>,
+        arg("fg"));
+    def("get_face_pairs", get_face_pairs<fg_type>,
+        args("fg", "dimensions"));
+    def("set_local_el_numbers", set_local_el_numbers<fg_type>,
+        args("fg", "local_el_numbers"));
+  }
+
   expose_lift_flux<float, float>();
   expose_lift_flux<double, double>();
   expose_lift_flux_without_blas<float, std::complex<float> >();
@@ -115,6 +115,9 @@ void hedge_expose_volume_operators()
       ;
   }
 
+  def("get_thread_count", get_thread_count);
+  def("set_thread_count", set_thread_count, arg("thread_count"));
+
   expose_for_type<float>();
   expose_for_type<double>();
   expose_for_type<std::complex<float> >();
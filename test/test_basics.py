@@ -467,6 +467,32 @@ def test_orthonormality_jacobi_1d():
 
 
 
+def test_simplex_onb_vandermonde():
+    """Check the vectorized Vandermonde matrix of the simplex bases against
+    their point-by-point evaluation."""
+    from hedge.polynomial import generic_vandermonde, simplex_onb_vandermonde
+    from hedge.discretization.local import (IntervalDiscretization,
+            TriangleDiscretization, TetrahedronDiscretization)
+
+    for ldis_class in [IntervalDiscretization, TriangleDiscretization,
+            TetrahedronDiscretization]:
+        ldis = ldis_class(5)
+        unit_nodes = numpy.array(ldis.unit_nodes())
+        points = numpy.vstack([unit_nodes, 0.9*unit_nodes[::-1]])
+
+        vdm = simplex_onb_vandermonde(points.T,
+                ldis.generate_mode_identifiers())
+        ref_vdm = generic_vandermonde(list(points),
+                list(ldis.basis_functions()))
+        assert la.norm(vdm - ref_vdm) < 1e-12*la.norm(ref_vdm)
+
+        assert la.norm(ldis.lagrange_basis_values(unit_nodes)
+                - numpy.eye(len(unit_nodes))) < 1e-12
+
+
+
+
+
 def test_transformed_quadrature():
     """Test 1D quadrature on arbitrary intervals"""
     from math import exp, sqrt, pi
@@ -870,6 +896,280 @@ def test_all_periodic_no_boundary():
 
 
 
+def test_conformal_mesh_connectivity():
+    """Check the connectivity of a partially periodic mesh against one
+    found by matching face vertex sets."""
+    from hedge.mesh import TAG_ALL
+    from hedge.mesh.generator import make_rect_mesh
+
+    mesh = make_rect_mesh(a=(0, 0), b=(2, 1), max_area=0.01,
+            periodicity=(True, False))
+
+    face_map = {}
+    for el in mesh.elements:
+        for fi, fvi in enumerate(el.faces):
+            face_map.setdefault(frozenset(fvi), []).append((el, fi))
+
+    interior = set(frozenset(el_faces)
+            for el_faces in face_map.itervalues() if len(el_faces) == 2)
+    boundary = set(el_faces[0]
+            for el_faces in face_map.itervalues() if len(el_faces) == 1)
+
+    periodic = set()
+    for face_a, face_b in mesh.interfaces:
+        if frozenset([face_a, face_b]) in interior:
+            interior.remove(frozenset([face_a, face_b]))
+            continue
+
+        for el, fi in [face_a, face_b]:
+            periodic.add((el, fi))
+        points_a = mesh.points[list(face_a[0].faces[face_a[1]])]
+        points_b = mesh.points[list(face_b[0].faces[face_b[1]])]
+        assert abs(abs(points_a[0, 0] - points_b[0, 0]) - 2) < 1e-12
+        assert la.norm(numpy.sort(points_a[:, 1]) - numpy.sort(points_b[:, 1])) \
+                < 1e-12
+
+    assert not interior
+    assert periodic and periodic <= boundary
+    assert set(mesh.tag_to_boundary[TAG_ALL]) == boundary - periodic
+    assert len(mesh.tag_to_boundary[TAG_ALL]) == len(boundary - periodic)
+
+
+
+
+def test_mesh_arrays():
+    """Check array-backed meshes against the element objects they were
+    gathered from."""
+    from hedge.mesh import TAG_ALL
+    from hedge.mesh.generator import make_box_mesh
+
+    mesh = make_box_mesh(max_volume=0.01)
+    arrays = mesh.get_arrays()
+
+    face_jacobians, face_normals = arrays.get_face_geometry()
+    for el in mesh.elements:
+        assert la.norm(face_jacobians[el.id] - el.face_jacobians) < 1e-13
+        assert la.norm(
+                face_normals[el.id] - numpy.array(el.face_normals)) < 1e-13
+
+    old_numbers = numpy.arange(len(mesh.elements))[::-1]
+    reordered = mesh.reordered(old_numbers)
+    assert reordered.get_arrays().element_count == len(mesh.elements)
+
+    for el in reordered.elements:
+        assert (el.vertex_indices
+                == mesh.elements[old_numbers[el.id]].vertex_indices).all()
+
+    for (el_a, face_a), (el_b, face_b) in reordered.interfaces:
+        assert set(el_a.faces[face_a]) == set(el_b.faces[face_b])
+
+    assert (sorted((old_numbers[el.id], face_nr)
+            for el, face_nr in reordered.tag_to_boundary[TAG_ALL])
+            == sorted((el.id, face_nr)
+                for el, face_nr in mesh.tag_to_boundary[TAG_ALL]))
+
+
+
+
+def test_space_filling_curve_reordering():
+    """Check that the Hilbert curve visits grid cells one step at a time,
+    and that curve orderings improve the locality of a scrambled mesh."""
+    from hedge.mesh.tools import (space_filling_curve_order,
+            get_locality_report)
+    from hedge.mesh.generator import make_rect_mesh
+
+    grid = numpy.array([(i, j) for i in range(8) for j in range(8)],
+            dtype=numpy.float64)
+    steps = numpy.diff(grid[space_filling_curve_order(grid, "hilbert")],
+            axis=0)
+    assert (numpy.sum(numpy.abs(steps), axis=1) == 1).all()
+
+    mesh = make_rect_mesh(max_area=0.001)
+    from numpy.random import RandomState
+    scrambled = mesh.reordered(
+            RandomState(17).permutation(len(mesh.elements)))
+    scrambled_distance = \
+            get_locality_report(scrambled).mean_neighbor_distance
+
+    for method in ["morton", "hilbert"]:
+        reordered = scrambled.reordered_by(method)
+        assert (get_locality_report(reordered).mean_neighbor_distance
+                < scrambled_distance / 4)
+
+
+
+
+def test_reverse_cuthill_mckee():
+    """Check that the CSR adjacency graph matches the dictionary one and
+    that reverse Cuthill-McKee shrinks the bandwidth of a scrambled mesh."""
+    from hedge.mesh.tools import (reverse_cuthill_mckee,
+            get_bandwidth_and_profile)
+    from hedge.mesh.generator import make_rect_mesh
+    from numpy.random import RandomState
+
+    mesh = make_rect_mesh(max_area=0.001)
+    mesh = mesh.reordered(RandomState(17).permutation(len(mesh.elements)))
+
+    xadj, adjncy = mesh.element_adjacency_graph(csr=True)
+    graph = mesh.element_adjacency_graph()
+    for el_nr, neighbors in graph.iteritems():
+        assert set(adjncy[xadj[el_nr]:xadj[el_nr+1]]) == neighbors
+
+    old_numbers = reverse_cuthill_mckee((xadj, adjncy))
+    assert sorted(old_numbers) == range(len(mesh.elements))
+
+    bandwidth, profile = get_bandwidth_and_profile((xadj, adjncy))
+    rcm_bandwidth, rcm_profile = get_bandwidth_and_profile(
+            (xadj, adjncy), old_numbers)
+    assert rcm_bandwidth < bandwidth / 4
+    assert rcm_profile < profile / 4
+
+    assert (get_bandwidth_and_profile(
+        mesh.reordered_by("rcm").element_adjacency_graph(csr=True))
+        == (rcm_bandwidth, rcm_profile))
+
+
+
+
+def test_partition_mesh():
+    """Check that the parts produced by partition_mesh cover the mesh and
+    that their rank boundaries match up, also when assembled in worker
+    processes."""
+    from hedge.mesh import TAG_ALL, TAG_RANK_BOUNDARY
+    from hedge.mesh.generator import make_rect_mesh
+    from hedge.partition import partition_mesh
+
+    mesh = make_rect_mesh(max_area=0.01, periodicity=(True, False))
+    mesh_arrays = mesh.get_arrays()
+    centroids = mesh_arrays.centroids()
+    partition = (2*(centroids[:, 0] > 0.5) + (centroids[:, 1] > 0.6)) + 3
+
+    parts = list(partition_mesh(mesh, partition, TAG_RANK_BOUNDARY))
+    assert [pd.part_nr for pd in parts] == [3, 4, 5, 6]
+
+    el_count = 0
+    interface_count = 0
+    bdry_count = 0
+    cut_faces = set()
+    for pd in parts:
+        part_arrays = pd.mesh.get_arrays()
+        gel = pd.global_element_numbers
+        gvi = pd.global_vertex_numbers
+
+        assert (partition[gel] == pd.part_nr).all()
+        assert (gvi[part_arrays.vertex_indices]
+                == mesh_arrays.vertex_indices[gel]).all()
+        assert pd.global2local_elements == dict(
+                (g, l) for l, g in enumerate(gel))
+
+        el_count += len(gel)
+        interface_count += len(part_arrays.interfaces)
+        bdry_count += len(part_arrays.tag_to_boundary[TAG_ALL])
+
+        for nb_part, tag in pd.part_boundary_tags.iteritems():
+            assert nb_part in pd.neighbor_parts
+            for el, face in part_arrays.tag_to_boundary[tag]:
+                cut_faces.add((gel[el], face, pd.part_nr, nb_part))
+
+    for el, face, part, nb_part in cut_faces:
+        assert partition[el] == part
+
+    assert el_count == mesh_arrays.element_count
+    assert bdry_count == len(mesh_arrays.tag_to_boundary[TAG_ALL])
+    assert interface_count + len(cut_faces)//2 == len(mesh_arrays.interfaces)
+
+    for pd, forked_pd in zip(parts, partition_mesh(
+            mesh, partition, TAG_RANK_BOUNDARY, processes=2)):
+        assert (pd.global_element_numbers
+                == forked_pd.global_element_numbers).all()
+        assert (pd.mesh.get_arrays().interfaces
+                == forked_pd.mesh.get_arrays().interfaces).all()
+
+    dict_partition = dict(enumerate(partition))
+    for pd, dict_pd in zip(parts, partition_mesh(
+            mesh, dict_partition, TAG_RANK_BOUNDARY)):
+        assert (pd.global_element_numbers
+                == dict_pd.global_element_numbers).all()
+
+    del dict_partition[0]
+    try:
+        list(partition_mesh(mesh, dict_partition, TAG_RANK_BOUNDARY))
+    except ValueError:
+        pass
+    else:
+        assert False, "incomplete partition dict not detected"
+
+
+
+
+def test_partitioned_mesh_files():
+    """Check that mesh parts written to files read back as the parts
+    produced by partition_mesh."""
+    from hedge.mesh import TAG_RANK_BOUNDARY
+    from hedge.mesh.generator import make_rect_mesh
+    from hedge.partition import (partition_mesh, write_partitioned_mesh,
+            read_mesh_part)
+    from tempfile import mkdtemp
+    from shutil import rmtree
+    from os.path import join
+
+    mesh = make_rect_mesh(max_area=0.01, periodicity=(True, False))
+    partition = (mesh.get_arrays().centroids()[:, 0] > 0.5).astype(numpy.int32)
+
+    tmpdir = mkdtemp()
+    try:
+        filenames = write_partitioned_mesh(
+                join(tmpdir, "rect"), mesh, partition)
+
+        for pd, filename in zip(
+                partition_mesh(mesh, partition, TAG_RANK_BOUNDARY),
+                filenames):
+            read_pd = read_mesh_part(filename, part_count=2)
+            arrays = pd.mesh.get_arrays()
+            read_arrays = read_pd.mesh.get_arrays()
+
+            assert read_pd.part_nr == pd.part_nr
+            assert read_pd.neighbor_parts == pd.neighbor_parts
+            assert read_pd.part_boundary_tags == pd.part_boundary_tags
+            assert (read_pd.global2local_vertex_indices
+                    == pd.global2local_vertex_indices)
+            assert read_arrays.element_class is arrays.element_class
+            assert (read_arrays.points == arrays.points).all()
+            assert (read_arrays.vertex_indices
+                    == arrays.vertex_indices).all()
+            assert (read_arrays.interfaces == arrays.interfaces).all()
+
+            assert (set(read_arrays.tag_to_boundary)
+                    == set(arrays.tag_to_boundary))
+            for tag, el_faces in arrays.tag_to_boundary.iteritems():
+                assert (read_arrays.tag_to_boundary[tag] == el_faces).all()
+
+            # only the periodic faces across the part boundary are kept
+            for face, opposite in (read_pd.global_periodic_opposite_faces
+                    .iteritems()):
+                assert mesh.periodic_opposite_faces[face] == opposite
+            assert read_pd.global_periodic_opposite_faces
+
+        try:
+            read_mesh_part(filenames[0], part_count=3)
+        except ValueError:
+            pass
+        else:
+            assert False, "part count mismatch not detected"
+
+        # part numbers name the files, so they may not skip a part
+        try:
+            write_partitioned_mesh(join(tmpdir, "gap"), mesh, 2*partition)
+        except ValueError:
+            pass
+        else:
+            assert False, "gap in part numbers not detected"
+    finally:
+        rmtree(tmpdir)
+
+
+
+
 def test_simp_cubature():
     """Check that Grundmann-Moeller cubature works as advertised"""
     from pytools import generate_nonnegative_integer_tuples_summing_to_at_most
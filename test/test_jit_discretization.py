@@ -1159,9 +1159,9 @@ def test_mesh_regrid():
             fields_vec2 = some_vector(discr2)
 
             out = discr.get_regrid_values(
-                u, discr2, dtype=None, use_btree=True, thresh=1e-7)
+                u, discr2, dtype=None, thresh=1e-7)
             out_vec = discr.get_regrid_values(
-                fields_vec,  discr2, dtype=None, use_btree=True, thresh=1e-7)
+                fields_vec,  discr2, dtype=None, thresh=1e-7)
 
             diff = u2 - out
             diff_vec = fields_vec2 - out_vec
@@ -1175,6 +1175,867 @@ def test_mesh_regrid():
     # FIXME: Add EOC test, too.
 
 
+def test_kernel_cache():
+    """Check that a second discretization picks up compiled kernels from
+    the persistent kernel cache and computes the same result."""
+
+    from tempfile import mkdtemp
+    from shutil import rmtree
+    from hedge.mesh.generator import make_square_mesh
+    from hedge.backends.jit.cache import KernelCache
+    from hedge.optemplate import make_nabla, Field
+
+    cache_dir = mkdtemp()
+    try:
+        mesh = make_square_mesh(max_area=0.1)
+        nabla = make_nabla(2)
+
+        results = []
+        caches = []
+        for i in range(2):
+            cache = KernelCache(cache_dir)
+            discr = discr_class(mesh, order=3, kernel_cache=cache,
+                    debug=discr_class.noninteractive_debug_flags())
+            f = discr.interpolate_volume_function(
+                    lambda x, el: x[0]**2*x[1])
+            op = discr.compile(nabla[0](Field("f")) + 2*Field("f"))
+            results.append(op(f=f))
+            caches.append(cache)
+
+        assert caches[0].misses > 0
+        assert caches[1].misses == 0
+        assert caches[1].hits == caches[0].misses
+        assert la.norm(results[0]-results[1]) == 0
+
+        caches[1].max_size = 0
+        caches[1].enforce_size_limit()
+        assert not caches[1].get_entries()
+
+        # the cache is opt-in, and may be given as a unicode path
+        import os
+        if "HEDGE_KERNEL_CACHE_DIR" not in os.environ:
+            assert discr_class(mesh, order=1,
+                    debug=discr_class.noninteractive_debug_flags()
+                    ).kernel_cache is None
+        discr = discr_class(mesh, order=1, kernel_cache=unicode(cache_dir),
+                debug=discr_class.noninteractive_debug_flags())
+        assert discr.kernel_cache.cache_dir == cache_dir
+        assert discr.kernel_cache.writable
+    finally:
+        rmtree(cache_dir)
+
+
+def test_threaded_element_loops():
+    """Check that threaded element loops and flux gathers give the same
+    operator results as serial ones."""
+
+    from math import sin
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.models.advection import StrongAdvectionOperator
+    from hedge.data import TimeDependentGivenFunction
+
+    v = numpy.array([0.27, 0.1])
+
+    def u_analytic(x, el, t):
+        return sin(3*(-numpy.dot(v, x)+t))
+
+    def boundary_tagger(vertices, el, face_nr, all_v):
+        if numpy.dot(el.face_normals[face_nr], v) < 0:
+            return ["inflow"]
+        else:
+            return ["outflow"]
+
+    mesh = make_disk_mesh(boundary_tagger=boundary_tagger, max_area=0.05)
+
+    results = []
+    for thread_count in [1, 4]:
+        discr = discr_class(mesh, order=4, thread_count=thread_count,
+                debug=discr_class.noninteractive_debug_flags())
+        op = StrongAdvectionOperator(v,
+                inflow_u=TimeDependentGivenFunction(u_analytic),
+                flux_type="upwind")
+
+        u = discr.interpolate_volume_function(
+                lambda x, el: u_analytic(x, el, 0))
+        results.append(op.bind(discr)(0, u))
+
+        # each flux slot of a conformal mesh is written by one face pair
+        for fg in discr.face_groups:
+            assert fg.color_count() == 1
+            assert sorted(fg.colored_face_pairs) == range(len(fg.face_pairs))
+
+    assert la.norm(results[0]-results[1]) < 1e-12*la.norm(results[0])
+
+
+def test_multi_field_diff_batch():
+    """Check that reference derivatives of several fields are batched into
+    one instruction and match the derivatives of each field by itself."""
+
+    from math import sin, cos
+    from hedge.mesh.generator import make_square_mesh
+    from hedge.optemplate import make_nabla, make_sym_vector, Field
+    from hedge.compiler import MultiFieldDiffBatchAssign
+    from hedge.tools import join_fields
+
+    mesh = make_square_mesh(max_area=0.05)
+    discr = discr_class(mesh, order=4,
+            debug=discr_class.noninteractive_debug_flags())
+
+    nabla = make_nabla(2)
+    w_sym = make_sym_vector("w", 3)
+    batched_op = discr.compile(join_fields(*[
+        nabla[i](w_sym[j]) for j in range(3) for i in range(2)]))
+    assert [insn
+            for insn in batched_op.code.instructions
+            if isinstance(insn, MultiFieldDiffBatchAssign)]
+
+    w = join_fields(
+            discr.interpolate_volume_function(lambda x, el: sin(x[0])),
+            discr.interpolate_volume_function(lambda x, el: x[0]*x[1]**2),
+            discr.interpolate_volume_function(lambda x, el: cos(3*x[1])))
+
+    batched_result = batched_op(w=w)
+
+    single_ops = [discr.compile(nabla[i](Field("f"))) for i in range(2)]
+    for j in range(3):
+        for i in range(2):
+            ref_result = single_ops[i](f=w[j])
+            assert la.norm(batched_result[2*j+i]-ref_result) \
+                    < 1e-12*la.norm(ref_result)
+
+
+def test_pure_numpy_backend():
+    """Check that the pure-numpy backend computes the same operator
+    results (including interior and boundary fluxes) as the JIT backend."""
+
+    from math import sin
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.models.advection import StrongAdvectionOperator
+    from hedge.models.wave import StrongWaveOperator
+    from hedge.data import TimeDependentGivenFunction
+    from hedge.mesh import TAG_ALL, TAG_NONE
+    from hedge.tools import join_fields
+    from hedge.backends.pure_numpy import Discretization as NumpyDiscretization
+
+    v = numpy.array([0.27, 0.1])
+
+    def u_analytic(x, el, t):
+        return sin(3*(-numpy.dot(v, x)+t))
+
+    def boundary_tagger(vertices, el, face_nr, all_v):
+        if numpy.dot(el.face_normals[face_nr], v) < 0:
+            return ["inflow"]
+        else:
+            return ["outflow"]
+
+    mesh = make_disk_mesh(boundary_tagger=boundary_tagger, max_area=0.05)
+
+    advec_op = StrongAdvectionOperator(v,
+            inflow_u=TimeDependentGivenFunction(u_analytic),
+            flux_type="upwind")
+    wave_op = StrongWaveOperator(-1, 2,
+            dirichlet_tag=TAG_ALL, neumann_tag=TAG_NONE,
+            radiation_tag=TAG_NONE, flux_type="upwind")
+
+    results = []
+    for cls in [discr_class, NumpyDiscretization]:
+        discr = cls(mesh, order=4, debug=cls.noninteractive_debug_flags())
+
+        u = discr.interpolate_volume_function(
+                lambda x, el: u_analytic(x, el, 0))
+        w = join_fields(u, u**2, discr.volume_zeros())
+
+        results.append((
+            advec_op.bind(discr)(0, u),
+            numpy.hstack(list(wave_op.bind(discr)(0, w)))))
+
+    for jit_result, numpy_result in zip(*results):
+        assert la.norm(jit_result-numpy_result) < 1e-12*la.norm(jit_result)
+
+
+def test_buffer_pool_reuse():
+    """Check that repeated operator application draws its temporaries from
+    the buffer pool without further allocation, and that results do not
+    change compared to running without the pool."""
+
+    from math import sin
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.models.wave import StrongWaveOperator
+    from hedge.mesh import TAG_ALL, TAG_NONE
+    from hedge.tools import join_fields
+
+    mesh = make_disk_mesh(max_area=0.05)
+    op = StrongWaveOperator(-1, 2,
+            dirichlet_tag=TAG_ALL, neumann_tag=TAG_NONE,
+            radiation_tag=TAG_NONE, flux_type="upwind")
+
+    results = []
+    for debug_flags in [set(), set(["no_buffer_pool"])]:
+        discr = discr_class(mesh, order=4,
+                debug=discr_class.noninteractive_debug_flags() | debug_flags)
+        rhs = op.bind(discr)
+
+        u = discr.interpolate_volume_function(lambda x, el: sin(3*x[0]))
+        w = join_fields(u, discr.volume_zeros(), discr.volume_zeros())
+
+        # warm up, then make sure steady state needs no new buffers
+        for i in range(3):
+            discr.buffer_pool.release(rhs(0, w))
+        allocations = discr.buffer_pool.allocations
+
+        for i in range(5):
+            rhs_w = rhs(0, w)
+            result = numpy.hstack(list(rhs_w))
+            discr.buffer_pool.release(rhs_w)
+
+        if discr.buffer_pool.enabled:
+            assert discr.buffer_pool.allocations == allocations
+            assert discr.buffer_pool.reuses > 0
+
+        results.append(result)
+
+    pooled_result, unpooled_result = results
+    assert la.norm(pooled_result-unpooled_result) == 0
+
+    # the pure-numpy backend gives back its flux scratch arrays, too
+    from hedge.backends.pure_numpy import Discretization as NumpyDiscretization
+    discr = NumpyDiscretization(mesh, order=4,
+            debug=NumpyDiscretization.noninteractive_debug_flags())
+    rhs = op.bind(discr)
+    w = join_fields(discr.interpolate_volume_function(lambda x, el: sin(3*x[0])),
+            discr.volume_zeros(), discr.volume_zeros())
+
+    for i in range(3):
+        discr.buffer_pool.release(rhs(0, w))
+    allocations = discr.buffer_pool.allocations
+    discr.buffer_pool.release(rhs(0, w))
+    assert discr.buffer_pool.allocations == allocations
+
+    # free lists are bounded, and live views keep their base in use
+    from hedge.tools.buffers import BufferPool
+    pool = BufferPool(max_free_per_key=1, max_keys=2)
+    arrays = [pool.empty(n, numpy.float64) for n in range(1, 5)]
+    pool.release(arrays)
+    assert pool.get_free_count() == 2
+    assert pool.empty(4, numpy.float64) is arrays[3]
+
+    ary = pool.empty(3, numpy.float64)
+    pool.release([ary], live_values=[ary[1:]])
+    assert pool.empty(3, numpy.float64) is not ary
+
+
+def test_execution_plan():
+    """Check that replaying the static schedule through an execution plan
+    gives the same results as interpreting it."""
+
+    from math import sin, cos
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.models.wave import StrongWaveOperator
+    from hedge.mesh import TAG_ALL, TAG_NONE
+    from hedge.tools import join_fields
+
+    mesh = make_disk_mesh(max_area=0.05)
+    op = StrongWaveOperator(-1, 2,
+            dirichlet_tag=TAG_ALL, neumann_tag=TAG_NONE,
+            radiation_tag=TAG_NONE, flux_type="upwind")
+
+    results = []
+    for debug_flags in [set(), set(["no_execution_plan"])]:
+        discr = discr_class(mesh, order=3,
+                debug=discr_class.noninteractive_debug_flags() | debug_flags)
+        compiled_op = discr.compile(op.op_template())
+
+        w = join_fields(
+                discr.interpolate_volume_function(lambda x, el: sin(x[0])),
+                discr.interpolate_volume_function(lambda x, el: cos(x[1])),
+                discr.volume_zeros())
+
+        for i in range(3):
+            result = numpy.hstack(list(compiled_op(t=0, w=w)))
+
+        assert bool(compiled_op.code.execution_plans) \
+                == ("no_execution_plan" not in debug_flags)
+        results.append(result)
+
+    plan_result, schedule_result = results
+    assert la.norm(plan_result-schedule_result) == 0
+
+
+def test_concurrent_execution():
+    """Check that executing independent instructions concurrently gives
+    the same results as sequential execution."""
+
+    from math import sin, cos
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.models.wave import StrongWaveOperator
+    from hedge.mesh import TAG_ALL, TAG_NONE
+    from hedge.tools import join_fields
+
+    mesh = make_disk_mesh(max_area=0.05)
+    op = StrongWaveOperator(-1, 2,
+            dirichlet_tag=TAG_ALL, neumann_tag=TAG_NONE,
+            radiation_tag=TAG_NONE, flux_type="upwind")
+
+    results = []
+    for instruction_thread_count in [1, 4]:
+        discr = discr_class(mesh, order=3,
+                instruction_thread_count=instruction_thread_count,
+                debug=discr_class.noninteractive_debug_flags())
+        compiled_op = discr.compile(op.op_template())
+
+        w = join_fields(
+                discr.interpolate_volume_function(lambda x, el: sin(x[0])),
+                discr.interpolate_volume_function(lambda x, el: cos(x[1])),
+                discr.volume_zeros())
+
+        # first run records the schedule, later ones replay it
+        for i in range(3):
+            result = numpy.hstack(list(compiled_op(t=0, w=w)))
+
+        if instruction_thread_count > 1:
+            assert compiled_op.code.last_concurrent_schedule is not None
+
+        results.append(result)
+        discr.close()
+
+    sequential_result, concurrent_result = results
+    assert la.norm(sequential_result-concurrent_result) == 0
+
+
+def test_single_and_mixed_precision():
+    """Check that operators on single-precision fields stay in single
+    precision, including geometric factors, and that mixed-precision
+    time stepping keeps its state in double precision."""
+
+    from math import sin, cos
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.models.wave import StrongWaveOperator
+    from hedge.mesh import TAG_ALL, TAG_NONE
+    from hedge.tools import join_fields
+    from hedge.timestep.runge_kutta import LSRK4TimeStepper
+
+    mesh = make_disk_mesh(max_area=0.05)
+    op = StrongWaveOperator(-1, 2,
+            dirichlet_tag=TAG_ALL, neumann_tag=TAG_NONE,
+            radiation_tag=TAG_NONE, flux_type="upwind")
+
+    def make_discr(dtype):
+        return discr_class(mesh, order=3, default_scalar_type=dtype,
+                debug=discr_class.noninteractive_debug_flags())
+
+    def make_initial_state(discr):
+        return join_fields(
+                discr.interpolate_volume_function(lambda x, el: sin(x[0])),
+                discr.interpolate_volume_function(lambda x, el: cos(x[1])),
+                discr.volume_zeros())
+
+    discr64 = make_discr(numpy.float64)
+    discr32 = make_discr(numpy.float32)
+
+    assert discr32.geometry_dtype == numpy.float32
+    assert discr32.volume_jacobians().dtype == numpy.float32
+    assert discr32.inverse_metric_derivatives()[0][0].dtype == numpy.float32
+
+    rhs64 = op.bind(discr64)
+    rhs32 = op.bind(discr32)
+
+    w64 = make_initial_state(discr64)
+    w32 = make_initial_state(discr32)
+
+    result64 = rhs64(0, w64)
+    result32 = rhs32(0, w32)
+    for comp64, comp32 in zip(result64, result32):
+        assert comp32.dtype == numpy.float32
+        assert la.norm(comp64-comp32) < 1e-4*la.norm(comp64)
+
+    # mixed precision: single-precision operator, double-precision state
+    dt = 0.2*discr64.dt_factor(op.max_eigenvalue(0, discr=discr64))
+    stepper64 = LSRK4TimeStepper()
+    stepper_mixed = LSRK4TimeStepper(dtype=numpy.float64,
+            rhs_dtype=numpy.float32)
+
+    w_mixed = w64
+    for step in range(5):
+        w64 = stepper64(w64, step*dt, dt, rhs64)
+        w_mixed = stepper_mixed(w_mixed, step*dt, dt, rhs32)
+
+    for comp64, comp_mixed in zip(w64, w_mixed):
+        assert comp_mixed.dtype == numpy.float64
+        assert la.norm(comp64-comp_mixed) < 1e-4*la.norm(comp64)
+
+
+def test_ensemble_evaluation():
+    """Check that evaluating an operator on an ensemble of fields (and
+    stepping it in time) gives the same results as evaluating it on each
+    member separately."""
+
+    from math import sin, cos
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.models.wave import StrongWaveOperator
+    from hedge.mesh import TAG_ALL, TAG_NONE
+    from hedge.tools import join_fields
+    from hedge.tools.ensemble import stack_ensemble, unstack_ensemble
+    from hedge.timestep.runge_kutta import LSRK4TimeStepper
+    from hedge.timestep.ensemble import EnsembleTimeStepper
+
+    mesh = make_disk_mesh(max_area=0.05)
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    op = StrongWaveOperator(-1, 2,
+            dirichlet_tag=TAG_ALL, neumann_tag=TAG_NONE,
+            radiation_tag=TAG_NONE, flux_type="upwind")
+    rhs = op.bind(discr)
+
+    members = [
+            join_fields(
+                discr.interpolate_volume_function(
+                    lambda x, el: sin(k*x[0])),
+                discr.interpolate_volume_function(
+                    lambda x, el: cos(k*x[1])),
+                discr.interpolate_volume_function(
+                    lambda x, el: x[0]*x[1]*k))
+            for k in [1, 2, 3]]
+
+    ensemble_result = unstack_ensemble(rhs(0, stack_ensemble(members)))
+    for member, member_result in zip(members, ensemble_result):
+        for comp, ens_comp in zip(rhs(0, member), member_result):
+            assert la.norm(comp-ens_comp) < 1e-12*la.norm(comp)
+
+    dt = 0.2*discr.dt_factor(op.max_eigenvalue(0, discr=discr))
+    steppers = [LSRK4TimeStepper() for member in members]
+    ensemble_stepper = EnsembleTimeStepper(LSRK4TimeStepper())
+
+    ensemble = stack_ensemble(members)
+    for step in range(5):
+        members = [stepper(member, step*dt, dt, rhs)
+                for stepper, member in zip(steppers, members)]
+        ensemble = ensemble_stepper(ensemble, step*dt, dt, rhs)
+
+    for member, ens_member in zip(members, unstack_ensemble(ensemble)):
+        for comp, ens_comp in zip(member, ens_member):
+            assert la.norm(comp-ens_comp) < 1e-12*la.norm(comp)
+
+
+def test_interior_face_group_data():
+    """Check the face pairs set up in bulk against the mesh."""
+
+    from hedge.mesh.generator import make_box_mesh
+
+    mesh = make_box_mesh(max_volume=0.02, periodicity=(True, False, False))
+    discr = discr_class(mesh, order=2,
+            debug=discr_class.noninteractive_debug_flags())
+
+    fg, = discr.face_groups
+    assert len(fg.face_pairs) == len(mesh.interfaces)
+
+    face_pair_els_and_faces = set()
+    for fp in fg.face_pairs:
+        int_el = mesh.elements[fp.int_side.element_id]
+        ext_el = mesh.elements[fp.ext_side.element_id]
+        face_pair_els_and_faces.add((
+            (int_el.id, fp.int_side.face_id),
+            (ext_el.id, fp.ext_side.face_id)))
+
+        for side, el in [(fp.int_side, int_el), (fp.ext_side, ext_el)]:
+            assert side.el_base_index == discr.find_el_range(el.id).start
+            assert fg.local_el_write_base[side.local_el_number] \
+                    == side.el_base_index
+            assert abs(side.face_jacobian
+                    - el.face_jacobians[side.face_id]) < 1e-13
+            assert la.norm(side.normal
+                    - el.face_normals[side.face_id]) < 1e-13
+
+        assert fp.int_side.h == fp.ext_side.h
+        assert la.norm(fp.int_side.normal + fp.ext_side.normal) < 1e-13
+
+    assert face_pair_els_and_faces == set(
+            ((e_l.id, fi_l), (e_n.id, fi_n))
+            for (e_l, fi_l), (e_n, fi_n) in mesh.interfaces)
+
+
+def test_batched_element_geometry():
+    """Check node placement and geometric factors computed from the
+    stacked element maps against the per-element maps."""
+
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.discretization.local import TriangleDiscretization
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.01)
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    eg, = discr.element_groups
+    ldis = eg.local_discretization
+    unit_nodes = ldis.unit_nodes()
+
+    imd = discr.inverse_metric_derivatives()
+    vol_jac = discr.volume_jacobians()
+
+    for el in mesh.elements:
+        rng = discr.find_el_range(el.id)
+        for i, unode in enumerate(unit_nodes):
+            assert la.norm(discr.nodes[rng.start+i] - el.map(unode)) < 1e-13
+
+        assert abs(vol_jac[rng.start] - abs(el.map.jacobian())) < 1e-13
+        for xyz in range(discr.dimensions):
+            for rst in range(discr.dimensions):
+                assert abs(imd[xyz][rst][rng.start]
+                        - el.inverse_map.matrix[rst, xyz]) < 1e-12
+
+    ref_factor = min(
+            TriangleDiscretization.dt_geometric_factor(ldis,
+                [mesh.points[i] for i in el.vertex_indices], el)
+            for el in mesh.elements)
+    assert abs(discr.dt_geometric_factor() - ref_factor) < 1e-13
+
+
+
+def test_elementwise_geometric_factors():
+    """Check that vector expressions reading geometric factors stored
+    per element agree with the full-volume geometric factors, for
+    single fields and for ensembles."""
+
+    from math import sin
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.optemplate import Field
+    from hedge.optemplate.primitives import Jacobian, InverseMetricDerivative
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.01)
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    geo = discr.elementwise_geometry()
+    assert len(geo.jacobians) == len(mesh.elements)
+    assert geo.nbytes < discr.volume_zeros().nbytes
+
+    op = discr.compile(
+            Jacobian(None)*Field("u")
+            + InverseMetricDerivative(None, 1, 0)*Field("u")**2)
+
+    u = discr.interpolate_volume_function(lambda x, el: sin(3*x[0])+x[1])
+    ref = (discr.volume_jacobians()*u
+            + discr.inverse_metric_derivatives()[0][1]*u**2)
+
+    result = op(u=u)
+    assert la.norm(result-ref) < 1e-13*la.norm(ref)
+
+    ens_result = op(u=numpy.array([u, 2*u]))
+    assert la.norm(ens_result[0]-ref) < 1e-13*la.norm(ref)
+    ens_ref = (discr.volume_jacobians()*2*u
+            + discr.inverse_metric_derivatives()[0][1]*4*u**2)
+    assert la.norm(ens_result[1]-ens_ref) < 1e-13*la.norm(ens_ref)
+
+
+
+def test_boundary_construction():
+    """Check boundary nodes, face pairs and normals built in bulk
+    against the mesh, on the nodal and on a quadrature grid."""
+
+    from hedge.mesh import TAG_ALL
+    from hedge.mesh.generator import make_disk_mesh
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.01)
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags(),
+            quad_min_degrees={"quad": 9})
+
+    bdry = discr.get_boundary(TAG_ALL)
+    normals = discr.boundary_normals(TAG_ALL)
+    face_length = discr.element_groups[0].local_discretization \
+            .face_node_count()
+
+    bdry_faces = mesh.tag_to_boundary[TAG_ALL]
+    assert len(bdry.nodes) == len(bdry_faces)*face_length
+    assert la.norm(bdry.nodes - discr.nodes[bdry.vol_indices]) == 0
+
+    for el, face_nr in bdry_faces:
+        fp = bdry.find_facepair((el, face_nr))
+        assert bdry.find_facepair_side((el.id, face_nr)).element_id == el.id
+        assert fp.int_side.element_id == el.id
+        assert fp.int_side.face_id == face_nr
+        assert la.norm(fp.int_side.normal - el.face_normals[face_nr]) < 1e-13
+        assert abs(fp.int_side.h
+                - abs(el.map.jacobian()/el.face_jacobians[face_nr])) < 1e-13
+
+        bdry_start = fp.ext_side.el_base_index
+        el_start = discr.find_el_range(el.id).start
+        for i in range(face_length):
+            assert bdry.vol_indices[bdry_start+i] >= el_start
+            assert la.norm(normals[:, bdry_start+i]
+                    - el.face_normals[face_nr]) < 1e-13
+
+    quad_info = bdry.get_quadrature_info("quad")
+    quad_fg, = quad_info.face_groups
+    assert len(quad_fg.face_pairs) == len(bdry_faces)
+    assert quad_info.node_count == len(bdry_faces) \
+            * quad_info.fg_ldis_quad_infos[0].face_node_count()
+
+    assert discr.get_boundary("nonexistent_tag").is_empty()
+
+
+
+def test_discretization_save_load():
+    """Check that a discretization restored from a file written by
+    Discretization.save computes the same operator results."""
+
+    import os
+    import shutil
+    import tempfile
+    from math import sin
+    from hedge.mesh import TAG_ALL
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.flux import make_normal, FluxScalarPlaceholder
+    from hedge.optemplate import (BoundaryPair, Field, make_nabla,
+            get_flux_operator)
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.01)
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filename = os.path.join(tmpdir, "discr.dat")
+        discr.save(filename)
+        loaded_discr = discr_class.load(filename, mesh, order=3,
+                debug=discr_class.noninteractive_debug_flags())
+
+        assert la.norm(loaded_discr.nodes - discr.nodes) == 0
+        fg, = discr.face_groups
+        loaded_fg, = loaded_discr.face_groups
+        assert (loaded_fg.index_lists == fg.index_lists).all()
+        assert (loaded_fg.local_el_write_base
+                == fg.local_el_write_base).all()
+
+        loaded_bdry = loaded_discr.get_boundary(TAG_ALL)
+        assert (loaded_bdry.vol_indices
+                == discr.get_boundary(TAG_ALL).vol_indices).all()
+
+        u_ph = FluxScalarPlaceholder(0)
+        normal = make_normal(discr.dimensions)
+        flux_op = get_flux_operator((u_ph.int - u_ph.ext)*normal[0])
+        op_template = (make_nabla(discr.dimensions)[1](Field("u"))
+                + flux_op(Field("u"))
+                + flux_op(BoundaryPair(Field("u"), Field("bc"), TAG_ALL)))
+
+        def apply(d):
+            u = d.interpolate_volume_function(
+                    lambda x, el: sin(3*x[0])*x[1])
+            return d.compile(op_template)(u=u,
+                    bc=d.boundarize_volume_field(u, TAG_ALL))
+
+        result = apply(discr)
+        assert la.norm(apply(loaded_discr) - result) \
+                < 1e-14*la.norm(result)
+
+        try:
+            discr_class.load(filename, mesh, order=2)
+        except ValueError:
+            pass
+        else:
+            assert False, "order mismatch not detected"
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+
+def test_vectorized_interpolation():
+    """Check that vectorized functions interpolate to the same values as
+    functions called node by node."""
+
+    from math import sin
+    from hedge.mesh import TAG_ALL
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.discretization import VectorizedFunction
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.01)
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    def f(x, el):
+        return sin(3*x[0])*x[1] + el.id
+
+    def vec_f(points, el_ids):
+        return numpy.sin(3*points[:, 0])*points[:, 1] + el_ids
+
+    vol = discr.interpolate_volume_function(f)
+    vec_vol = discr.interpolate_volume_function(VectorizedFunction(vec_f))
+    assert la.norm(vol - vec_vol) < 1e-14*la.norm(vol)
+
+    # shaped vectorized function on the boundary
+    vec_bdry = discr.interpolate_boundary_function(
+            VectorizedFunction(lambda points, el_ids: points.T, shape=(2,)),
+            TAG_ALL)
+    assert la.norm(vec_bdry.T - discr.get_boundary(TAG_ALL).nodes) == 0
+
+    bdry_el_ids = discr.interpolate_boundary_function(
+            VectorizedFunction(lambda points, el_ids: el_ids), TAG_ALL)
+    for el, face_nr in mesh.tag_to_boundary[TAG_ALL]:
+        fp = discr.get_boundary(TAG_ALL).find_facepair((el, face_nr))
+        assert bdry_el_ids[fp.ext_side.el_base_index] == el.id
+
+
+
+def test_time_dependent_boundary_cache():
+    """Check that the cached boundary interpolant of a
+    TimeDependentGivenFunction is reused within one time and cannot be
+    modified by its users."""
+
+    from hedge.mesh import TAG_ALL
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.data import TimeDependentGivenFunction
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.05)
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    gf = TimeDependentGivenFunction(lambda x, el, t: x[0] + t)
+
+    bdry_values = gf.boundary_interpolant(1, discr, TAG_ALL)
+    assert gf.boundary_interpolant(1, discr, TAG_ALL) is bdry_values
+    assert not bdry_values.flags.writeable
+
+    try:
+        bdry_values[0] = 17
+    except ValueError:
+        pass
+    else:
+        assert False, "cached boundary interpolant is writable"
+
+    later_values = gf.boundary_interpolant(2, discr, TAG_ALL)
+    assert la.norm(later_values - bdry_values - 1) < 1e-14*len(bdry_values)
+
+
+
+def test_point_evaluation_operator():
+    """Check batched point evaluation against exact values of a polynomial
+    and against evaluation one point at a time."""
+
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.tools import join_fields
+
+    mesh = make_disk_mesh(r=0.5, max_area=0.01)
+    discr = discr_class(mesh, order=3,
+            debug=discr_class.noninteractive_debug_flags())
+
+    def f(x, el):
+        return x[0]**3 - 2*x[0]*x[1] + x[1]**2
+
+    field = discr.interpolate_volume_function(f)
+
+    from numpy.random import RandomState
+    rng = RandomState(17)
+    radii = 0.45*numpy.sqrt(rng.uniform(size=200))
+    angles = 2*numpy.pi*rng.uniform(size=200)
+    points = numpy.array([radii*numpy.cos(angles), radii*numpy.sin(angles)]).T
+
+    evaluate = discr.get_point_evaluation_operator(points)
+    values = evaluate(field)
+    exact = numpy.array([f(pt, None) for pt in points])
+    assert la.norm(values - exact) < 1e-12*la.norm(exact)
+
+    for pt, value in zip(points[:10], values):
+        assert abs(discr.get_point_evaluator(pt)(field) - value) < 1e-12
+
+    both = evaluate(join_fields(field, 2*field))
+    assert la.norm(both[1] - 2*values) < 1e-12*la.norm(values)
+
+    try:
+        discr.get_point_evaluation_operator(numpy.array([[1., 1.]]))
+    except RuntimeError:
+        pass
+    else:
+        assert False, "point outside the mesh not detected"
+
+    # the nodal basis stays accurate at high order
+    from hedge.discretization.local import TriangleDiscretization
+    ldis = TriangleDiscretization(12)
+    unit_nodes = numpy.array(ldis.unit_nodes())
+    assert la.norm(ldis.lagrange_basis_values(unit_nodes)
+            - numpy.eye(len(unit_nodes)), numpy.inf) < 1e-11
+
+
+def test_regridder():
+    """Check that a :class:`hedge.discretization.Regridder` reproduces
+    polynomials, survives pickling and gives the same result when built
+    by several processes."""
+
+    from hedge.mesh.generator import make_rect_mesh
+    from hedge.tools import join_fields
+    from hedge.discretization import Regridder
+
+    from_discr = discr_class(
+            make_rect_mesh(a=(0, 0), b=(1, 1), max_area=0.02), order=3,
+            debug=discr_class.noninteractive_debug_flags())
+    to_discr = discr_class(
+            make_rect_mesh(a=(0.1, 0.1), b=(0.9, 0.9), max_area=0.005),
+            order=2, debug=discr_class.noninteractive_debug_flags())
+
+    def f(x, el):
+        return x[0]**2*x[1] - x[1]**3
+
+    fields = join_fields(
+            from_discr.interpolate_volume_function(f),
+            from_discr.interpolate_volume_function(lambda x, el: x[0]))
+    exact = join_fields(
+            to_discr.interpolate_volume_function(f),
+            to_discr.interpolate_volume_function(lambda x, el: x[0]))
+
+    regridder = Regridder(from_discr, to_discr, thresh=1e-10)
+    result = regridder(fields)
+    for i in range(2):
+        assert la.norm(result[i] - exact[i]) < 1e-12*la.norm(exact[i])
+
+    from cPickle import dumps, loads
+    assert la.norm(loads(dumps(regridder))(fields[0]) - result[0]) == 0
+
+    parallel_regridder = Regridder(from_discr, to_discr, thresh=1e-10,
+            processes=2)
+    assert la.norm(parallel_regridder(fields[1]) - result[1]) == 0
+
+    # a discretization running threads is not forked
+    threaded_discr = discr_class(from_discr.mesh, order=3,
+            instruction_thread_count=2,
+            debug=discr_class.noninteractive_debug_flags())
+    from warnings import catch_warnings, simplefilter
+    with catch_warnings(record=True) as caught_warnings:
+        simplefilter("always")
+        threaded_regridder = Regridder(threaded_discr, to_discr,
+                thresh=1e-10, processes=2)
+    threaded_discr.close()
+    assert caught_warnings
+    assert la.norm(threaded_regridder(fields[1]) - result[1]) == 0
+
+
+def test_batched_projector():
+    """Check that projecting an object array at once matches projecting
+    its components one by one, including into given output vectors."""
+
+    from hedge.mesh.generator import make_disk_mesh
+    from hedge.discretization import Projector
+    from hedge.tools import join_fields
+
+    mesh = make_disk_mesh(r=1, max_area=0.1)
+    discr2 = discr_class(mesh, order=2,
+            debug=discr_class.noninteractive_debug_flags())
+    discr4 = discr_class(mesh, order=4,
+            debug=discr_class.noninteractive_debug_flags())
+    p2to4 = Projector(discr2, discr4)
+
+    fields = join_fields(*[
+        discr2.interpolate_volume_function(
+            lambda x, el, i=i: x[0]**i - x[1])
+        for i in range(5)])
+
+    result = p2to4(fields)
+    for field, result_i in zip(fields, result):
+        assert la.norm(p2to4(field) - result_i) < 1e-14*la.norm(result_i)
+
+    out = join_fields(*[discr4.volume_empty(kind="numpy") for i in range(5)])
+    assert p2to4(fields, out=out) is out
+    for out_i, result_i in zip(out, result):
+        assert la.norm(out_i - result_i) == 0
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) > 1: